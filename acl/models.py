@@ -3,9 +3,14 @@ import re
 
 from datetime import datetime
 
-from django.db import models
+from django.db import connection, models, transaction
+from django.db.backends.signals import connection_created
+from django.db.models import F
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.auth.models import Permission
+from django.contrib.auth.models import Group as DjangoGroup
+from django.dispatch import receiver
+from django.utils import timezone
 
 from user.models import User
 
@@ -31,6 +36,50 @@ Permission.__le__ = lambda self, comp: _get_acltype(self) <= _get_acltype(comp)
 Permission.__ge__ = lambda self, comp: _get_acltype(self) >= _get_acltype(comp)
 
 
+class ACLPermission(models.Model):
+    """
+    This indexes Permission objects of ACLBase objects by the object id and the ACLType id,
+    which are also encoded in the codename of them, to look them up by integer equality.
+    """
+    permission = models.OneToOneField(Permission, primary_key=True)
+    object_id = models.IntegerField()
+    acltype = models.IntegerField()
+
+    class Meta:
+        unique_together = (('object_id', 'acltype'),)
+
+    @classmethod
+    def create_permissions(kls, targets):
+        """
+        This creates Permission objects and their indexes in bulk. The targets is a list of
+        (object_id, acltype_id, model of the object).
+        """
+        codenames_of_type = {}
+        for (objid, acltype, model) in targets:
+            content_type = ContentType.objects.get_for_model(model)
+            codenames_of_type.setdefault(content_type, {})['%d.%d' % (objid, acltype)] = (objid,
+                                                                                          acltype)
+
+        for (content_type, codenames) in codenames_of_type.items():
+            # Permission objects might have been created without index before
+            permissions = Permission.objects.filter(content_type=content_type,
+                                                    codename__in=codenames.keys()).order_by()
+            created_codenames = set(permissions.values_list('codename', flat=True))
+
+            Permission.objects.bulk_create([Permission(**{
+                'codename': codename,
+                'name': [x for x in ACLType.availables() if x == acltype][0].name,
+                'content_type': content_type,
+            }) for (codename, (_, acltype)) in codenames.items()
+                if codename not in created_codenames])
+
+            kls.objects.bulk_create([kls(**{
+                'permission_id': permission_id,
+                'object_id': codenames[codename][0],
+                'acltype': codenames[codename][1],
+            }) for (codename, permission_id) in permissions.values_list('codename', 'id')])
+
+
 class ACLBase(models.Model):
     name = models.CharField(max_length=200)
     is_public = models.BooleanField(default=True)
@@ -44,26 +93,23 @@ class ACLBase(models.Model):
     objtype = models.IntegerField(default=0)
 
     def set_status(self, val):
+        """
+        This sets the bits of status by an atomic UPDATE statement, which doesn't override
+        the other bits that are changed concurrently and the other fields of this object.
+        """
         self.status |= val
-        self.save()
+        if self.pk:
+            ACLBase.objects.filter(id=self.pk).update(status=F('status').bitor(val))
 
     def del_status(self, val):
+        """This clears the bits of status by an atomic UPDATE statement as set_status"""
         self.status &= ~val
-        self.save()
+        if self.pk:
+            ACLBase.objects.filter(id=self.pk).update(status=F('status').bitand(~val))
 
     def get_status(self, val):
         return self.status & val
 
-    def save(self, *args, **kwargs):
-        super(ACLBase, self).save(*args, **kwargs)
-
-        # create Permission sets for this object at once
-        content_type = ContentType.objects.get_for_model(self)
-        for acltype in ACLType.availables():
-            codename = '%s.%s' % (self.id, acltype.id)
-            if not Permission.objects.filter(codename=codename).exists():
-                Permission(name=acltype.name, codename=codename, content_type=content_type).save()
-
     def delete(self, *args, **kwargs):
         self.is_active = False
         self.name = "%s_deleted_%s" % (self.name, datetime.now().strftime("%Y%m%d_%H%M%S"))
@@ -82,6 +128,78 @@ class ACLBase(models.Model):
         self.is_public = aclobj.is_public
         self.default_permission = aclobj.default_permission
 
+    def get_permission_grants(self):
+        """
+        This returns pairs of id and permission name of active users and of groups which are
+        granted permissions of this object.
+        """
+        user_grants = list(User.user_permissions.through.objects.filter(
+            permission__aclpermission__object_id=self.id,
+            user__is_active=True).values_list('user_id', 'permission__name'))
+        group_grants = list(DjangoGroup.permissions.through.objects.filter(
+            permission__aclpermission__object_id=self.id).values_list('group_id',
+                                                                      'permission__name'))
+        return (user_grants, group_grants)
+
+    def inherit_permissions(self, aclobj, grants=None):
+        """
+        This grants the same permissions that each users and groups have for aclobj.
+        The grants are read from and written to the relation tables of Permission at once,
+        so the number of queries doesn't depend on the number of users and groups.
+        The grants of aclobj could be passed when they are inherited to many objects.
+        """
+        UserPermission = User.user_permissions.through
+        GroupPermission = DjangoGroup.permissions.through
+
+        (user_grants, group_grants) = grants or aclobj.get_permission_grants()
+        if not user_grants and not group_grants:
+            return
+
+        permissions = {x: getattr(self, x) for x in
+                       set([name for (_, name) in user_grants + group_grants])}
+
+        UserPermission.objects.bulk_create([
+            UserPermission(user_id=user_id, permission=permissions[name])
+            for (user_id, name) in user_grants])
+        GroupPermission.objects.bulk_create([
+            GroupPermission(group_id=group_id, permission=permissions[name])
+            for (group_id, name) in group_grants])
+
+        # bulk_create doesn't send m2m_changed signal, so this expires compiled permission
+        # maps of the users which are affected by this change explicitly.
+        User.clear_permission_map(
+            [user_id for (user_id, _) in user_grants] +
+            list(User.objects.filter(groups__id__in=[x for (x, _) in group_grants])
+                             .values_list('id', flat=True)))
+
+    def get_granted_members(self):
+        """
+        This returns active users and groups which are granted any permission of this object
+        with the highest ACLType id of each of them. The grants are read from the relation
+        tables of Permission, so this doesn't depend on the number of all users and groups.
+        """
+        user_grants = User.user_permissions.through.objects.filter(
+            permission__aclpermission__object_id=self.id,
+            user__is_active=True).values_list('user_id', 'user__username',
+                                              'permission__aclpermission__acltype')
+        group_grants = DjangoGroup.permissions.through.objects.filter(
+            permission__aclpermission__object_id=self.id,
+            group__group__is_active=True).values_list('group_id', 'group__name',
+                                                      'permission__aclpermission__acltype')
+
+        members = {}
+        for (member_type, grants) in [('user', user_grants), ('group', group_grants)]:
+            for (member_id, name, acltype) in grants:
+                member = members.setdefault((member_type, member_id), {
+                    'id': member_id,
+                    'name': name,
+                    'type': member_type,
+                    'current_permission': 0,
+                })
+                member['current_permission'] = max(member['current_permission'], acltype)
+
+        return sorted(members.values(), key=lambda x: (x['type'] == 'group', x['name']))
+
     @property
     def readable(self):
         return self._get_permission(ACLType.Readable.id)
@@ -95,27 +213,183 @@ class ACLBase(models.Model):
         return self._get_permission(ACLType.Full.id)
 
     def _get_permission(self, acltype):
-        return Permission.objects.get(codename="%s.%s" % (self.id, acltype))
+        # Permission objects of each ACLBase object are created at the first time when they're
+        # referred (e.g. ACL is set to this object), not to create unnecessary ones for the
+        # objects that never have ACL.
+        index = ACLPermission.objects.filter(object_id=self.id,
+                                             acltype=acltype).select_related('permission').first()
+        if index:
+            return index.permission
 
-    def get_subclass_object(self):
+        permission = Permission.objects.get_or_create(**{
+            'codename': "%s.%s" % (self.id, acltype),
+            'content_type': ContentType.objects.get_for_model(self._get_subclass_model()),
+            'defaults': {'name': [x for x in ACLType.availables() if x == acltype][0].name},
+        })[0]
+        ACLPermission.objects.get_or_create(permission=permission, defaults={
+            'object_id': self.id,
+            'acltype': acltype,
+        })
+
+        return permission
+
+    def _get_subclass_model(self):
+        return self._get_model_of_objtype(self.objtype) or type(self)
+
+    @classmethod
+    def _get_model_of_objtype(kls, objtype):
         # Use importlib to prevent circular import
-        if self.objtype == ACLObjType.Entity:
-            model = importlib.import_module('entity.models').Entity
-        elif self.objtype == ACLObjType.EntityAttr:
-            model = importlib.import_module('entity.models').EntityAttr
-        elif self.objtype == ACLObjType.Entry:
-            model = importlib.import_module('entry.models').Entry
-        elif self.objtype == ACLObjType.EntryAttr:
-            model = importlib.import_module('entry.models').Attribute
+        if objtype == ACLObjType.Entity:
+            return importlib.import_module('entity.models').Entity
+        elif objtype == ACLObjType.EntityAttr:
+            return importlib.import_module('entity.models').EntityAttr
+        elif objtype == ACLObjType.Entry:
+            return importlib.import_module('entry.models').Entry
+        elif objtype == ACLObjType.EntryAttr:
+            return importlib.import_module('entry.models').Attribute
         else:
-            # set ACLBase model
-            model = type(self)
+            return None
 
-        return model.objects.get(id=self.id)
+    def get_subclass_object(self):
+        return self._get_subclass_model().objects.get(id=self.id)
 
     def is_same_object(self, comp):
         return all([self[x] == comp[x] for x in self._IMPORT_INFO['header']])
 
+    @classmethod
+    def bulk_create(kls, objs):
+        """
+        This creates objects of a subclass of ACLBase in bulk, which the bulk_create of Django
+        doesn't support because of the multi-table inheritance. The ACLBase rows are created
+        first to get their ids, then the rows of the subclass which refer them are created.
+        This sets ids to specified objects and returns them.
+        """
+        if not objs:
+            return objs
+
+        bases = [ACLBase(**{f.attname: getattr(x, f.attname) for f in ACLBase._meta.concrete_fields
+                            if not f.primary_key}) for x in objs]
+
+        with transaction.atomic():
+            kls._insert_bases(bases)
+            for (obj, base) in zip(objs, bases):
+                obj.id = obj.pk = base.id
+                obj._state.adding = False
+                obj._state.db = connection.alias
+
+            # create rows of the subclass which refer the created ACLBase rows
+            fields = kls._meta.local_concrete_fields
+            batch_size = connection.ops.bulk_batch_size(fields, objs)
+            for index in range(0, len(objs), batch_size):
+                kls._base_manager._insert(objs[index:index + batch_size], fields=fields)
+
+        return objs
+
+    @classmethod
+    def _insert_bases(kls, bases):
+        """
+        This inserts ACLBase rows and sets ids to them. Some database backends (e.g. MySQL)
+        don't return ids of the rows which are inserted in bulk, but the ids which are allocated
+        to the rows inserted by one statement are consecutive unless auto-increment of MySQL is
+        configured to be interleaved. So the ids are computed from the one which the database
+        returns as the last inserted id. Otherwise, the rows are inserted one by one.
+        """
+        if connection.features.can_return_ids_from_bulk_insert:
+            ACLBase.objects.bulk_create(bases)
+            return
+
+        increment = getattr(connection, 'auto_increment_step', None)
+        if not increment:
+            for base in bases:
+                base.save()
+            return
+
+        batch_size = connection.ops.bulk_batch_size(ACLBase._meta.concrete_fields, bases)
+        for index in range(0, len(bases), batch_size):
+            batch = bases[index:index + batch_size]
+            ACLBase.objects.bulk_create(batch, batch_size=len(batch))
+
+            with connection.cursor() as cursor:
+                if connection.vendor == 'mysql':
+                    # LAST_INSERT_ID() is the id of the first row inserted by the statement
+                    cursor.execute('SELECT LAST_INSERT_ID()')
+                    first_id = cursor.fetchone()[0]
+                else:
+                    # last_insert_rowid() of SQLite is the id of the last one
+                    cursor.execute('SELECT last_insert_rowid()')
+                    first_id = cursor.fetchone()[0] - (len(batch) - 1) * increment
+
+            for (offset, base) in enumerate(batch):
+                base.id = first_id + offset * increment
+                base._state.adding = False
+                base._state.db = connection.alias
+
+    @classmethod
+    def apply_acl(kls, object_ids, members, is_public=None, default_permission=None):
+        """
+        This sets the same ACL to all objects of object_ids in a transaction. The members is
+        a list of (member_type, member_id, acltype_id), and the permissions of each members for
+        the objects are replaced with specified ones. The permissions are deleted from and
+        inserted to the relation tables of Permission at once regardless of the number of
+        objects, so the caller should split a large number of objects into chunks.
+        """
+        UserPermission = User.user_permissions.through
+        GroupPermission = DjangoGroup.permissions.through
+
+        # The last setting is used when the same member is specified more than once
+        acl_settings = {(t, int(i)): int(a) for (t, i, a) in members}
+        user_ids = [i for (t, i) in acl_settings if t == 'user']
+        group_ids = [i for (t, i) in acl_settings if t == 'group']
+
+        with transaction.atomic():
+            objects = dict(kls.objects.filter(id__in=object_ids).values_list('id', 'objtype'))
+
+            params = {}
+            if is_public is not None:
+                params['is_public'] = is_public
+            if default_permission is not None:
+                params['default_permission'] = default_permission
+            if params:
+                kls.objects.filter(id__in=objects.keys()).update(updated_time=timezone.now(),
+                                                                 **params)
+
+            # create Permission objects to be granted which have not been created yet
+            acltypes = set([x for x in acl_settings.values() if x != ACLType.Nothing])
+            indexed = set(ACLPermission.objects.filter(
+                object_id__in=objects.keys(),
+                acltype__in=acltypes).values_list('object_id', 'acltype'))
+            ACLPermission.create_permissions([
+                (objid, acltype, kls._get_model_of_objtype(objtype) or kls)
+                for (objid, objtype) in objects.items() for acltype in acltypes
+                if (objid, acltype) not in indexed])
+
+            permissions = {(objid, acltype): permission_id for (objid, acltype, permission_id)
+                           in ACLPermission.objects.filter(object_id__in=objects.keys())
+                           .values_list('object_id', 'acltype', 'permission_id')}
+
+            # clear current permissions of specified members, then grant new ones
+            UserPermission.objects.filter(user_id__in=user_ids,
+                                          permission_id__in=permissions.values()).delete()
+            GroupPermission.objects.filter(group_id__in=group_ids,
+                                           permission_id__in=permissions.values()).delete()
+
+            UserPermission.objects.bulk_create([
+                UserPermission(user_id=member_id, permission_id=permissions[(objid, acltype)])
+                for ((member_type, member_id), acltype) in acl_settings.items()
+                for objid in objects if member_type == 'user' and acltype in acltypes])
+            GroupPermission.objects.bulk_create([
+                GroupPermission(group_id=member_id, permission_id=permissions[(objid, acltype)])
+                for ((member_type, member_id), acltype) in acl_settings.items()
+                for objid in objects if member_type == 'group' and acltype in acltypes])
+
+        # Neither deleting nor inserting through the relation tables sends m2m_changed signal,
+        # so this expires compiled permission maps of the affected users explicitly.
+        User.clear_permission_map(
+            user_ids + list(User.objects.filter(groups__id__in=group_ids)
+                                        .values_list('id', flat=True)))
+
+        return list(objects.keys())
+
     @classmethod
     def search(kls, query):
         results = []
@@ -127,3 +401,22 @@ class ACLBase(models.Model):
             })
 
         return results
+
+
+@receiver(connection_created)
+def _set_auto_increment_step(sender, connection, **kwargs):
+    """
+    This sets the step of ids which are allocated to the rows inserted by one statement to the
+    connection when they are consecutive, which ACLBase.bulk_create depends on.
+    """
+    if connection.vendor == 'sqlite':
+        connection.auto_increment_step = 1
+
+    elif connection.vendor == 'mysql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment')
+            (lock_mode, increment) = cursor.fetchone()
+
+        # ids are interleaved with the ones of other statements in the lock mode 2
+        if int(lock_mode) in [0, 1]:
+            connection.auto_increment_step = int(increment)
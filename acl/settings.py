@@ -0,0 +1,6 @@
+from airone.lib.settings import Settings
+
+CONFIG = Settings({
+    'MAX_LIST_MEMBERS': 20,
+    'APPLY_ACL_CHUNK_SIZE': 1000,
+})
@@ -0,0 +1,76 @@
+import json
+
+from acl.models import ACLBase
+from airone.celery import app
+from airone.lib.acl import ACLType, ACLObjType
+from entity.models import Entity, EntityAttr
+from entry.models import Entry, Attribute
+from job.models import Job
+
+from .settings import CONFIG
+
+
+def _get_target_querysets(params):
+    if 'object_ids' in params:
+        # Entry and Attribute are separated from others to check permissions of their parents
+        objects = ACLBase.objects.filter(id__in=params['object_ids'], is_active=True)
+        return [
+            objects.exclude(objtype__in=[ACLObjType.Entry, ACLObjType.EntryAttr]),
+            Entry.objects.filter(id__in=objects.filter(objtype=ACLObjType.Entry)),
+            Attribute.objects.filter(id__in=objects.filter(objtype=ACLObjType.EntryAttr)),
+        ]
+
+    # The case of applying ACL to an Entity and all of the objects which belong to it.
+    # The entries (and their attributes) could be narrowed down by their name.
+    condition = params['condition']
+    entries = Entry.objects.filter(schema__id=condition['entity_id'], is_active=True,
+                                   name__icontains=condition.get('entry_name', ''))
+    return [
+        Entity.objects.filter(id=condition['entity_id'], is_active=True),
+        EntityAttr.objects.filter(parent_entity__id=condition['entity_id'], is_active=True),
+        entries,
+        Attribute.objects.filter(parent_entry__in=entries, is_active=True),
+    ]
+
+
+@app.task(bind=True)
+def apply_acl(self, job_id):
+    job = Job.objects.get(id=job_id)
+
+    if job.proceed_if_ready():
+        job.update(Job.STATUS['PROCESSING'])
+
+        user = job.user
+        params = json.loads(job.params)
+        members = [(x['member_type'], x['member_id'], x['value']) for x in params['acl']
+                   if x['value']]
+
+        # ACL is applied only to the objects which user has full permission
+        object_ids = sum([list(user.filter_permitted(x, ACLType.Full).values_list('id', flat=True))
+                          for x in _get_target_querysets(params)], [])
+
+        total_count = len(object_ids)
+        applied_count = 0
+        for index in range(0, total_count, CONFIG.APPLY_ACL_CHUNK_SIZE):
+            # abort processing when job is canceled
+            if job.is_canceled():
+                return
+
+            # exclude objects whose ACL will never be changed by user with this setting
+            chunk = object_ids[index:index + CONFIG.APPLY_ACL_CHUNK_SIZE]
+            chunk = list(user.filter_may_permitted(
+                ACLBase.objects.filter(id__in=chunk), ACLType.Full, params.get('is_public'),
+                params.get('default_permission'), params['acl']).values_list('id', flat=True))
+
+            applied_ids = ACLBase.apply_acl(chunk, members, params.get('is_public'),
+                                            params.get('default_permission'))
+            applied_count += len(applied_ids)
+
+            # update documents of entries which have Public/Private flag and default permission
+            if 'is_public' in params or 'default_permission' in params:
+                Entry.register_es_documents(Entry.objects.filter(id__in=applied_ids))
+
+            job.update(text='Now applying ACL... (progress: [%5d/%5d])' % (
+                min(index + CONFIG.APPLY_ACL_CHUNK_SIZE, total_count), total_count))
+
+        job.update(Job.STATUS['DONE'], 'ACL is applied to %d objects' % applied_count)
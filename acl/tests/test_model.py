@@ -1,7 +1,10 @@
+import mock
+
+from django.db import connections
 from django.test import TestCase
 from django.contrib.auth.models import Permission
 from group.models import Group
-from acl.models import ACLBase
+from acl.models import ACLBase, ACLPermission
 from user.models import User
 from importlib import import_module
 from airone.lib.acl import ACLType
@@ -21,6 +24,77 @@ class ModelTest(TestCase):
         self.assertIsInstance(acl.writable, Permission)
         self.assertIsInstance(acl.full, Permission)
 
+    def test_create_permissions_lazily(self):
+        aclobj = ACLBase.objects.create(name='hoge', created_user=self.user)
+
+        # Permission objects are not created until ACL is set to the object
+        self.assertFalse(Permission.objects.filter(codename__startswith='%d.' % aclobj.id))
+
+        # saving an existing object sends only a query to update it
+        aclobj.name = 'fuga'
+        with self.assertNumQueries(1):
+            aclobj.save()
+
+        permission = aclobj.readable
+        self.assertEqual(permission.codename, '%d.%d' % (aclobj.id, ACLType.Readable.id))
+        self.assertEqual(permission.name, ACLType.Readable.name)
+
+        # checks same Permission object is returned after creating it
+        self.assertEqual(aclobj.readable, permission)
+        self.assertEqual(Permission.objects.filter(codename__startswith='%d.' % aclobj.id).count(),
+                         1)
+
+    def test_index_permissions(self):
+        aclobj = ACLBase.objects.create(name='hoge', created_user=self.user)
+        group = Group.objects.create(name='group')
+
+        self.user.permissions.add(aclobj.readable)
+        group.permissions.add(aclobj.full)
+
+        indexes = ACLPermission.objects.filter(object_id=aclobj.id)
+        self.assertEqual(sorted(indexes.values_list('acltype', 'permission')),
+                         [(ACLType.Readable.id, aclobj.readable.id),
+                          (ACLType.Full.id, aclobj.full.id)])
+
+        # permissions are looked up through the index
+        self.assertEqual(list(self.user.get_acls(aclobj)), [aclobj.readable])
+        self.assertEqual(list(group.get_acls(aclobj)), [aclobj.full])
+        self.assertEqual(self.user.get_granted_acltype(aclobj), ACLType.Readable.id)
+
+    def test_apply_acl(self):
+        creator = User.objects.create(username='creator')
+        aclobjs = [ACLBase.objects.create(name='obj-%d' % i, created_user=creator)
+                   for i in range(10)]
+        group = Group.objects.create(name='group')
+        member = User.objects.create(username='member')
+        member.groups.add(group)
+
+        # set permissions in advance which will be replaced
+        self.user.permissions.add(aclobjs[0].full)
+        member.permissions.add(aclobjs[0].readable)
+
+        # the number of queries doesn't depend on the number of objects
+        with self.assertNumQueries(17):
+            object_ids = ACLBase.apply_acl([x.id for x in aclobjs], [
+                ('user', self.user.id, ACLType.Writable.id),
+                ('user', member.id, ACLType.Nothing.id),
+                ('group', group.id, ACLType.Readable.id),
+            ], is_public=False)
+
+        self.assertEqual(sorted(object_ids), sorted([x.id for x in aclobjs]))
+        self.assertFalse(ACLBase.objects.filter(id__in=object_ids, is_public=True).exists())
+        for aclobj in ACLBase.objects.filter(id__in=object_ids):
+            self.assertEqual([x.name for x in self.user.get_acls(aclobj)],
+                             [ACLType.Writable.name])
+            self.assertEqual([x.name for x in member.get_acls(aclobj)], [])
+            self.assertEqual([x.name for x in group.get_acls(aclobj)], [ACLType.Readable.name])
+
+            # checks compiled permission maps are updated
+            self.assertTrue(self.user.has_permission(aclobj, ACLType.Writable))
+            self.assertFalse(self.user.has_permission(aclobj, ACLType.Full))
+            self.assertTrue(member.has_permission(aclobj, ACLType.Readable))
+            self.assertFalse(member.has_permission(aclobj, ACLType.Writable))
+
     def test_pass_permission_check_with_public_obj(self):
         aclobj = ACLBase.objects.create(name='hoge', created_user=self.user, is_public=True)
 
@@ -113,6 +187,24 @@ class ModelTest(TestCase):
         self.assertEqual(ACLBase.objects.get(id=attr.id).get_subclass_object(), attr)
         self.assertEqual(ACLBase.objects.get(id=base.id).get_subclass_object(), base)
 
+    def test_bulk_create(self):
+        model_entity = import_module('entity.models')
+
+        # ids are read back from the database, or the rows are inserted one by one when ids
+        # which are allocated to the rows inserted in bulk might not be consecutive
+        connection = connections['default']
+        for step in [getattr(connection, 'auto_increment_step', None), None]:
+            with mock.patch.object(connection, 'auto_increment_step', step, create=True):
+                entities = model_entity.Entity.bulk_create([
+                    model_entity.Entity(name='e-%d' % i, created_user=self.user)
+                    for i in range(3)])
+
+            self.assertEqual([x.name for x in ACLBase.objects.filter(
+                id__in=[x.id for x in entities]).order_by('id')], ['e-0', 'e-1', 'e-2'])
+            self.assertEqual([model_entity.Entity.objects.get(id=x.id).name for x in entities],
+                             ['e-0', 'e-1', 'e-2'])
+            self.assertTrue(all([not x._state.adding for x in entities]))
+
     def test_manipurate_status_param(self):
         TEST_FLAG_0 = (1 << 0)
         TEST_FLAG_1 = (1 << 1)
@@ -131,6 +223,30 @@ class ModelTest(TestCase):
         self.assertFalse(entity.get_status(TEST_FLAG_1))
         self.assertFalse(entity.get_status(TEST_FLAG_2))
 
+    def test_manipurate_status_param_concurrently(self):
+        TEST_FLAG_0 = (1 << 0)
+        TEST_FLAG_1 = (1 << 1)
+
+        Entity = import_module('entity.models').Entity
+        entity = Entity.objects.create(name='entity1', created_user=self.user)
+
+        # each status bits are changed atomically without saving the other fields
+        other = Entity.objects.get(id=entity.id)
+        other.name = 'changed'
+        other.save()
+        with self.assertNumQueries(1):
+            entity.set_status(TEST_FLAG_0)
+        Entity.objects.get(id=entity.id).set_status(TEST_FLAG_1)
+
+        entity = Entity.objects.get(id=entity.id)
+        self.assertEqual(entity.name, 'changed')
+        self.assertTrue(entity.get_status(TEST_FLAG_0))
+        self.assertTrue(entity.get_status(TEST_FLAG_1))
+
+        Entity.objects.get(id=entity.id).del_status(TEST_FLAG_0)
+        entity.del_status(TEST_FLAG_1)
+        self.assertEqual(Entity.objects.get(id=entity.id).status, 0)
+
     def test_operation_for_acltype(self):
         type_readable = ACLType.Readable
 
@@ -199,6 +315,42 @@ class ModelTest(TestCase):
         self.assertTrue(superuser.has_permission(aclobj, ACLType.Full))
         self.assertFalse(guestuser.has_permission(aclobj, ACLType.Full))
 
+    def test_filter_may_permitted(self):
+        user = User.objects.create(username='user')
+        group = Group.objects.create(name='group')
+        user.groups.add(group)
+
+        aclobjs = [
+            ACLBase.objects.create(name='public', created_user=self.user),
+            ACLBase.objects.create(name='default', created_user=self.user, is_public=False,
+                                   default_permission=ACLType.Full.id),
+            ACLBase.objects.create(name='user', created_user=self.user, is_public=False),
+            ACLBase.objects.create(name='group', created_user=self.user, is_public=False),
+            ACLBase.objects.create(name='private', created_user=self.user, is_public=False),
+        ]
+        user.permissions.add(aclobjs[2].full)
+        group.permissions.add(aclobjs[3].full)
+
+        queryset = ACLBase.objects.filter(id__in=[x.id for x in aclobjs])
+        for acl_settings in [[], [{'member_type': 'user', 'member_id': str(user.id),
+                                   'value': str(ACLType.Readable.id)}],
+                             [{'member_type': 'group', 'member_id': str(group.id),
+                               'value': str(ACLType.Readable.id)}],
+                             [{'member_type': 'group', 'member_id': str(group.id),
+                               'value': str(ACLType.Full.id)}]]:
+            for (is_public, default_permission) in [(None, None), (False, ACLType.Nothing.id),
+                                                    (True, None)]:
+                # checks the results are same with the ones of may_permitted for each objects
+                self.assertEqual(
+                    sorted(user.filter_may_permitted(queryset, ACLType.Full, is_public,
+                                                     default_permission, acl_settings)
+                           .values_list('id', flat=True)),
+                    sorted([x.id for x in aclobjs if user.may_permitted(
+                        x, ACLType.Full,
+                        x.is_public if is_public is None else is_public,
+                        x.default_permission if default_permission is None
+                        else default_permission, acl_settings)]))
+
     def test_check_may_permitted(self):
         admin_user = User.objects.create(username='admin', is_superuser=True)
         non_admin_user = User.objects.create(username='user', is_superuser=False)
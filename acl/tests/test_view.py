@@ -1,15 +1,21 @@
 import json
 
+from unittest.mock import patch, Mock
+
 from group.models import Group
 from django.urls import reverse
 
 from user.models import User
+from acl import tasks
 from acl.models import ACLBase
+from acl.settings import CONFIG
 from entity.models import Entity, EntityAttr
 from entry.models import Entry, Attribute
 
 from airone.lib.acl import ACLType
 from airone.lib.test import AironeViewTest
+from airone.lib.types import AttrTypeValue
+from job.models import Job, JobOperation
 from xml.etree import ElementTree
 
 
@@ -53,13 +59,69 @@ class ViewTest(AironeViewTest):
     def test_index_with_objects(self):
         self.admin_login()
 
-        User(username='hoge').save()
+        user = User.objects.create(username='hoge')
+        user.permissions.add(self._aclobj.writable)
+        group = Group.objects.create(name='fuga')
+        group.permissions.add(self._aclobj.readable)
+        group.permissions.add(self._aclobj.full)
+
+        # This user is not shown because any permission is not granted to
+        User.objects.create(username='puyo')
 
         resp = self.client.get(reverse('acl:index', args=[self._aclobj.id]))
         self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context['members'], [
+            {'id': user.id, 'name': 'hoge', 'type': 'user',
+             'current_permission': ACLType.Writable.id},
+            {'id': group.id, 'name': 'fuga', 'type': 'group',
+             'current_permission': ACLType.Full.id},
+        ])
 
         root = ElementTree.fromstring(resp.content.decode('utf-8'))
-        self.assertIsNotNone(root.find('.//table/tbody/tr/td'))
+        self.assertEqual(len(root.findall('.//table/tbody/tr')), 2)
+
+    def test_search_members(self):
+        self.admin_login()
+
+        for index in range(CONFIG.MAX_LIST_MEMBERS):
+            User.objects.create(username='user-%02d' % index)
+        Group.objects.create(name='user-group')
+        User.objects.create(username='deleted-user', is_active=False)
+
+        resp = self.client.get(reverse('acl:search_members', args=[self._aclobj.id]),
+                               {'keyword': 'user-'})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.json()['has_next'])
+        self.assertEqual([x['name'] for x in resp.json()['members']],
+                         ['user-%02d' % i for i in range(CONFIG.MAX_LIST_MEMBERS)])
+
+        # get the next page
+        resp = self.client.get(reverse('acl:search_members', args=[self._aclobj.id]),
+                               {'keyword': 'user-', 'offset': CONFIG.MAX_LIST_MEMBERS})
+        self.assertEqual(resp.status_code, 200)
+        self.assertFalse(resp.json()['has_next'])
+        self.assertEqual(resp.json()['members'], [
+            {'id': Group.objects.get(name='user-group').id, 'name': 'user-group', 'type': 'group'}
+        ])
+
+        # inactive members and ones which don't match with the keyword are not returned
+        resp = self.client.get(reverse('acl:search_members', args=[self._aclobj.id]),
+                               {'keyword': 'deleted'})
+        self.assertEqual(resp.json()['members'], [])
+
+        # invalid offset
+        resp = self.client.get(reverse('acl:search_members', args=[self._aclobj.id]),
+                               {'offset': 'hoge'})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_search_members_without_permission(self):
+        self.admin_login()
+        aclobj = ACLBase.objects.create(name='private', created_user=self._aclobj.created_user,
+                                        is_public=False)
+        self.guest_login()
+
+        resp = self.client.get(reverse('acl:search_members', args=[aclobj.id]))
+        self.assertEqual(resp.status_code, 400)
 
     def test_get_acl_set(self):
         self.admin_login()
@@ -336,3 +398,117 @@ class ViewTest(AironeViewTest):
         self.admin_login()
         resp = self.client.get(reverse('acl:index', args=[obj.id]))
         self.assertEqual(resp.status_code, 200)
+
+    @patch('acl.tasks.apply_acl.delay', Mock(side_effect=tasks.apply_acl))
+    def test_apply_acl_with_condition(self):
+        admin = self.admin_login()
+        user = User.objects.create(username='hoge')
+        group = Group.objects.create(name='fuga')
+
+        entity = Entity.objects.create(name='entity', created_user=admin)
+        entity_attr = EntityAttr.objects.create(name='attr', type=AttrTypeValue['string'],
+                                                created_user=admin, parent_entity=entity)
+        entity.attrs.add(entity_attr)
+        entries = []
+        for name in ['foo-1', 'foo-2', 'bar']:
+            entry = Entry.objects.create(name=name, schema=entity, created_user=admin)
+            entry.complement_attrs(admin)
+            entries.append(entry)
+
+        params = {
+            'condition': {'entity_id': str(entity.id), 'entry_name': 'foo'},
+            'acl': [
+                {'member_type': 'user', 'member_id': str(user.id),
+                 'value': str(ACLType.Writable.id)},
+                {'member_type': 'group', 'member_id': str(group.id),
+                 'value': str(ACLType.Full.id)},
+            ],
+            'is_public': False,
+            'default_permission': str(ACLType.Readable.id),
+        }
+        resp = self.client.post(reverse('acl:apply'), json.dumps(params), 'application/json')
+        self.assertEqual(resp.status_code, 200)
+
+        job = Job.objects.get(id=resp.json()['job_id'])
+        self.assertEqual(job.operation, JobOperation.APPLY_ACL.value)
+        self.assertEqual(job.status, Job.STATUS['DONE'])
+        self.assertEqual(job.target.id, entity.id)
+
+        # ACL is applied to entity, entity_attr, the entries which match with entry_name and
+        # their attributes
+        targets = [entity, entity_attr, entries[0], entries[1]]
+        targets += [x for e in entries[:2] for x in e.attrs.all()]
+        self.assertEqual(job.text, 'ACL is applied to %d objects' % len(targets))
+        for aclobj in ACLBase.objects.filter(id__in=[x.id for x in targets]):
+            self.assertFalse(aclobj.is_public)
+            self.assertEqual(aclobj.default_permission, ACLType.Readable.id)
+            self.assertEqual([x.name for x in user.get_acls(aclobj)], [ACLType.Writable.name])
+            self.assertEqual([x.name for x in group.get_acls(aclobj)], [ACLType.Full.name])
+
+        # ACL of the entry which doesn't match with the condition is not changed
+        entries[2].refresh_from_db()
+        self.assertTrue(entries[2].is_public)
+        self.assertFalse(user.get_acls(entries[2]).exists())
+
+    @patch('acl.tasks.apply_acl.delay', Mock(side_effect=tasks.apply_acl))
+    def test_apply_acl_with_object_ids(self):
+        admin = self.admin_login()
+        user = User.objects.create(username='hoge')
+        user.permissions.add(self._aclobj.full)
+        other = ACLBase.objects.create(name='other', created_user=admin)
+
+        params = {
+            'object_ids': [str(self._aclobj.id)],
+            'acl': [{'member_type': 'user', 'member_id': str(user.id),
+                     'value': str(ACLType.Readable.id)}],
+        }
+        resp = self.client.post(reverse('acl:apply'), json.dumps(params), 'application/json')
+        self.assertEqual(resp.status_code, 200)
+
+        job = Job.objects.get(id=resp.json()['job_id'])
+        self.assertEqual(job.status, Job.STATUS['DONE'])
+        self.assertIsNone(job.target)
+
+        # is_public is not changed because it's not specified
+        self._aclobj.refresh_from_db()
+        self.assertTrue(self._aclobj.is_public)
+        self.assertEqual([x.name for x in user.get_acls(self._aclobj)], [ACLType.Readable.name])
+        self.assertFalse(user.get_acls(other).exists())
+
+    @patch('acl.tasks.apply_acl.delay', Mock(side_effect=tasks.apply_acl))
+    def test_apply_acl_without_permission(self):
+        admin = self.admin_login()
+        entity = Entity.objects.create(name='entity', created_user=admin, is_public=False)
+        aclobj = ACLBase.objects.create(name='private', created_user=admin, is_public=False)
+
+        user = self.guest_login()
+        acl = [{'member_type': 'user', 'member_id': str(user.id),
+                'value': str(ACLType.Full.id)}]
+
+        # user can't apply ACL of the entity which user doesn't have full permission
+        params = {'condition': {'entity_id': str(entity.id)}, 'acl': acl}
+        resp = self.client.post(reverse('acl:apply'), json.dumps(params), 'application/json')
+        self.assertEqual(resp.status_code, 400)
+
+        # objects which user doesn't have full permission are skipped
+        params = {'object_ids': [str(aclobj.id), str(self._aclobj.id)], 'acl': acl}
+        resp = self.client.post(reverse('acl:apply'), json.dumps(params), 'application/json')
+        self.assertEqual(resp.status_code, 200)
+
+        job = Job.objects.get(id=resp.json()['job_id'])
+        self.assertEqual(job.text, 'ACL is applied to 1 objects')
+        self.assertFalse(user.get_acls(aclobj).exists())
+
+    def test_apply_acl_with_invalid_params(self):
+        self.admin_login()
+
+        acl = [{'member_type': 'user', 'member_id': str(self._aclobj.created_user.id),
+                'value': str(ACLType.Full.id)}]
+        for params in [
+                {'acl': acl},
+                {'object_ids': ['hoge'], 'acl': acl},
+                {'condition': {'entity_id': '0'}, 'acl': acl},
+                {'object_ids': [str(self._aclobj.id)], 'acl': acl, 'is_public': 'true'},
+                {'object_ids': [str(self._aclobj.id)], 'acl': acl, 'default_permission': '3'}]:
+            resp = self.client.post(reverse('acl:apply'), json.dumps(params), 'application/json')
+            self.assertEqual(resp.status_code, 400)
@@ -5,4 +5,6 @@ from . import views
 urlpatterns = [
     url(r'^(\d+)/$', views.index, name='index'),
     url(r'^set$', views.set, name='set'),
+    url(r'^apply$', views.apply, name='apply'),
+    url(r'^search_members/(\d+)$', views.search_members, name='search_members'),
 ]
@@ -11,12 +11,27 @@ from airone.lib.profile import airone_profile
 from entity.models import Entity, EntityAttr
 from entry.models import Entry, Attribute
 from group.models import Group
+from job.models import Job
 from user.models import User
 from .models import ACLBase
+from .settings import CONFIG
 
 Logger = logging.getLogger(__name__)
 
 
+# This is the validator of ACL settings for each users and groups
+ACL_SETTINGS_VALIDATOR = {'name': 'acl', 'type': list, 'meta': [
+    {'name': 'member_type', 'type': str,
+     'checker': lambda x: x['member_type'] == 'user' or x['member_type'] == 'group'},
+    {'name': 'member_id', 'type': str,
+     'checker': lambda x: any(
+         [k.objects.filter(id=x['member_id']).exists() for k in [User, Group]]
+      )},
+    {'name': 'value', 'type': (str, type(None)),
+     'checker': lambda x: [y for y in ACLType.all() if int(x['value']) == y]},
+]}
+
+
 @http_get
 @check_permission(ACLBase, ACLType.Full)
 def index(request, obj_id):
@@ -25,14 +40,6 @@ def index(request, obj_id):
 
     target_obj = ACLBase.objects.get(id=obj_id).get_subclass_object()
 
-    # get ACLTypeID of target_obj if a permission is set
-    def get_current_permission(member):
-        permissions = [x for x in member.permissions.all() if x.get_objid() == target_obj.id]
-        if permissions:
-            return permissions[0].get_aclid()
-        else:
-            return 0
-
     # Some type of objects needs object that refers target_obj (e.g. Attribute)
     # for showing breadcrumb navigation.
     parent_obj = None
@@ -48,34 +55,56 @@ def index(request, obj_id):
         'object': target_obj,
         'parent': parent_obj,
         'acltypes': [{'id': x.id, 'name': x.label} for x in ACLType.all()],
-        'members': [{'id': x.id,
-                     'name': x.username,
-                     'current_permission': get_current_permission(x),
-                     'type': 'user'} for x in User.objects.filter(is_active=True)] +
-                   [{'id': x.id,
-                     'name': x.name,
-                     'current_permission': get_current_permission(x),
-                     'type': 'group'} for x in Group.objects.filter(is_active=True)]
+        # Only members who are granted permissions are shown, and others are added to the list
+        # by searching them with search_members.
+        'members': target_obj.get_granted_members(),
     }
     return render(request, 'edit_acl.html', context)
 
 
+@http_get
+@check_permission(ACLBase, ACLType.Full)
+def search_members(request, obj_id):
+    """
+    This returns users and groups whose name starts with the 'keyword' parameter in order of
+    name. The results are paginated by the 'offset' parameter.
+    """
+    keyword = request.GET.get('keyword', '')
+    try:
+        offset = int(request.GET.get('offset', 0))
+    except ValueError:
+        return HttpResponse('Invalid offset parameter is specified', status=400)
+
+    if offset < 0:
+        return HttpResponse('Invalid offset parameter is specified', status=400)
+
+    # Prefix matching is used to make use of the unique index of username and group name.
+    # Users and groups are fetched as many as needed for the page, and merged in order.
+    limit = offset + CONFIG.MAX_LIST_MEMBERS + 1
+    users = User.objects.filter(
+        is_active=True, username__startswith=keyword).order_by('username').values_list(
+            'id', 'username')[:limit]
+    groups = Group.objects.filter(
+        is_active=True, name__startswith=keyword).order_by('name').values_list(
+            'id', 'name')[:limit]
+
+    members = sorted([{'id': i, 'name': n, 'type': 'user'} for (i, n) in users] +
+                     [{'id': i, 'name': n, 'type': 'group'} for (i, n) in groups],
+                     key=lambda x: (x['name'], x['type']))
+
+    return JsonResponse({
+        'members': members[offset:offset + CONFIG.MAX_LIST_MEMBERS],
+        'has_next': len(members) > offset + CONFIG.MAX_LIST_MEMBERS,
+    })
+
+
 @airone_profile
 @http_post([
     {'name': 'object_id', 'type': str,
      'checker': lambda x: ACLBase.objects.filter(id=x['object_id']).exists()},
     {'name': 'object_type', 'type': str,
      'checker': lambda x: x['object_type']},
-    {'name': 'acl', 'type': list, 'meta': [
-        {'name': 'member_type', 'type': str,
-         'checker': lambda x: x['member_type'] == 'user' or x['member_type'] == 'group'},
-        {'name': 'member_id', 'type': str,
-         'checker': lambda x: any(
-             [k.objects.filter(id=x['member_id']).exists() for k in [User, Group]]
-          )},
-        {'name': 'value', 'type': (str, type(None)),
-         'checker': lambda x: [y for y in ACLType.all() if int(x['value']) == y]},
-    ]},
+    ACL_SETTINGS_VALIDATOR,
     {'name': 'default_permission', 'type': str, 'checker': lambda x: any(
         [y == int(x['default_permission']) for y in ACLType.all()]
     )},
@@ -105,6 +134,11 @@ def set(request, recv_data):
     # update the Public/Private flag parameter
     acl_obj.save()
 
+    # The Public/Private flag and default permission of Entry are also registered to the
+    # Elasticsearch to filter search results by them.
+    if isinstance(acl_obj, Entry):
+        acl_obj.register_es()
+
     for acl_data in [x for x in recv_data['acl'] if x['value']]:
         if acl_data['member_type'] == 'user':
             member = User.objects.get(id=acl_data['member_id'])
@@ -132,6 +166,68 @@ def set(request, recv_data):
     })
 
 
+@airone_profile
+@http_post([
+    ACL_SETTINGS_VALIDATOR,
+])
+def apply(request, recv_data):
+    """
+    This applies the same ACL to many objects as a background job. Target objects are
+    specified by 'object_ids', or by 'condition' which indicates an Entity and all of the
+    objects belonging to it (Entries could be narrowed down by 'entry_name' of it).
+    'is_public' and 'default_permission' are changed only when they are specified.
+    """
+    user = User.objects.get(id=request.user.id)
+
+    params = {'acl': recv_data['acl']}
+    target = None
+    if 'object_ids' in recv_data:
+        if (not isinstance(recv_data['object_ids'], list) or
+                not all([str(x).isdigit() for x in recv_data['object_ids']])):
+            return HttpResponse('Invalid object_ids parameter is specified', status=400)
+
+        params['object_ids'] = [int(x) for x in recv_data['object_ids']]
+
+    elif 'condition' in recv_data and isinstance(recv_data['condition'], dict):
+        target = Entity.objects.filter(id=recv_data['condition'].get('entity_id'),
+                                       is_active=True).first()
+        if not target:
+            return HttpResponse('Failed to get entity of specified condition', status=400)
+
+        if not user.has_permission(target, ACLType.Full):
+            return HttpResponse(
+                "User(%s) doesn't have permission to change this ACL" % user.username,
+                status=400)
+
+        params['condition'] = {
+            'entity_id': target.id,
+            'entry_name': str(recv_data['condition'].get('entry_name', '')),
+        }
+
+    else:
+        return HttpResponse('Either object_ids or condition is required', status=400)
+
+    if 'is_public' in recv_data:
+        if not isinstance(recv_data['is_public'], bool):
+            return HttpResponse('Invalid is_public parameter is specified', status=400)
+
+        params['is_public'] = recv_data['is_public']
+
+    if 'default_permission' in recv_data:
+        if not [x for x in ACLType.all() if str(x.id) == str(recv_data['default_permission'])]:
+            return HttpResponse('Invalid default_permission parameter is specified', status=400)
+
+        params['default_permission'] = int(recv_data['default_permission'])
+
+    job = Job.new_apply_acl(user, target, params=params)
+    job.run()
+
+    return JsonResponse({
+        'job_id': job.id,
+        'msg': 'Success to schedule applying ACL',
+    })
+
+
 def _get_acl_model(object_id):
     if int(object_id) == ACLObjType.Entity:
         return Entity
@@ -147,9 +243,7 @@ def _get_acl_model(object_id):
 
 def _set_permission(member, acl_obj, acl_type):
     # clear unset permissions of target ACLbased object
-    for _acltype in ACLType.all():
-        if _acltype != acl_type and _acltype != ACLType.Nothing:
-            member.permissions.remove(getattr(acl_obj, _acltype.name))
+    member.permissions.remove(*[x for x in member.get_acls(acl_obj) if x.name != acl_type.name])
 
     # set new permissoin to be specified except for 'Nothing' permission
     if acl_type != ACLType.Nothing:
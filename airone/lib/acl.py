@@ -1,7 +1,14 @@
+import threading
+
+from contextlib import contextmanager
+from functools import wraps
 from six import with_metaclass
 
 __all__ = ['ACLType', 'ACLObjType']
 
+# This holds results of permission checks in the current permission_check_cache context
+_permission_check_local = threading.local()
+
 
 class Iteratable(object):
     def __iter__(self):
@@ -66,5 +73,41 @@ class ACLType(Iteratable):
 
 def get_permitted_objects(user, model, permission_level):
     # This method assumes that model is a subclass of ACLBase
-    return [x for x in model.objects.all()
-            if user.has_permission(x, permission_level) and x.is_active]
+    return user.filter_permitted(model.objects.filter(is_active=True), permission_level)
+
+
+@contextmanager
+def permission_check_cache():
+    """
+    In this context, results of permission checks are memorized for each user, object and
+    permission level. This is expected to be used in the scope of a request or a job, where
+    ACL is not changed while processing and same objects are checked repeatedly.
+    """
+    if get_permission_check_cache() is not None:
+        # the case of nested context, the outer one is used as it is
+        yield
+        return
+
+    _permission_check_local.cache = {}
+    try:
+        yield
+    finally:
+        _permission_check_local.cache = None
+
+
+def get_permission_check_cache():
+    return getattr(_permission_check_local, 'cache', None)
+
+
+def clear_permission_check_cache():
+    # This is called when ACL is changed in the permission_check_cache context
+    if get_permission_check_cache() is not None:
+        _permission_check_local.cache.clear()
+
+
+def with_permission_check_cache(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with permission_check_cache():
+            return func(*args, **kwargs)
+    return wrapper
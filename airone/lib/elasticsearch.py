@@ -1,10 +1,15 @@
+import itertools
 import json
+import os
 import re
+import threading
+import time
 
 from datetime import datetime
 from django.conf import settings
-from django.db.models import Q
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, Transport, helpers
+from airone.lib.acl import ACLType
+from airone.lib.log import Logger
 from airone.lib.types import AttrTypeValue
 from entry.settings import CONFIG
 
@@ -12,41 +17,139 @@ from entry.settings import CONFIG
 class ESS(Elasticsearch):
     MAX_TERM_SIZE = 32766
 
-    def __init__(self, index=None, *args, **kwargs):
-        self.additional_config = False
+    # This is the transport (the pool of connections to the nodes) which is shared by all ESS
+    # objects in a process with the id of the process and the nodes. A process which is forked
+    # from another one makes its own transport not to share the connections with the parent.
+    _transport = (None, None)
+    _transport_lock = threading.Lock()
+
+    # This is the time when the index was refreshed last in this process, which is used to
+    # coalesce refreshes by the 'coalesced' REFRESH_POLICY
+    _last_refresh_time = None
 
+    def __init__(self, index=None, *args, **kwargs):
         if not index:
             self._index = settings.ES_CONFIG['INDEX']
 
         if ('timeout' not in kwargs) and (settings.ES_CONFIG['TIMEOUT'] is not None):
             kwargs['timeout'] = settings.ES_CONFIG['TIMEOUT']
 
-        super(ESS, self).__init__(settings.ES_CONFIG['NODES'], *args, **kwargs)
+        super(ESS, self).__init__(settings.ES_CONFIG['NODES'], transport_class=ESS._get_transport,
+                                  *args, **kwargs)
+
+    @classmethod
+    def _get_transport(kls, hosts, **kwargs):
+        """
+        This returns the transport of this process, which is created at the first time with
+        the options of the connection pool in ES_CONFIG.
+        """
+        key = (os.getpid(), json.dumps(hosts, sort_keys=True))
+        with kls._transport_lock:
+            (transport_key, transport) = kls._transport
+            if transport_key != key:
+                transport = Transport(hosts, **dict({
+                    'maxsize': settings.ES_CONFIG['MAXSIZE'],
+                    'sniff_on_start': settings.ES_CONFIG['SNIFF_ON_START'],
+                    'sniff_on_connection_fail': settings.ES_CONFIG['SNIFF_ON_CONNECTION_FAIL'],
+                    'sniffer_timeout': settings.ES_CONFIG['SNIFFER_TIMEOUT'],
+                }, **kwargs))
+                kls._transport = (key, transport)
+
+            return transport
 
     def delete(self, *args, **kwargs):
         return super(ESS, self).delete(index=self._index, *args, **kwargs)
 
     def refresh(self, *args, **kwargs):
+        ESS._last_refresh_time = time.monotonic()
         return self.indices.refresh(index=self._index, *args, **kwargs)
 
+    def get_refresh_param(self):
+        """This returns the refresh parameter of write requests according to REFRESH_POLICY"""
+        if settings.ES_CONFIG['REFRESH_POLICY'] == 'wait_for':
+            return 'wait_for'
+        return 'false'
+
+    def refresh_by_policy(self):
+        """
+        This is called after documents are written instead of refreshing the index for every
+        write. Only the 'coalesced' REFRESH_POLICY refreshes the index, and it's skipped when
+        the index has been refreshed in this process within REFRESH_INTERVAL seconds.
+        """
+        if settings.ES_CONFIG['REFRESH_POLICY'] != 'coalesced':
+            return
+
+        interval = settings.ES_CONFIG['REFRESH_INTERVAL']
+        if ESS._last_refresh_time is None or time.monotonic() - ESS._last_refresh_time >= interval:
+            self.refresh(ignore=[404])
+
     def index(self, *args, **kwargs):
         return super(ESS, self).index(index=self._index, *args, **kwargs)
 
-    def search(self, *args, **kwargs):
-        # expand max_result_window parameter which indicates numbers to return at one searching
-        if not self.additional_config:
-            self.additional_config = True
+    def bulk(self, *args, **kwargs):
+        return super(ESS, self).bulk(index=self._index, *args, **kwargs)
+
+    def bulk_index(self, actions, doc_type='entry', refresh='false'):
+        """
+        This sends actions (documents to index or delete, in the format of the bulk helpers of
+        elasticsearch-py) which are consumed from the iterable in batches of BULK_CHUNK_SIZE
+        actions, and each batch is split by BULK_MAX_BYTES bytes into bulk requests. Actions
+        which are rejected because the cluster is busy are retried with exponential backoff.
+        This returns the number of succeeded actions and the failed ones, which are also
+        logged for each batch. Deleting a document which doesn't exist is not a failure.
+        The refresh is the parameter of each bulk requests (e.g. get_refresh_param()).
+        """
+        (success_count, errors) = (0, [])
+
+        actions = iter(actions)
+        for batch_index in itertools.count():
+            batch = list(itertools.islice(actions, settings.ES_CONFIG['BULK_CHUNK_SIZE']))
+            if not batch:
+                break
+
+            batch_errors = []
+            for (ok, item) in helpers.streaming_bulk(
+                    self, batch, doc_type=doc_type, refresh=refresh, raise_on_error=False,
+                    chunk_size=settings.ES_CONFIG['BULK_CHUNK_SIZE'],
+                    max_chunk_bytes=settings.ES_CONFIG['BULK_MAX_BYTES'],
+                    max_retries=settings.ES_CONFIG['BULK_MAX_RETRIES'],
+                    initial_backoff=settings.ES_CONFIG['BULK_INITIAL_BACKOFF']):
+
+                if ok or item.get('delete', {}).get('status') == 404:
+                    success_count += 1
+                else:
+                    batch_errors.append(item)
 
-            body = {"index": {"max_result_window": settings.ES_CONFIG['MAXIMUM_RESULTS_NUM']}}
-            self.indices.put_settings(index=self._index, body=body)
+            if batch_errors:
+                Logger.warning('Failed to process %d/%d actions in the batch %d of bulk: %s' %
+                               (len(batch_errors), len(batch), batch_index, batch_errors[0]))
+                errors += batch_errors
 
-        return super(ESS, self).search(index=self._index,
-                                       size=settings.ES_CONFIG['MAXIMUM_RESULTS_NUM'], *args,
-                                       **kwargs)
+        return (success_count, errors)
+
+    def search(self, *args, **kwargs):
+        return super(ESS, self).search(index=self._index, *args, **kwargs)
+
+    def get_index_settings(self):
+        """
+        This returns the settings of the index which are applied when it's created, or by
+        update_index_settings() for the index which was created before.
+        """
+        return {
+            'index': {
+                # expand max_result_window parameter which indicates numbers to return at
+                # one searching
+                'max_result_window': settings.ES_CONFIG['MAXIMUM_RESULTS_NUM'],
+            }
+        }
+
+    def update_index_settings(self):
+        return self.indices.put_settings(index=self._index, body=self.get_index_settings())
 
     def recreate_index(self):
         self.indices.delete(index=self._index, ignore=[400, 404])
         self.indices.create(index=self._index, ignore=400, body=json.dumps({
+            'settings': self.get_index_settings(),
             'mappings': {
                 'entry': {
                     'properties': {
@@ -58,6 +161,14 @@ class ESS(Elasticsearch):
                                 'keyword': {'type': 'keyword'},
                             },
                         },
+                        'is_public': {
+                            'type': 'boolean',
+                            'index': 'true',
+                        },
+                        'default_permission': {
+                            'type': 'integer',
+                            'index': 'true',
+                        },
                         'entity': {
                             'type': 'nested',
                             'properties': {
@@ -116,7 +227,10 @@ class ESS(Elasticsearch):
 __all__ = [
     'make_query',
     'execute_query',
+    'scan_query',
     'make_search_results',
+    'make_permission_filter',
+    'make_referral_filter',
     'prepend_escape_character',
     'is_date_check'
 ]
@@ -145,8 +259,10 @@ def make_query(hint_entity_ids, hint_attrs, entry_name, or_match):
 
     """
 
-    # Making a query to send ElasticSearch by the specified parameters
+    # Making a query to send ElasticSearch by the specified parameters.
+    # Search results are made only from the attributes in the documents.
     query = {
+        "_source": ["attr"],
         "query": {
             "bool": {
                 'filter': [],
@@ -199,6 +315,100 @@ def make_query(hint_entity_ids, hint_attrs, entry_name, or_match):
     return query
 
 
+def make_referral_filter(hint_entity_ids, hint_referral):
+    """Create a filter to get only the entries that are narrowed down by the reference entry.
+
+    The entries which are referred are looked up by ReferenceEdge in advance, so that
+    Elasticsearch counts and pages the narrowed down results.
+
+    Do the following:
+    1. If blank characters are entered in the filtering condition of the reference entry,
+       only entries that are not referenced by other entries are filtered.
+    2. In cases other than the above, only entries whose filtering condition is
+       included in the entry name being referred to are acquired.
+
+    Args:
+        hint_entity_ids (list(str)): Entity ID specified in the search condition input
+        hint_referral (str): Input value used to refine the reference entry.
+
+    Returns:
+        dict[str, str]: The created filter is returned.
+
+    """
+    from entry.models import ReferenceEdge
+
+    edges = ReferenceEdge.objects.all()
+    if hint_entity_ids:
+        edges = edges.filter(referral__entry__schema__id__in=hint_entity_ids)
+
+    if (CONFIG.EMPTY_SEARCH_CHARACTER == hint_referral or
+            CONFIG.EMPTY_SEARCH_CHARACTER_CODE == hint_referral):
+
+        referred_ids = edges.filter(attr__is_active=True).values_list('referral_id', flat=True)
+        return {'bool': {'must_not': {'ids': {'values': [str(x) for x in
+                                                         set(referred_ids)]}}}}
+
+    referred_ids = edges.filter(entry__name__iregex=prepend_escape_character(
+        CONFIG.ESCAPE_CHARACTERS_REFERRALS_ENTRY, hint_referral)).values_list(
+            'referral_id', flat=True)
+    return {'ids': {'values': [str(x) for x in set(referred_ids)]}}
+
+
+def make_permission_filter(permitted_ids, readable_entity_ids):
+    """Create a filter to get only the entries that user can read.
+
+    An entry is readable when user is granted to read it, or when it's readable by default
+    (public or readable default permission) and user can read its entity. This is the same
+    condition with User.has_permission, so ACL is checked by the filter instead of each results.
+    The documents which were registered before ACL parameters were indexed don't have them,
+    so they are regarded as public until they are registered again.
+
+    The number of IDs in the filter is limited by CONFIG.MAX_PERMISSION_FILTER_IDS. Only that
+    number of permitted entries are filtered in, and entities are not checked when user can
+    read more than that (only ACL parameters of entries are checked).
+
+    Args:
+        permitted_ids (list(int)): ID of entries that user is granted readable permission
+        readable_entity_ids (list(int)): ID of entities that user can read
+
+    Returns:
+        dict[str, str]: The created filter is returned.
+
+    """
+    max_ids = CONFIG.MAX_PERMISSION_FILTER_IDS
+
+    permitted_ids = list(permitted_ids[:max_ids + 1])
+    if len(permitted_ids) > max_ids:
+        Logger.warning('Only %d of entries which user is permitted are filtered in' % max_ids)
+        permitted_ids = permitted_ids[:max_ids]
+
+    default_filter = [{'bool': {
+        'should': [
+            {'term': {'is_public': True}},
+            {'bool': {'must_not': {'exists': {'field': 'is_public'}}}},
+            {'range': {'default_permission': {'gte': ACLType.Readable.id}}},
+        ],
+        'minimum_should_match': 1,
+    }}]
+
+    readable_entity_ids = list(readable_entity_ids[:max_ids + 1])
+    if len(readable_entity_ids) <= max_ids:
+        default_filter.insert(0, {'nested': {
+            'path': 'entity',
+            'query': {'terms': {'entity.id': [int(x) for x in readable_entity_ids]}}
+        }})
+
+    return {
+        'bool': {
+            'should': [
+                {'ids': {'values': [str(x) for x in permitted_ids]}},
+                {'bool': {'filter': default_filter}},
+            ],
+            'minimum_should_match': 1,
+        }
+    }
+
+
 def _get_regex_pattern(keyword):
     """Create a regex pattern pattern.
 
@@ -584,11 +794,16 @@ def _make_an_attribute_filter(hint, keyword):
     return adding_cond
 
 
-def execute_query(query):
+def execute_query(query, size, offset=0):
     """Run a search query.
 
+    All results should be streamed by scan_query instead of requesting them at once.
+
     Args:
         query (dict[str, str]): Search query
+        size (int): Number of results to return
+        offset (int): Defaults to 0.
+            Number of results to skip from the first one
 
     Raises:
         Exception: If query execution fails, output error details.
@@ -598,13 +813,38 @@ def execute_query(query):
 
     """
     try:
-        res = ESS().search(body=query, ignore=[404], sort=['name.keyword:asc'])
+        res = ESS().search(body=query, ignore=[404], sort=['name.keyword:asc'], size=size,
+                           from_=offset)
     except Exception as e:
         raise(e)
 
     return res
 
 
+def scan_query(query, es=None, preserve_order=True):
+    """Run a search query and stream its results by the scroll API.
+
+    The results are fetched by SCROLL_SIZE at a time while they are consumed,
+    so the memory usage doesn't depend on the number of results.
+
+    Args:
+        query (dict[str, str]): Search query
+        es (ESS): Defaults to None.
+            Client to send the query, a new one is used when it's None
+        preserve_order (bool): Defaults to True.
+            Flag to sort the results by the name of entries, which costs to scroll them
+
+    Returns:
+        generator: Hits of the search results
+
+    """
+    params = {'sort': ['name.keyword:asc']} if preserve_order else {}
+
+    return helpers.scan(es or ESS(), query=query, preserve_order=preserve_order, ignore=[404],
+                        size=settings.ES_CONFIG['SCROLL_SIZE'],
+                        scroll=settings.ES_CONFIG['SCROLL_TIMEOUT'], **params)
+
+
 def make_search_results(results, res, hint_attrs, limit, hint_referral):
     """Acquires and returns the attribute values held by each search result
 
@@ -613,16 +853,9 @@ def make_search_results(results, res, hint_attrs, limit, hint_referral):
 
     Do the following:
     1. Keep a list of IDs of all entries that have been found in Elasticsearch.
-    2. If the reference entry filtering conditions have been entered,
-       the following processing is performed.
-       If not entered, get entry object from search result of Elasticsearch.
-
-       2-1. If blank characters are entered in the filtering condition of the reference entry,
-            only entries that are not referenced by other entries are filtered.
-       2-2. In cases other than the above, only entries whose filtering condition is
-            included in the entry name being referred to are acquired.
-       2-3. Get the entry object from the entry ID obtained above.
-
+       (The results have been narrowed down by the reference entry in the query.
+       See make_referral_filter)
+    2. Get entry object from search result of Elasticsearch.
     3. Get attributes for each entry for the maximum number of displayed items
        from the Elasticsearch search results.
     4. For the attribute of the acquired entry,
@@ -643,58 +876,31 @@ def make_search_results(results, res, hint_attrs, limit, hint_referral):
             that was hit in the search
 
     """
-    from entry.models import Entry, AttributeValue
+    from entry.models import Entry, ReferenceEdge
 
     # set numbers of found entries
     results['ret_count'] = res['hits']['total']
 
     # get django objects from the hit information from Elasticsearch
     hit_entry_ids = [x['_id'] for x in res['hits']['hits']]
-    if isinstance(hint_referral, str) and hint_referral:
-        # If the hint_referral parameter is specified,
-        # this filters results that only have specified referral entry.
-
-        if (CONFIG.EMPTY_SEARCH_CHARACTER == hint_referral or
-                CONFIG.EMPTY_SEARCH_CHARACTER_CODE == hint_referral):
-
-            hit_entry_ids_num = [int(x) for x in hit_entry_ids]
-            filtered_ids = set(hit_entry_ids_num) - set(AttributeValue.objects.filter(
-                    Q(referral__id__in=hit_entry_ids,
-                      parent_attr__is_active=True,
-                      is_latest=True) |
-                    Q(referral__id__in=hit_entry_ids,
-                      parent_attr__is_active=True,
-                      parent_attrv__is_latest=True)
-                    ).values_list('referral_id', flat=True))
-
-        else:
-
-            filtered_ids = AttributeValue.objects.filter(
-                    Q(parent_attr__parent_entry__name__iregex=prepend_escape_character(
-                        CONFIG.ESCAPE_CHARACTERS_REFERRALS_ENTRY, hint_referral),
-                      referral__id__in=hit_entry_ids,
-                      is_latest=True) |
-                    Q(parent_attr__parent_entry__name__iregex=prepend_escape_character(
-                        CONFIG.ESCAPE_CHARACTERS_REFERRALS_ENTRY, hint_referral),
-                      referral__id__in=hit_entry_ids,
-                      parent_attrv__is_latest=True)
-                    ).values_list('referral', flat=True)
-
-        hit_entries = Entry.objects.filter(pk__in=filtered_ids, is_active=True)
-
-        # reset matched count by filtered results by hint_referral parameter
-        results['ret_count'] = len(hit_entries)
-    else:
-        hit_entries = Entry.objects.filter(id__in=hit_entry_ids, is_active=True)
+    hit_entries = Entry.objects.filter(
+        id__in=hit_entry_ids, is_active=True).select_related('schema').order_by('name')
 
+    hit_sources = {int(x['_id']): x['_source']['attr'] for x in res['hits']['hits']}
     hit_infos = {}
     for entry in hit_entries:
         if len(hit_infos) >= limit:
             break
 
-        hit_infos[entry] = [
-            x['_source']['attr'] for x in res['hits']['hits'] if int(x['_id']) == entry.id
-        ][0]
+        hit_infos[entry] = hit_sources[entry.id]
+
+    # When 'hint_referral' parameter is specifed, get referred entries of all results at once
+    referrals = {}
+    if hint_referral is not False:
+        for edge in ReferenceEdge.objects.filter(
+                referral__id__in=[x.id for x in hit_infos.keys()],
+                entry__is_active=True).select_related('entry__schema').order_by('entry'):
+            referrals.setdefault(edge.referral_id, {})[edge.entry.id] = edge.entry
 
     for (entry, hit_attrs) in sorted(hit_infos.items(), key=lambda x: x[0].name):
         ret_info = {
@@ -709,7 +915,7 @@ def make_search_results(results, res, hint_attrs, limit, hint_referral):
                 'id': x.id,
                 'name': x.name,
                 'schema': x.schema.name,
-            } for x in entry.get_referred_objects()]
+            } for x in referrals.get(entry.id, {}).values()]
 
         # formalize attribute values according to the type
         for attrinfo in hit_attrs:
@@ -162,7 +162,7 @@ def render(request, template, context={}):
         # added default parameters for navigate
         entity_objects = entity_models.Entity.objects.order_by('name').filter(is_active=True)
         context['navigator'] = {
-            'entities': [x for x in entity_objects if user.has_permission(x, ACLType.Readable)],
+            'entities': user.filter_permitted(entity_objects, ACLType.Readable),
             'acl_objtype': {
                 'entity': ACLObjType.Entity,
                 'entry': ACLObjType.Entry,
@@ -194,6 +194,7 @@ def render(request, template, context={}):
             'EXPORT': JobOperation.EXPORT_ENTRY.value,
             'RESTORE': JobOperation.RESTORE_ENTRY.value,
             'EXPORT_SEARCH_RESULT': JobOperation.EXPORT_SEARCH_RESULT.value,
+            'APPLY_ACL': JobOperation.APPLY_ACL.value,
         }
     }
 
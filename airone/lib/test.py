@@ -4,22 +4,25 @@ import os
 
 from django.test import TestCase, Client, override_settings
 from django.conf import settings
+from group.models import Group
 from user.models import User
 from .elasticsearch import ESS
 
 
-@override_settings(ES_CONFIG={
-    'NODES': settings.ES_CONFIG['NODES'],
+@override_settings(ES_CONFIG=dict(settings.ES_CONFIG, **{
     'INDEX': 'test-airone',
     'MAXIMUM_RESULTS_NUM': 10000,
     'TIMEOUT': 300
-})
+}))
 class AironeTestCase(TestCase):
     def setUp(self):
         # Before starting test, clear all documents in the Elasticsearch of test index
         self._es = ESS()
         self._es.recreate_index()
 
+        # Groups which were cached in the previous test might be rolled back
+        Group.clear_cache()
+
         # update airone app
         settings.AIRONE['FILE_STORE_PATH'] = '/tmp/airone_app_test'
         if not os.path.exists(settings.AIRONE['FILE_STORE_PATH']):
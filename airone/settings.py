@@ -205,7 +205,30 @@ ES_CONFIG = {
     'NODES': ['localhost:9200'],
     'INDEX': 'airone',
     'MAXIMUM_RESULTS_NUM': 500000,
-    'TIMEOUT': None
+    'TIMEOUT': None,
+
+    # options of the pool of connections to the nodes which is shared in each process
+    'MAXSIZE': 10,
+    'SNIFF_ON_START': False,
+    'SNIFF_ON_CONNECTION_FAIL': False,
+    'SNIFFER_TIMEOUT': None,
+
+    # parameters of the bulk indexer which sends documents in batches by the bulk API
+    'BULK_CHUNK_SIZE': 500,
+    'BULK_MAX_BYTES': 10 * 1024 * 1024,
+    'BULK_MAX_RETRIES': 3,
+    'BULK_INITIAL_BACKOFF': 2,
+
+    # This specifies how documents are made searchable after they are written.
+    # - 'wait_for' : each write request waits for the next periodic refresh of the index
+    # - 'coalesced': each worker refreshes the index at most once in REFRESH_INTERVAL seconds
+    # - 'none'     : documents are made searchable only by the periodic refresh of the index
+    'REFRESH_POLICY': 'wait_for',
+    'REFRESH_INTERVAL': 1,
+
+    # parameters of the scroll which streams all search results (e.g. to export them)
+    'SCROLL_SIZE': 1000,
+    'SCROLL_TIMEOUT': '5m',
 }
 
 #
@@ -0,0 +1,139 @@
+import json
+import mock
+
+from airone.lib.elasticsearch import ESS, execute_query
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+
+@override_settings(ES_CONFIG=dict(settings.ES_CONFIG, **{
+    'BULK_CHUNK_SIZE': 2,
+    'BULK_INITIAL_BACKOFF': 0,
+}))
+class ESSBulkIndexTest(SimpleTestCase):
+    def setUp(self):
+        self._es = ESS()
+        self._requests = []
+
+    def _bulk(self, statuses):
+        """This returns a fake of the bulk API which returns the status for each documents"""
+        def _side_effect(body, **kwargs):
+            actions = [json.loads(x) for x in body.splitlines()
+                       if any([y in x for y in ['"index"', '"delete"']])]
+            self._requests.append(actions)
+
+            return {'errors': True, 'items': [
+                {op_type: {'_id': info['_id'], 'status': statuses(op_type, info['_id'])}}
+                for (op_type, info) in [list(x.items())[0] for x in actions]]}
+
+        return mock.patch.object(ESS, 'bulk', mock.Mock(side_effect=_side_effect))
+
+    def test_bulk_index_in_batches(self):
+        documents = ({'_id': x, '_source': {'name': 'e-%d' % x}} for x in range(5))
+
+        with self._bulk(lambda op_type, doc_id: 201):
+            self.assertEqual(self._es.bulk_index(documents), (5, []))
+
+        self.assertEqual([[x['index']['_id'] for x in r] for r in self._requests],
+                         [[0, 1], [2, 3], [4]])
+
+    def test_bulk_index_with_rejected_documents(self):
+        rejected = set()
+
+        def _statuses(op_type, doc_id):
+            # the document 1 is rejected once, and the document 2 is always failed
+            if doc_id == 1 and doc_id not in rejected:
+                rejected.add(doc_id)
+                return 429
+            return 400 if doc_id == 2 else 201
+
+        documents = ({'_id': x, '_source': {'name': 'e-%d' % x}} for x in range(4))
+        with self._bulk(_statuses):
+            (count, errors) = self._es.bulk_index(documents)
+
+        self.assertEqual(count, 2 + 1)
+        self.assertEqual(errors, [{'index': {'_id': 2, 'status': 400}}])
+        self.assertEqual([[x['index']['_id'] for x in r] for r in self._requests],
+                         [[0, 1], [1], [2, 3]])
+
+    def test_bulk_index_to_delete_documents(self):
+        documents = ({'_op_type': 'delete', '_id': x} for x in range(2))
+
+        # deleting the document which doesn't exist is not an error
+        with self._bulk(lambda op_type, doc_id: 404 if doc_id else 200):
+            self.assertEqual(self._es.bulk_index(documents), (2, []))
+
+
+class ESSRefreshPolicyTest(SimpleTestCase):
+    def test_refresh_param(self):
+        for (policy, param) in [('wait_for', 'wait_for'), ('coalesced', 'false'),
+                                ('none', 'false')]:
+            with override_settings(ES_CONFIG=dict(settings.ES_CONFIG, REFRESH_POLICY=policy)):
+                self.assertEqual(ESS().get_refresh_param(), param)
+
+    @mock.patch('elasticsearch.client.IndicesClient.refresh')
+    def test_refresh_by_policy(self, mock_refresh):
+        for policy in ['wait_for', 'none']:
+            with override_settings(ES_CONFIG=dict(settings.ES_CONFIG, REFRESH_POLICY=policy)):
+                ESS().refresh_by_policy()
+        self.assertFalse(mock_refresh.called)
+
+        # the index is refreshed at most once in the REFRESH_INTERVAL by the coalesced policy
+        ESS._last_refresh_time = None
+        with override_settings(ES_CONFIG=dict(settings.ES_CONFIG, REFRESH_POLICY='coalesced',
+                                              REFRESH_INTERVAL=60)):
+            for _ in range(3):
+                ESS().refresh_by_policy()
+        self.assertEqual(mock_refresh.call_count, 1)
+
+        with override_settings(ES_CONFIG=dict(settings.ES_CONFIG, REFRESH_POLICY='coalesced',
+                                              REFRESH_INTERVAL=0)):
+            ESS().refresh_by_policy()
+        self.assertEqual(mock_refresh.call_count, 2)
+
+
+class ESSTransportTest(SimpleTestCase):
+    def test_transport_is_shared_in_process(self):
+        self.assertEqual(ESS().transport, ESS().transport)
+
+        # a forked process makes its own transport
+        transport = ESS().transport
+        with mock.patch('os.getpid', mock.Mock(return_value=-1)):
+            self.assertNotEqual(ESS().transport, transport)
+            self.assertEqual(ESS().transport, ESS().transport)
+
+    def test_transport_options(self):
+        es_config = dict(settings.ES_CONFIG, MAXSIZE=25, NODES=['localhost:19200'])
+        with override_settings(ES_CONFIG=es_config):
+            transport = ESS().transport
+
+        self.assertEqual(transport.hosts, [{'host': 'localhost', 'port': 19200}])
+        self.assertEqual(transport.kwargs['maxsize'], 25)
+
+    @mock.patch('elasticsearch.client.IndicesClient.put_settings')
+    def test_search_without_updating_index_settings(self, mock_put_settings):
+        with mock.patch('elasticsearch.Elasticsearch.search',
+                        mock.Mock(return_value={})) as mock_search:
+            ESS().search(body={'query': {'match_all': {}}})
+
+        self.assertFalse(mock_put_settings.called)
+
+        # the number of results is left to the default of Elasticsearch unless it's specified
+        self.assertNotIn('size', mock_search.call_args[1])
+
+    def test_execute_query_with_size(self):
+        with mock.patch('elasticsearch.Elasticsearch.search',
+                        mock.Mock(return_value={})) as mock_search:
+            execute_query({'query': {'match_all': {}}}, 10, 20)
+
+        self.assertEqual(mock_search.call_args[1]['size'], 10)
+        self.assertEqual(mock_search.call_args[1]['from_'], 20)
+
+    @mock.patch('elasticsearch.client.IndicesClient.delete', mock.Mock())
+    @mock.patch('elasticsearch.client.IndicesClient.create')
+    def test_recreate_index_with_settings(self, mock_create):
+        ESS().recreate_index()
+
+        body = json.loads(mock_create.call_args[1]['body'])
+        self.assertEqual(body['settings']['index']['max_result_window'],
+                         settings.ES_CONFIG['MAXIMUM_RESULTS_NUM'])
@@ -21,14 +21,16 @@ class EntityAttrsAPI(APIView):
         entities = [Entity.objects.filter(id=x, is_active=True).first()
                     for x in entity_ids.split(',') if x]
 
+        def get_permitted_attr_names(attrs):
+            return user.filter_permitted(attrs, ACLType.Readable).values_list('name', flat=True)
+
         def get_attrs_of_specific_entities():
             return reduce(lambda x, y: set(x) & set(y),
-                          [[a.name for a in e.attrs.filter(is_active=True)
-                              if user.has_permission(a, ACLType.Readable)] for e in entities])
+                          [list(get_permitted_attr_names(e.attrs.filter(is_active=True)))
+                           for e in entities])
 
         def get_attrs_of_all_entities():
-            return sorted(list(set([x.name for x in EntityAttr.objects.filter(is_active=True)
-                                    if user.has_permission(x, ACLType.Readable)])), key=lambda x: x)
+            return sorted(set(get_permitted_attr_names(EntityAttr.objects.filter(is_active=True))))
 
         if entities:
             # the case invalid entity-id was specified
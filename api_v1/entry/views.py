@@ -32,10 +32,12 @@ class EntrySearchAPI(APIView):
         hint_attr = request.data.get('attrinfo')
         hint_referral = request.data.get('referral')
         entry_limit = request.data.get('entry_limit', CONFIG_ENTRY.MAX_LIST_ENTRIES)
+        entry_offset = request.data.get('entry_offset', 0)
 
         if (not isinstance(hint_entity, list) or
                 not isinstance(hint_attr, list) or
-                not isinstance(entry_limit, int)):
+                not isinstance(entry_limit, int) or
+                not isinstance(entry_offset, int)):
             return Response('The type of parameter is incorrect',
                             status=status.HTTP_400_BAD_REQUEST)
 
@@ -62,6 +64,7 @@ class EntrySearchAPI(APIView):
         resp = Entry.search_entries(user, hint_entity_ids, hint_attr, entry_limit, **{
             'hint_referral': hint_referral,
             'entry_name': hint_entry_name,
+            'offset': entry_offset,
         })
 
         return Response({'result': resp}, content_type='application/json; charset=UTF-8')
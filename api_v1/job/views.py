@@ -42,6 +42,7 @@ class JobAPI(APIView):
                 'export': JobOperation.EXPORT_ENTRY.value,
                 'export_search_result': JobOperation.EXPORT_SEARCH_RESULT.value,
                 'restore': JobOperation.RESTORE_ENTRY.value,
+                'apply_acl': JobOperation.APPLY_ACL.value,
             }
         }
 
@@ -15,8 +15,11 @@ class GetEntrySerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'attrs')
 
     def get_attrs(self, obj):
+        attrs = obj.attrs.filter(is_active=True).select_related('schema')
+        latest_values = obj.get_latest_value_snapshot(attrs)
+
         def get_attr_value(attr):
-            attrv = attr.get_latest_value()
+            attrv = latest_values[attr.id] or attr.get_latest_value()
 
             if not attrv:
                 return ''
@@ -62,16 +65,16 @@ class GetEntrySerializer(serializers.ModelSerializer):
                 return attrv.date
 
             elif attr.schema.type & AttrTypeValue['group']:
-                group = Group.objects.get(id=attrv.value)
+                group = Group.get_active_group(attrv.value)
                 return {
                     'id': group.id,
                     'name': group.name,
-                }
+                } if group else None
 
         return [{
             'name': x.schema.name,
             'value': get_attr_value(x),
-        } for x in obj.attrs.filter(is_active=True)]
+        } for x in attrs]
 
 
 class PostEntrySerializer(serializers.Serializer):
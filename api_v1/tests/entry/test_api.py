@@ -214,3 +214,28 @@ class APITest(AironeViewTest):
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(resp.json()['result']['ret_count'], 0)
         self.assertEqual(resp.json()['result']['ret_values'], [])
+
+    def test_search_with_entry_offset(self):
+        user = self.guest_login()
+
+        entity = Entity.objects.create(name='entity', created_user=user)
+        for name in ['foo', 'bar', 'baz']:
+            Entry.objects.create(name=name, schema=entity, created_user=user).register_es()
+
+        # send search request to get the second page of results which has one result
+        params = {
+            'entities': ['entity'],
+            'attrinfo': [],
+            'entry_limit': 1,
+            'entry_offset': 1,
+        }
+        resp = self.client.post('/api/v1/entry/search', json.dumps(params), 'application/json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()['result']['ret_count'], 3)
+        self.assertEqual([x['entry']['name'] for x in resp.json()['result']['ret_values']],
+                         ['baz'])
+
+        # send search request with invalid type of offset
+        params['entry_offset'] = '1'
+        resp = self.client.post('/api/v1/entry/search', json.dumps(params), 'application/json')
+        self.assertEqual(resp.status_code, 400)
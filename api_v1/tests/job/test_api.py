@@ -52,6 +52,7 @@ class APITest(AironeViewTest):
             'export': JobOperation.EXPORT_ENTRY.value,
             'export_search_result': JobOperation.EXPORT_SEARCH_RESULT.value,
             'restore': JobOperation.RESTORE_ENTRY.value,
+            'apply_acl': JobOperation.APPLY_ACL.value,
         })
         self.assertEqual(results['constant']['status'], {
             'processing': Job.STATUS['PROCESSING'],
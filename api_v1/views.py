@@ -64,6 +64,7 @@ class EntryAPI(APIView):
 
             entry = Entry.objects.get(id=sel.validated_data['id'])
             entry.name = sel.validated_data['name']
+            entry.save()
             entry.set_status(Entry.STATUS_EDITING)
 
         elif Entry.objects.filter(**entry_condition).exists():
@@ -132,8 +133,13 @@ class EntryAPI(APIView):
             query = Q(query, name=param_entry_name)
 
         param_offset = request.GET.get('offset', 0)
-        retinfo = [x.to_dict(user) for x in
-                   Entry.objects.filter(query)[int(param_offset):ENTRY_CONFIG.MAX_LIST_ENTRIES]]
+        entries = list(
+            Entry.objects.filter(query)[int(param_offset):ENTRY_CONFIG.MAX_LIST_ENTRIES])
+
+        # load latest values of all entries at once
+        Entry.prefetch_latest_values(entries)
+
+        retinfo = [x.to_dict(user) for x in entries]
         if not any(retinfo):
             return Response({'result': 'Failed to find entry'},
                             status=status.HTTP_404_NOT_FOUND)
@@ -5,7 +5,6 @@ import yaml
 
 from airone.celery import app
 from airone.lib.types import AttrTypeValue
-from django.conf import settings
 from entry.models import Entry
 from job.models import Job
 from natsort import natsorted
@@ -166,19 +165,19 @@ def export_search_result(self, job_id):
     if 'entry_name' in recv_data and recv_data['entry_name']:
         hint_entry_name = recv_data['entry_name']
 
-    resp = Entry.search_entries(user,
-                                recv_data['entities'],
-                                recv_data['attrinfo'],
-                                settings.ES_CONFIG['MAXIMUM_RESULTS_NUM'],
-                                hint_referral=has_referral,
-                                entry_name=hint_entry_name)
+    # search results are streamed to export all of them without loading them at once
+    values = Entry.stream_search_entries(user,
+                                         recv_data['entities'],
+                                         recv_data['attrinfo'],
+                                         hint_referral=has_referral,
+                                         entry_name=hint_entry_name)
 
     io_stream = None
     if recv_data['export_style'] == 'yaml':
-        io_stream = _yaml_export(job, resp['ret_values'], recv_data, has_referral)
+        io_stream = _yaml_export(job, values, recv_data, has_referral)
 
     elif recv_data['export_style'] == 'csv':
-        io_stream = _csv_export(job, resp['ret_values'], recv_data, has_referral)
+        io_stream = _csv_export(job, values, recv_data, has_referral)
 
     if io_stream:
         job.set_cache(io_stream.getvalue())
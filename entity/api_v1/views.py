@@ -1,6 +1,6 @@
 from airone.lib.profile import airone_profile
 from airone.lib.http import http_get
-from airone.lib.acl import ACLType
+from airone.lib.acl import ACLType, get_permitted_objects
 
 from entity.models import Entity
 from django.http.response import JsonResponse
@@ -16,6 +16,5 @@ def get_entities(request):
         'entities': [{
             'id': x.id,
             'name': x.name,
-        } for x in Entity.objects.filter(is_active=True)
-            if user.has_permission(x, ACLType.Readable)]
+        } for x in get_permitted_objects(user, Entity, ACLType.Readable)]
     })
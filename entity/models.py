@@ -38,10 +38,14 @@ class EntityAttr(ACLBase):
         return False
 
     def unset_latest_flag(self):
-        from entry.models import AttributeValue
+        from entry.models import AttributeValue, Entry, LatestValueSnapshot, ReferenceEdge
         AttributeValue.objects.filter(parent_attr__schema=self,
                                       is_latest=True).update(is_latest=False)
 
+        for entry in Entry.objects.filter(schema=self.parent_entity_id, is_active=True):
+            LatestValueSnapshot.update(entry, entry.attrs.filter(schema=self))
+        ReferenceEdge.objects.filter(attr__schema=self).delete()
+
 
 class Entity(ACLBase):
     STATUS_TOP_LEVEL = 1 << 0
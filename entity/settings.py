@@ -2,4 +2,5 @@ from airone.lib.settings import Settings
 
 CONFIG = Settings({
     'DASHBOARD_NUM_ITEMS': 7,
+    'COMPLEMENT_ATTRS_CHUNK_SIZE': 1000,
 })
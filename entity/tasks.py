@@ -0,0 +1,29 @@
+from airone.celery import app
+from entity.models import Entity
+from entry.models import Entry
+from job.models import Job
+
+from .settings import CONFIG
+
+
+@app.task(bind=True)
+def complement_attrs(self, job_id):
+    job = Job.objects.get(id=job_id)
+
+    if job.proceed_if_ready():
+        job.update(Job.STATUS['PROCESSING'])
+
+        entity = Entity.objects.get(id=job.target.id)
+        entry_ids = list(Entry.objects.filter(schema=entity, is_active=True).values_list(
+            'id', flat=True).order_by('id'))
+
+        for index in range(0, len(entry_ids), CONFIG.COMPLEMENT_ATTRS_CHUNK_SIZE):
+            # abort processing when job is canceled
+            if job.is_canceled():
+                return
+
+            entries = Entry.objects.filter(
+                id__in=entry_ids[index:index + CONFIG.COMPLEMENT_ATTRS_CHUNK_SIZE])
+            Entry.bulk_complement_attrs(entity, list(entries), job.user)
+
+        job.update(Job.STATUS['DONE'])
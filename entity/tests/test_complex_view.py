@@ -10,6 +10,7 @@ from django.urls import reverse
 
 from entity.models import Entity, EntityAttr
 from entry.models import Entry, AttributeValue
+from entity import tasks as entity_tasks
 from entry import tasks
 
 from unittest.mock import patch
@@ -23,6 +24,7 @@ class ComplexViewTest(AironeViewTest):
 
     @patch('entry.tasks.create_entry_attrs.delay', Mock(side_effect=tasks.create_entry_attrs))
     @patch('entry.tasks.edit_entry_attrs.delay', Mock(side_effect=tasks.edit_entry_attrs))
+    @patch('entity.tasks.complement_attrs.delay', Mock(side_effect=entity_tasks.complement_attrs))
     def test_add_attr_after_creating_entry(self):
         """
         This test executes followings
@@ -106,14 +108,14 @@ class ComplexViewTest(AironeViewTest):
                                 'application/json')
         self.assertEqual(resp.status_code, 200)
 
-        # Checks that the Attributes associated to the added EntityAttrs are not created
+        # Checks that the Attributes associated to the added EntityAttrs are created by the job
         self.assertEqual(entity.attrs.count(), 3)
-        self.assertEqual(entry.attrs.count(), 1)
+        self.assertEqual(entry.attrs.count(), entity.attrs.count())
 
         resp = self.client.get(reverse('entry:show', args=[entry.id]))
         self.assertEqual(resp.status_code, 200)
 
-        # Checks that the new Attibutes is created in the show processing
+        # Checks that the show processing doesn't create Attibutes any more
         self.assertEqual(entity.attrs.count(), 3)
         self.assertEqual(entry.attrs.count(), entity.attrs.count())
 
@@ -12,6 +12,9 @@ from airone.lib.types import AttrTypeStr, AttrTypeObj, AttrTypeText
 from airone.lib.types import AttrTypeArrStr, AttrTypeArrObj
 from airone.lib.types import AttrTypeValue
 from django.contrib.auth.models import Permission
+from entity import tasks
+from job.models import Job, JobOperation
+from unittest.mock import patch, Mock
 
 
 class ViewTest(AironeViewTest):
@@ -219,6 +222,7 @@ class ViewTest(AironeViewTest):
                                 'application/json')
         self.assertEqual(resp.status_code, 400)
 
+    @patch('entity.tasks.complement_attrs.delay', Mock(side_effect=tasks.complement_attrs))
     def test_post_edit_with_valid_params(self):
         user = self.admin_login()
 
@@ -258,6 +262,7 @@ class ViewTest(AironeViewTest):
         self.assertEqual(History.objects.filter(operation=History.ADD_ATTR).count(), 1)
         self.assertEqual(History.objects.filter(operation=History.MOD_ATTR).count(), 2)
 
+    @patch('entity.tasks.complement_attrs.delay', Mock(side_effect=tasks.complement_attrs))
     def test_post_edit_after_creating_entry(self):
         user = self.admin_login()
 
@@ -289,7 +294,20 @@ class ViewTest(AironeViewTest):
 
         self.assertEqual(resp.status_code, 200)
         self.assertEqual(entity.attrs.count(), 2)
-        self.assertEqual(entry.attrs.count(), 1)
+
+        # checks the Attribute of added EntityAttr is created for the entry by the job
+        job = Job.objects.get(target=entity, operation=JobOperation.COMPLEMENT_ATTRS.value)
+        self.assertEqual(job.status, Job.STATUS['DONE'])
+        self.assertEqual(entry.attrs.count(), 2)
+        self.assertEqual(entry.attrs.get(schema__name='bar').parent_entry, entry)
+
+        # checks the job is not created when no EntityAttr is added
+        params['attrs'] = params['attrs'][:1]
+        resp = self.client.post(reverse('entity:do_edit', args=[entity.id]),
+                                json.dumps(params),
+                                'application/json')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(Job.objects.filter(target=entity).count(), 1)
 
     def test_post_edit_attribute_type(self):
         user = self.admin_login()
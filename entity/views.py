@@ -10,6 +10,7 @@ from .models import Entity
 from .models import EntityAttr
 from user.models import User, History
 from entry.models import Entry, AttributeValue
+from job.models import Job
 
 from airone.lib.types import AttrTypes, AttrTypeValue
 from airone.lib.http import http_get, http_post
@@ -30,9 +31,8 @@ Logger = logging.getLogger(__name__)
 def index(request):
     user = User.objects.get(id=request.user.id)
 
-    entity_objects = Entity.objects.order_by('name').filter(is_active=True)
     context = {
-        'entities': [x for x in entity_objects if user.has_permission(x, ACLType.Readable)]
+        'entities': get_permitted_objects(user, Entity, ACLType.Readable).order_by('name')
     }
     return render(request, 'list_entities.html', context)
 
@@ -42,8 +42,7 @@ def create(request):
     user = User.objects.get(id=request.user.id)
 
     context = {
-        'entities': [x for x in Entity.objects.filter(is_active=True)
-                     if user.has_permission(x, ACLType.Readable)],
+        'entities': get_permitted_objects(user, Entity, ACLType.Readable),
         'attr_types': AttrTypes
     }
     return render(request, 'create_entity.html', context)
@@ -141,6 +140,7 @@ def do_edit(request, entity_id, recv_data):
     entity.save()
 
     # update processing for each attrs
+    is_attr_added = False
     for attr in recv_data['attrs']:
         if 'deleted' in attr:
             # In case of deleting attribute which has been already existed
@@ -204,6 +204,12 @@ def do_edit(request, entity_id, recv_data):
             # register History to register adding EntityAttr
             history.add_attr(attr_obj)
 
+            is_attr_added = True
+
+    # create Attributes of the added EntityAttrs for the existing entries in background
+    if is_attr_added:
+        Job.new_complement_attrs(user, entity).run()
+
     return JsonResponse({
         'entity_id': entity.id,
         'entity_name': entity.name,
@@ -296,7 +302,8 @@ def export(request):
         "EntityAttr": []
     }
 
-    entities = get_permitted_objects(user, Entity, ACLType.Readable)
+    entities = get_permitted_objects(user, Entity, ACLType.Readable).select_related(
+        'created_user')
     for entity in entities:
         data["Entity"].append({
             "created_user": entity.created_user.username,
@@ -306,7 +313,8 @@ def export(request):
             "status": entity.status,
         })
 
-    attrs = get_permitted_objects(user, EntityAttr, ACLType.Readable)
+    attrs = get_permitted_objects(user, EntityAttr, ACLType.Readable).select_related(
+        'created_user', 'parent_entity')
     for attr in attrs:
         data["EntityAttr"].append({
             "created_user": attr.created_user.username,
@@ -6,7 +6,7 @@ from import_export.instance_loaders import CachedInstanceLoader
 from import_export.admin import ImportExportModelAdmin
 from user.models import User
 from .models import Entry
-from .models import Attribute, AttributeValue
+from .models import Attribute, AttributeValue, LatestValueSnapshot, ReferenceEdge
 from acl.models import ACLBase
 from entity.models import Entity, EntityAttr
 
@@ -76,6 +76,9 @@ class AttrValueResource(AironeModelResource):
             instance.save(update_fields=['is_latest', 'data_type', 'parent_attrv'])
             self._saved_instance = instance
 
+            LatestValueSnapshot.update(attr.parent_entry, [attr])
+            ReferenceEdge.update(id=attr.id)
+
     @classmethod
     def after_import_completion(self, results):
         # make relation between the array of AttributeValue
@@ -90,6 +93,10 @@ class AttrValueResource(AironeModelResource):
                     # append related AttributeValue if it's not existed
                     attr_value.data_array.add(AttributeValue.objects.get(id=child_id))
 
+            LatestValueSnapshot.update(attr_value.parent_attr.parent_entry,
+                                       [attr_value.parent_attr])
+            ReferenceEdge.update(id=attr_value.parent_attr_id)
+
 
 class AttrResource(AironeModelResource):
     _IMPORT_INFO = {
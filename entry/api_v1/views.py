@@ -221,6 +221,11 @@ def get_entry_history(request, entry_id):
     if not all([isinstance(x, int) for x in params.values()]):
         return HttpResponse('parameter "index" and "count" are mandatory', status=400)
 
+    # cursor is the id of the last AttributeValue of the previous page, which is optional
+    cursor = request.GET.get('cursor') or None
+    if cursor is not None and not cursor.isdigit():
+        return HttpResponse('invaid parameter value "cursor" is specified', status=400)
+
     entry = Entry.objects.filter(id=entry_id).first()
     if not entry:
         return HttpResponse("Specified entry doesn't exist", status=400)
@@ -235,7 +240,8 @@ def get_entry_history(request, entry_id):
 
         raise TypeError("Type %s not serializable" % type(obj))
 
-    history = entry.get_value_history(user, count=params['count'], index=params['index'])
+    history = entry.get_value_history(user, count=params['count'], index=params['index'],
+                                      cursor=int(cursor) if cursor else None)
 
     return JsonResponse({
         'results': json.loads(json.dumps(history, default=json_serial)),
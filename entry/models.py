@@ -1,8 +1,13 @@
+import itertools
+import json
+
 from collections.abc import Iterable
 from datetime import datetime, date
 
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Prefetch, Q, Value, When, prefetch_related_objects
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
 from django.core.cache import cache
 from django.conf import settings
 
@@ -10,13 +15,14 @@ from entity.models import EntityAttr, Entity
 from user.models import User
 from group.models import Group
 
-from acl.models import ACLBase
-from airone.lib.acl import ACLObjType, ACLType
+from acl.models import ACLBase, ACLPermission
+from airone.lib.acl import ACLObjType, ACLType, with_permission_check_cache
 from airone.lib.types import AttrTypeStr, AttrTypeObj, AttrTypeText
 from airone.lib.types import AttrTypeArrStr, AttrTypeArrObj
 from airone.lib.types import AttrTypeValue
 from airone.lib.elasticsearch import (
-    ESS, make_query, execute_query, make_search_results, is_date_check)
+    ESS, make_query, execute_query, scan_query, make_search_results, make_permission_filter,
+    make_referral_filter, is_date_check)
 from airone.lib import auto_complement
 
 from .settings import CONFIG
@@ -59,12 +65,16 @@ class AttributeValue(models.Model):
     parent_attrv = models.ForeignKey('AttributeValue', null=True, related_name='child')
 
     def set_status(self, val):
+        """This sets the bits of status by an atomic UPDATE statement as ACLBase.set_status"""
         self.status |= val
-        self.save()
+        if self.pk:
+            AttributeValue.objects.filter(id=self.pk).update(status=F('status').bitor(val))
 
     def del_status(self, val):
+        """This clears the bits of status by an atomic UPDATE statement as ACLBase.del_status"""
         self.status &= ~val
-        self.save()
+        if self.pk:
+            AttributeValue.objects.filter(id=self.pk).update(status=F('status').bitand(~val))
 
     def get_status(self, val):
         return self.status & val
@@ -109,11 +119,9 @@ class AttributeValue(models.Model):
                     return attrv.referral.name
 
         def _get_group_value(attrv):
-            group = Group.objects.filter(id=attrv.value, is_active=True)
+            group = Group.get_active_group(attrv.value)
             if not group:
                 return None
-            else:
-                group = group.first()
 
             if with_metainfo:
                 return {'id': group.id, 'name': group.name}
@@ -160,7 +168,7 @@ class AttributeValue(models.Model):
 
     def format_for_history(self):
         def _get_group_value(attrv):
-            return Group.objects.filter(id=attrv.value, is_active=True).first()
+            return Group.get_active_group(attrv.value)
 
         if not self.data_type:
             # complement data_type as the current type of Attribute
@@ -235,17 +243,169 @@ class AttributeValue(models.Model):
 
         elif isinstance(val, str):
             if val.isdigit():
-                obj_group = Group.objects.filter(id=val, is_active=True).first()
+                obj_group = Group.get_active_group(val)
             else:
-                obj_group = Group.objects.filter(name=val, is_active=True).first()
+                obj_group = Group.get_active_group_by_name(val)
 
         elif isinstance(val, int):
-            obj_group = Group.objects.filter(id=val, is_active=True).first()
+            obj_group = Group.get_active_group(val)
 
         # when value is invalid value (e.g. False, empty string) set 0
         # not to cause ValueError exception at other retrieval processing.
         return str(obj_group.id) if obj_group else ''
 
+    @classmethod
+    def uniform_storable_for_groups(kls, values):
+        """
+        This is the same with uniform_storable_for_group, but this converts multiple values
+        at once by looking up the cached active Groups once.
+        """
+        def _get_id(val):
+            if isinstance(val, int) or (isinstance(val, str) and val.isdigit()):
+                return str(int(val))
+
+        groups_by_id = Group.get_active_groups()
+        groups_by_name = {x.name: x for x in groups_by_id.values()}
+
+        results = []
+        for val in values:
+            obj_group = None
+            if isinstance(val, Group) and val.is_active:
+                obj_group = val
+            elif _get_id(val):
+                obj_group = groups_by_id.get(_get_id(val))
+            elif isinstance(val, str):
+                obj_group = groups_by_name.get(val)
+
+            results.append(str(obj_group.id) if obj_group else '')
+
+        return results
+
+
+class LatestValueSnapshot(models.Model):
+    """
+    This holds the latest values of all Attributes of an Entry as a JSON document to read
+    them in a single query. The processing that changes the latest AttributeValue updates
+    this in the same transaction (see Entry.get_latest_value_snapshot).
+    """
+    entry = models.OneToOneField('Entry', primary_key=True,
+                                 related_name='latest_value_snapshot')
+    document = models.TextField()
+    updated_time = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def update(kls, entry, attrs=None):
+        """
+        This updates the data of specified Attributes in the snapshot of the Entry. The whole
+        snapshot is rebuilt when attrs is omitted or the snapshot doesn't exist yet.
+        """
+        with transaction.atomic():
+            # This locks the snapshot not to lose the data which is updated concurrently
+            (snapshot, created) = kls.objects.select_for_update().get_or_create(
+                entry=entry, defaults={'document': '{}'})
+
+            document = json.loads(snapshot.document)
+            if created or attrs is None:
+                document = {}
+                attrs = entry.attrs.filter(is_active=True).select_related('schema')
+
+            document.update(entry._make_latest_value_document(attrs))
+
+            snapshot.document = json.dumps(document)
+            snapshot.save()
+
+    @classmethod
+    def bulk_update(kls, entries, attrs):
+        """
+        This updates the data of specified Attributes in the existing snapshots of the Entries
+        in bulk. The Entries which don't have the snapshot yet get it at their next update.
+        """
+        with transaction.atomic():
+            documents = {x.entry_id: json.loads(x.document)
+                         for x in kls.objects.select_for_update().filter(entry__in=entries)}
+            if not documents:
+                return
+
+            attrs = {str(x.id): x for x in attrs if x.parent_entry_id in documents}
+            for (attr_id, data) in Entry._make_latest_value_document(
+                    list(attrs.values())).items():
+                documents[attrs[attr_id].parent_entry_id][attr_id] = data
+
+            kls.objects.filter(entry__in=documents.keys()).update(document=Case(
+                *[When(entry=x, then=Value(json.dumps(y))) for (x, y) in documents.items()],
+                output_field=models.TextField()))
+
+    @classmethod
+    def make_value_data(kls, attrv):
+        """This converts an AttributeValue to the storable data in the document"""
+        data = {
+            'data_type': attrv.data_type,
+            'value': attrv.value,
+            'boolean': attrv.boolean,
+            'date': attrv.date.strftime('%Y-%m-%d') if attrv.date else None,
+            'referral': attrv.referral_id,
+            'data_array': [],
+        }
+        if attrv.get_status(AttributeValue.STATUS_DATA_ARRAY_PARENT):
+            data['data_array'] = [kls.make_value_data(x) for x in attrv.data_array.all()]
+
+        return data
+
+
+class SnapshotValue(object):
+    """
+    This is a read-only substitute of AttributeValue which is restored from the data of
+    LatestValueSnapshot. This has the same parameters that are needed to read its value.
+    """
+
+    class DataArray(list):
+        def all(self):
+            return self
+
+    # The value is read in the same way of AttributeValue
+    get_value = AttributeValue.get_value
+
+    def __init__(self, attr, data, referrals):
+        self.parent_attr = attr
+        self.data_type = data['data_type']
+        self.value = data['value']
+        self.boolean = data['boolean']
+        self.date = None
+        if data['date']:
+            self.date = datetime.strptime(data['date'], '%Y-%m-%d').date()
+        self.referral = referrals.get(data['referral'])
+        self.data_array = self.DataArray([SnapshotValue(attr, x, referrals)
+                                          for x in data['data_array']])
+
+
+class ReferenceEdge(models.Model):
+    """
+    This is a reference from an Attribute (and its Entry) to the object which is referred by
+    the latest value of it, to look up objects that refer an Entry by an indexed query.
+    The processing that changes the latest AttributeValue rebuilds the edges of the changed
+    Attributes. Deleted Entries are filtered out when the edges are read.
+    """
+    entry = models.ForeignKey('Entry', related_name='reference_edges')
+    attr = models.ForeignKey('Attribute', related_name='reference_edges')
+    referral = models.ForeignKey(ACLBase, related_name='referred_edges')
+
+    class Meta:
+        unique_together = (('attr', 'referral'),)
+
+    @classmethod
+    def update(kls, **filters):
+        """This rebuilds the edges of the Attributes which match specified filters"""
+        attrs = Attribute.objects.filter(**filters)
+
+        kls.objects.filter(attr__in=attrs).delete()
+        kls.objects.bulk_create([kls(attr_id=attr_id, entry_id=entry_id, referral_id=referral_id)
+                                 for (attr_id, entry_id, referral_id) in set(
+            AttributeValue.objects.filter(
+                Q(is_latest=True) | Q(parent_attrv__is_latest=True),
+                parent_attr__in=attrs,
+                referral__isnull=False).values_list('parent_attr', 'parent_attr__parent_entry',
+                                                    'referral'))])
+
 
 class Attribute(ACLBase):
     values = models.ManyToManyField(AttributeValue)
@@ -261,7 +421,8 @@ class Attribute(ACLBase):
     # This checks whether each specified attribute needs to update
     def is_updated(self, recv_value):
         # the case new attribute-value is specified
-        if not self.values.exists():
+        last_value = self.values.last()
+        if not last_value:
             # the result depends on the specified value
             if isinstance(recv_value, bool):
                 # the case that first value is 'False' at the boolean typed parameter
@@ -269,7 +430,11 @@ class Attribute(ACLBase):
             else:
                 return recv_value
 
-        last_value = self.values.last()
+        # This fetches the elements of the latest value at once to compare them in memory
+        # (not to send queries for each elements)
+        last_elements = []
+        if self._validate_attr_values_of_array():
+            last_elements = list(last_value.data_array.all())
         if self.schema.type == AttrTypeStr or self.schema.type == AttrTypeText:
             # the case that specified value is empty or invalid
             if not recv_value:
@@ -286,13 +451,13 @@ class Attribute(ACLBase):
             elif recv_value and isinstance(recv_value, str):
                 recv_value = int(recv_value)
 
-            if not last_value.referral and not recv_value:
+            if not last_value.referral_id and not recv_value:
                 return False
-            elif last_value.referral and not recv_value:
+            elif last_value.referral_id and not recv_value:
                 return True
-            elif not last_value.referral and recv_value:
+            elif not last_value.referral_id and recv_value:
                 return True
-            elif last_value.referral.id != recv_value:
+            elif last_value.referral_id != recv_value:
                 return True
 
         elif self.schema.type == AttrTypeArrStr:
@@ -300,34 +465,38 @@ class Attribute(ACLBase):
             if not recv_value:
                 # Value would be changed as empty when there are any values
                 # in the latest AttributeValue
-                return last_value.data_array.count() > 0
+                return len(last_elements) > 0
 
             # the case of changing value
-            if last_value.data_array.count() != len(recv_value):
+            if len(last_elements) != len(recv_value):
                 return True
+
             # the case of appending or deleting
-            for value in recv_value:
-                if not last_value.data_array.filter(value=value).exists():
-                    return True
+            last_values = set([x.value for x in last_elements])
+            if any([value not in last_values for value in recv_value]):
+                return True
 
         elif self.schema.type == AttrTypeArrObj:
             # the case that specified value is empty or invalid
             if not recv_value:
                 # Value would be changed as empty when there are any values
                 # in the latest AttributeValue
-                return last_value.data_array.count() > 0
+                return len(last_elements) > 0
 
             # the case of changing value
-            if last_value.data_array.count() != len(recv_value):
+            if len(last_elements) != len(recv_value):
                 return True
 
             # the case of appending or deleting
+            last_referral_ids = set([x.referral_id for x in last_elements])
             for value in recv_value:
                 # formalize value type
                 if isinstance(value, Entry):
                     value = value.id
+                elif value is not None:
+                    value = int(value)
 
-                if not last_value.data_array.filter(referral__id=value).exists():
+                if value not in last_referral_ids:
                     return True
 
         elif self.schema.type == AttrTypeValue['boolean']:
@@ -353,11 +522,11 @@ class Attribute(ACLBase):
             if isinstance(recv_value['id'], Entry):
                 recv_value['id'] = recv_value['id'].id
 
-            if not last_value.referral and recv_value['id']:
+            if not last_value.referral_id and recv_value['id']:
                 return True
 
-            if (last_value.referral and recv_value['id'] and
-                    last_value.referral.id != int(recv_value['id'])):
+            if (last_value.referral_id and recv_value['id'] and
+                    last_value.referral_id != int(recv_value['id'])):
                 return True
 
         elif self.schema.type == AttrTypeValue['array_named_object']:
@@ -373,12 +542,12 @@ class Attribute(ACLBase):
             if not recv_value:
                 # Value would be changed as empty
                 # when there are any values in the latest AttributeValue
-                return last_value.data_array.count() > 0
+                return len(last_elements) > 0
 
             cmp_curr = []
-            for co_attrv in last_value.data_array.all():
-                if co_attrv.referral:
-                    cmp_curr.append('%s-%s' % (co_attrv.referral.id, co_attrv.value))
+            for co_attrv in last_elements:
+                if co_attrv.referral_id:
+                    cmp_curr.append('%s-%s' % (co_attrv.referral_id, co_attrv.value))
                 else:
                     cmp_curr.append('N-%s' % (co_attrv.value))
 
@@ -395,22 +564,16 @@ class Attribute(ACLBase):
                 return True
 
         elif self.schema.type == AttrTypeValue['array_group']:
+            active_group_ids = Group.get_active_groups().keys()
+
             # This is the case when input value is None, this returns True when
             # any available values are already exists.
             if not recv_value:
-                return any([
-                    Group.objects.filter(id=x.value, is_active=True).exists()
-                    for x in last_value.data_array.all()
-                ])
+                return any([x.value in active_group_ids for x in last_elements])
 
             return (
-                sorted([
-                    AttributeValue.uniform_storable_for_group(v)
-                    for v in recv_value if v]) !=
-                sorted([
-                    x.value for x in last_value.data_array.all()
-                    if Group.objects.filter(id=x.value, is_active=True).exists()
-                ])
+                sorted(AttributeValue.uniform_storable_for_groups([v for v in recv_value if v])) !=
+                sorted([x.value for x in last_elements if x.value in active_group_ids])
             )
 
         return False
@@ -452,8 +615,16 @@ class Attribute(ACLBase):
             attrv = AttributeValue.objects.create(**params)
             self.values.add(attrv)
 
+            LatestValueSnapshot.update(self.parent_entry, [self])
+
             return attrv
 
+        # The latest values might be loaded in advance by Entry.prefetch_latest_values
+        if hasattr(self, 'prefetched_latest_values') and self.prefetched_latest_values:
+            attrv = self.prefetched_latest_values[-1]
+            if attrv.data_type == self.schema.type:
+                return attrv
+
         attrv = self.values.filter(is_latest=True).last()
         if attrv:
             # When a type of attribute value is clear, a new Attribute value will be created
@@ -590,8 +761,9 @@ class Attribute(ACLBase):
                     return None
 
             if attr_type == AttrTypeValue['group']:
+                # the value of group is converted to the storable one in advance
                 attrv.boolean = boolean
-                attrv.value = AttributeValue.uniform_storable_for_group(val)
+                attrv.value = val
                 if not attrv.value:
                     return None
 
@@ -604,9 +776,7 @@ class Attribute(ACLBase):
                 elif isinstance(val, Entry):
                     attrv.referral = val
                 elif isinstance(val, str) or isinstance(val, int):
-                    ref_entry = Entry.objects.filter(id=val, is_active=True).first()
-                    if ref_entry:
-                        attrv.referral = ref_entry
+                    attrv.referral = referrals.get(str(val))
 
                 if not attrv.referral:
                     return
@@ -633,9 +803,7 @@ class Attribute(ACLBase):
                 if 'id' not in val or not val['id']:
                     pass
                 elif isinstance(val['id'], str) or isinstance(val['id'], int):
-                    ref_entry = Entry.objects.filter(id=val['id'], is_active=True).first()
-                    if ref_entry:
-                        attrv.referral = ref_entry
+                    attrv.referral = referrals.get(str(val['id']))
                 elif isinstance(val['id'], Entry):
                     attrv.referral = val['id']
                 else:
@@ -646,25 +814,55 @@ class Attribute(ACLBase):
 
             return attrv
 
+        # This is a helper method to get ids of referral entries which are specified by
+        # str or int value
+        def _get_referral_ids(values):
+            if self.schema.type & AttrTypeValue['named']:
+                values = [x['id'] for x in values if 'id' in x]
+
+            return [x for x in values if x and (isinstance(x, str) or isinstance(x, int))]
+
         # checks the type of specified value is acceptable for this Attribute object
         if not self._validate_value(value):
             raise TypeError('[%s] "%s" is not acceptable [attr_type:%d]' % (
                 self.schema.name, str(value), self.schema.type))
 
-        # Clear the flag that means target AttrValues are latet from the Values
-        # that are already created.
-        self.unset_latest_flag()
-
-        # Initialize AttrValue as None, because this may not created
-        # according to the specified parameters.
-        attr_value = AttributeValue.create(user, self)
+        values = [value]
         if self.schema.type & AttrTypeValue['array']:
-            attr_value.boolean = boolean
+            values = list(value) if value and isinstance(value, Iterable) else []
+
+        # This fetches all referral entries and groups at once
+        referrals = {}
+        if self.schema.type & AttrTypeValue['object']:
+            referrals = {str(x.id): x for x in Entry.objects.filter(
+                id__in=_get_referral_ids(values), is_active=True)}
+
+        if self.schema.type & AttrTypeValue['group']:
+            values = AttributeValue.uniform_storable_for_groups(values)
+
+        with transaction.atomic():
+            # This locks this Attribute until the transaction is finished not to add values to it
+            # concurrently, which would leave more than one latest values and insert the same
+            # ReferenceEdges twice.
+            list(Attribute.objects.select_for_update().filter(id=self.id).values_list('id'))
+
+            # Clear the flag that means target AttrValues are latet from the Values
+            # that are already created.
+            self.unset_latest_flag()
+
+            attr_value = AttributeValue(created_user=user,
+                                        parent_attr=self,
+                                        data_type=self.schema.type)
+            if self.schema.type & AttrTypeValue['array']:
+                # set status of parent data_array before creating it
+                attr_value.boolean = boolean
+                attr_value.status = AttributeValue.STATUS_DATA_ARRAY_PARENT
+            else:
+                _set_attrv(self.schema.type, values[0], attrv=attr_value)
 
-            # set status of parent data_array
-            attr_value.set_status(AttributeValue.STATUS_DATA_ARRAY_PARENT)
+            attr_value.save()
 
-            if value and isinstance(value, Iterable):
+            if self.schema.type & AttrTypeValue['array'] and values:
                 co_attrv_params = {
                     'created_user': user,
                     'parent_attr': self,
@@ -676,7 +874,7 @@ class Attribute(ACLBase):
 
                 # create and append updated values
                 attrv_bulk = []
-                for v in value:
+                for v in values:
                     # set AttributeValue for each values
                     co_attrv = _set_attrv((self.schema.type & ~AttrTypeValue['array']), v,
                                           params=co_attrv_params)
@@ -689,16 +887,27 @@ class Attribute(ACLBase):
                 AttributeValue.objects.bulk_create(attrv_bulk)
 
                 # set created leaf AttribueValues to the data_array parameter of
-                # parent AttributeValue
-                attr_value.data_array.add(*AttributeValue.objects.filter(parent_attrv=attr_value))
+                # parent AttributeValue. The relations are also created in bulk
+                # because the parent is a new one which doesn't have any relations.
+                AttributeValue.data_array.through.objects.bulk_create([
+                    AttributeValue.data_array.through(from_attributevalue=attr_value,
+                                                      to_attributevalue_id=x)
+                    for x in AttributeValue.objects.filter(
+                        parent_attrv=attr_value).values_list('id', flat=True)
+                ])
 
-        else:
-            _set_attrv(self.schema.type, value, attrv=attr_value)
+            # append new AttributeValue
+            Attribute.values.through.objects.create(attribute=self, attributevalue=attr_value)
+
+            # the latest value of parent entry is changed
+            LatestValueSnapshot.update(self.parent_entry, [self])
 
-        attr_value.save()
+            # only values of object typed attributes refer other objects
+            if self.schema.type & AttrTypeValue['object']:
+                ReferenceEdge.update(id=self.id)
 
-        # append new AttributeValue
-        self.values.add(attr_value)
+        if hasattr(self, 'prefetched_latest_values'):
+            del self.prefetched_latest_values
 
         return attr_value
 
@@ -826,7 +1035,7 @@ class Attribute(ACLBase):
                 updated_data = [
                     x.value for x in attrv.data_array.all()
                     if (x.value != AttributeValue.uniform_storable_for_group(value) and
-                        Group.objects.filter(id=x.value, is_active=True).exists())
+                        Group.get_active_group(x.value))
                 ]
 
             if self.is_updated(updated_data):
@@ -870,6 +1079,7 @@ class Attribute(ACLBase):
 
     def delete(self):
         super(Attribute, self).delete()
+        LatestValueSnapshot.update(self.parent_entry)
 
         def _may_remove_referral(referral):
             if not referral:
@@ -898,6 +1108,7 @@ class Attribute(ACLBase):
 
     def restore(self):
         super(Attribute, self).restore()
+        LatestValueSnapshot.update(self.parent_entry, [self])
 
         def _may_restore_referral(referral):
             if not referral:
@@ -975,15 +1186,8 @@ class Entry(ACLBase):
                                         is_public=base.is_public,
                                         default_permission=base.default_permission)
 
-        # inherits permissions of base object for user
-        [[user.permissions.add(getattr(attr, permission.name))
-            for permission in user.get_acls(base)]
-            for user in User.objects.filter(is_active=True)]
-
-        # inherits permissions of base object for each groups
-        [[group.permissions.add(getattr(attr, permission.name))
-            for permission in group.get_acls(base)]
-            for group in Group.objects.all()]
+        # inherits permissions of base object for each users and groups
+        attr.inherit_permissions(base)
 
         self.attrs.add(attr)
 
@@ -996,10 +1200,7 @@ class Entry(ACLBase):
         """
         This returns objects that refer current Entry in the AttributeValue
         """
-        ids = AttributeValue.objects.filter(
-                Q(referral=self, is_latest=True) |
-                Q(referral=self, parent_attrv__is_latest=True)
-                ).values_list('parent_attr__parent_entry', flat=True)
+        ids = ReferenceEdge.objects.filter(referral=self).values_list('entry', flat=True)
 
         return Entry.objects.filter(pk__in=ids, is_active=True)
 
@@ -1032,10 +1233,12 @@ class Entry(ACLBase):
         # Get auto complement user
         user = auto_complement.get_auto_complement_user(user)
 
-        for attr_id in (set(self.schema.attrs.filter(is_active=True).values_list('id', flat=True)) -
-                        set(self.attrs.filter(is_active=True).values_list('schema', flat=True))):
+        # Missing Attributes are usually created in advance by the job which is registered
+        # when EntityAttrs are added (Entry.bulk_complement_attrs), so this is a check by one
+        # query in most cases.
+        for entity_attr in self.schema.attrs.filter(is_active=True).exclude(
+                id__in=self.attrs.filter(is_active=True).values('schema')):
 
-            entity_attr = self.schema.attrs.get(id=attr_id)
             if not user.has_permission(entity_attr, ACLType.Readable):
                 continue
 
@@ -1049,23 +1252,183 @@ class Entry(ACLBase):
                     'created_user': user,
                     'parent_attr': newattr,
                     'data_type': entity_attr.type,
+                    'status': AttributeValue.STATUS_DATA_ARRAY_PARENT,
                 })
 
-                # Set status of parent data_array
-                attr_value.set_status(AttributeValue.STATUS_DATA_ARRAY_PARENT)
-
                 newattr.values.add(attr_value)
 
             # When multiple requests to add new Attribute came here, multiple Attriutes
             # might be existed. If there were, this would delete new one.
             self.may_remove_duplicate_attr(newattr)
 
+    @classmethod
+    def bulk_complement_attrs(kls, entity, entries, user):
+        """
+        This creates Attributes, which are appended after creation of Entity, for specified
+        entries of the entity in bulk. The initial AttributeValues of array typed ones are
+        also created in the same way as complement_attrs.
+        """
+        user = auto_complement.get_auto_complement_user(user)
+
+        entity_attrs = [x for x in entity.attrs.filter(is_active=True)
+                        if user.has_permission(x, ACLType.Readable)]
+        existing_attrs = set(Attribute.objects.filter(
+            parent_entry__in=entries, is_active=True).values_list('parent_entry', 'schema'))
+
+        with transaction.atomic():
+            attrs = Attribute.bulk_create([Attribute(
+                name=base.name,
+                schema=base,
+                created_user=user,
+                parent_entry=entry,
+                is_public=base.is_public,
+                default_permission=base.default_permission,
+            ) for entry in entries for base in entity_attrs
+                if (entry.id, base.id) not in existing_attrs])
+            if not attrs:
+                return []
+
+            # inherits permissions of base object for each users and groups
+            grants = {x.id: x.get_permission_grants() for x in entity_attrs}
+            for attr in attrs:
+                attr.inherit_permissions(attr.schema, grants[attr.schema_id])
+
+            Entry.attrs.through.objects.bulk_create([
+                Entry.attrs.through(entry_id=x.parent_entry_id, attribute_id=x.id) for x in attrs])
+
+            # Create initial AttributeValues of array typed Attributes for editing processing
+            array_attrs = [x for x in attrs if x.schema.type & AttrTypeValue['array']]
+            AttributeValue.objects.bulk_create([AttributeValue(
+                created_user=user,
+                parent_attr=x,
+                data_type=x.schema.type,
+                status=AttributeValue.STATUS_DATA_ARRAY_PARENT,
+            ) for x in array_attrs])
+
+            Attribute.values.through.objects.bulk_create([
+                Attribute.values.through(attribute_id=attr_id, attributevalue_id=attrv_id)
+                for (attr_id, attrv_id) in AttributeValue.objects.filter(
+                    parent_attr__in=array_attrs).values_list('parent_attr', 'id')])
+
+            LatestValueSnapshot.bulk_update(entries, attrs)
+
+        # When Attributes are complemented by other requests at the same time, this removes
+        # the new duplicate ones in the same way as complement_attrs.
+        duplicates = set([(x, y) for (x, y, _) in Attribute.objects.filter(
+            parent_entry__in=entries, is_active=True).values_list(
+            'parent_entry', 'schema').annotate(count=Count('id')).filter(count__gt=1)])
+        for attr in [x for x in attrs if (x.parent_entry_id, x.schema_id) in duplicates]:
+            attr.parent_entry.may_remove_duplicate_attr(attr)
+
+        return attrs
+
+    def get_latest_value_snapshot(self, attrs):
+        """
+        This returns the latest value of each specified Attribute of this entry by its id.
+        The value is a SnapshotValue which is restored from LatestValueSnapshot, or None
+        when the Attribute doesn't have any value. The values which the snapshot doesn't
+        cover are read from AttributeValues without saving them, not to write at reading.
+        """
+        def _is_covered(document, attr):
+            return (str(attr.id) in document and
+                    (document[str(attr.id)] is None or
+                     document[str(attr.id)]['data_type'] == attr.schema.type))
+
+        snapshot = LatestValueSnapshot.objects.filter(entry=self).first()
+        document = json.loads(snapshot.document) if snapshot else {}
+
+        uncovered_attrs = [x for x in attrs if not _is_covered(document, x)]
+        if uncovered_attrs:
+            document.update(self._make_latest_value_document(uncovered_attrs))
+
+        def _get_referral_ids(data):
+            return sum([_get_referral_ids(x) for x in data['data_array']], [data['referral']])
+
+        referral_ids = set(sum([_get_referral_ids(x) for x in document.values() if x], []))
+        referrals = {x.id: x for x in ACLBase.objects.filter(id__in=referral_ids)}
+
+        return {
+            x.id: SnapshotValue(x, document[str(x.id)], referrals) if document[str(x.id)] else None
+            for x in attrs
+        }
+
+    @classmethod
+    def _make_latest_value_document(kls, attrs):
+        # This gets the latest value of each Attribute in the same way of get_latest_value
+        latest_values = {}
+        for relation in Attribute.values.through.objects.filter(
+                attribute__in=attrs, attributevalue__is_latest=True).select_related(
+                'attributevalue').prefetch_related('attributevalue__data_array').order_by(
+                'attributevalue'):
+            latest_values[relation.attribute_id] = relation.attributevalue
+
+        # These are Attributes that have values but the available latest one is not found
+        attr_ids_with_values = set(Attribute.values.through.objects.filter(
+            attribute__in=[x for x in attrs if x.id not in latest_values]).values_list(
+            'attribute', flat=True))
+
+        document = {}
+        for attr in attrs:
+            attrv = latest_values.get(attr.id)
+            if not attrv or attrv.data_type != attr.schema.type:
+                if attr.id not in latest_values and attr.id not in attr_ids_with_values:
+                    document[str(attr.id)] = None
+                    continue
+
+                # This complements the latest value in the same way of reading it from Attribute
+                attrv = attr.get_latest_value()
+
+            document[str(attr.id)] = LatestValueSnapshot.make_value_data(attrv)
+
+        return document
+
+    def _get_latest_values(self, attrs):
+        # This reads the latest values loaded by prefetch_latest_values when they are available
+        if hasattr(self, 'prefetched_attrs'):
+            return {x.id: x.get_latest_value() for x in attrs}
+
+        latest_values = self.get_latest_value_snapshot(attrs)
+        return {x.id: latest_values[x.id] or x.get_latest_value() for x in attrs}
+
+    @classmethod
+    def prefetch_latest_values(kls, entries, attr_names=None):
+        """
+        This loads active Attributes of specified entries and their latest values with the
+        referrals and Groups in a constant number of queries. After calling this, the
+        get_latest_value() of each Attribute and get_value() of its latest value return
+        them without sending any query. When attr_names is specified, this loads only the
+        Attributes of those names.
+        """
+        attrs_query = Q(is_active=True)
+        if attr_names is not None:
+            attrs_query &= Q(schema__name__in=attr_names)
+
+        prefetch_related_objects(
+            entries,
+            Prefetch('schema__attrs', queryset=EntityAttr.objects.filter(is_active=True),
+                     to_attr='prefetched_attrs'),
+            Prefetch('attrs', queryset=Attribute.objects.filter(attrs_query).select_related(
+                'schema'), to_attr='prefetched_attrs'),
+            Prefetch('prefetched_attrs__values',
+                     queryset=AttributeValue.objects.filter(is_latest=True).select_related(
+                         'referral').order_by('id'),
+                     to_attr='prefetched_latest_values'),
+            Prefetch('prefetched_attrs__prefetched_latest_values__data_array',
+                     queryset=AttributeValue.objects.select_related('referral')))
+
+        for attr in sum([x.prefetched_attrs for x in entries], []):
+            for attrv in attr.prefetched_latest_values:
+                attrv.parent_attr = attr
+
+    @with_permission_check_cache
     def get_available_attrs(self, user, permission=ACLType.Readable, get_referral_entries=False,
                             is_active=True):
         # To avoid unnecessary DB access for caching referral entries
         ret_attrs = []
-        attrs = [x for x in self.attrs.filter(is_active=is_active, schema__is_active=True)
+        attrs = [x for x in self.attrs.filter(is_active=is_active,
+                                              schema__is_active=True).select_related('schema')
                  if user.has_permission(x, permission)]
+        latest_values = self.get_latest_value_snapshot(attrs)
         for attr in sorted(attrs, key=lambda x: x.schema.index):
             attrinfo = {}
 
@@ -1077,12 +1440,8 @@ class Entry(ACLBase):
 
             # set last-value of current attributes
             attrinfo['last_value'] = ''
-            if attr.values.exists():
-                last_value = attr.get_latest_value()
-                if not last_value.data_type:
-                    last_value.data_type = attr.schema.type
-                    last_value.save()
-
+            last_value = latest_values[attr.id]
+            if last_value:
                 if last_value.data_type == AttrTypeStr or last_value.data_type == AttrTypeText:
                     attrinfo['last_value'] = last_value.value
 
@@ -1124,15 +1483,14 @@ class Entry(ACLBase):
                     } for (v, r) in zip(values, referrals)], key=lambda x: x['value'])
 
                 elif last_value.data_type == AttrTypeValue['group'] and last_value.value:
-                    group = Group.objects.filter(id=last_value.value)
+                    group = Group.get_active_group(last_value.value)
                     if group:
-                        attrinfo['last_value'] = group.first()
+                        attrinfo['last_value'] = group
 
                 elif last_value.data_type == AttrTypeValue['array_group']:
                     attrinfo['last_value'] = [
                         x for x in [
-                            Group.objects.filter(id=v.value, is_active=True).first()
-                            for v in last_value.data_array.all()
+                            Group.get_active_group(v.value) for v in last_value.data_array.all()
                         ] if x
                     ]
 
@@ -1140,16 +1498,25 @@ class Entry(ACLBase):
 
         return sorted(ret_attrs, key=lambda x: x['index'])
 
+    @with_permission_check_cache
     def to_dict(self, user):
         # check permissions for each entry, entity and attrs
         if (not user.has_permission(self.schema, ACLType.Readable) or
                 not user.has_permission(self, ACLType.Readable)):
             return None
 
-        attrs = [x for x in self.attrs.filter(is_active=True, schema__is_active=True)
+        if hasattr(self, 'prefetched_attrs'):
+            attrs = [x for x in self.prefetched_attrs if x.schema.is_active]
+        else:
+            attrs = self.attrs.filter(is_active=True,
+                                      schema__is_active=True).select_related('schema')
+
+        attrs = [x for x in attrs
                  if (user.has_permission(x.schema, ACLType.Readable) and
                      user.has_permission(x, ACLType.Readable))]
 
+        latest_values = self._get_latest_values(attrs)
+
         return {
             'id': self.id,
             'name': self.name,
@@ -1159,7 +1526,7 @@ class Entry(ACLBase):
             },
             'attrs': [{
                 'name': x.schema.name,
-                'value': x.get_latest_value().get_value()
+                'value': latest_values[x.id].get_value()
             } for x in attrs]
         }
 
@@ -1167,9 +1534,8 @@ class Entry(ACLBase):
         super(Entry, self).delete()
 
         # update Elasticsearch index info which refered this entry not to refer this link
-        es_object = ESS()
-        for entry in [x for x in self.get_referred_objects() if x.id != self.id]:
-            entry.register_es(es=es_object)
+        Entry.register_es_documents(self.get_referred_objects().exclude(id=self.id),
+                                    skip_refresh=True)
 
         # also delete each attributes
         for attr in self.attrs.filter(is_active=True):
@@ -1190,47 +1556,107 @@ class Entry(ACLBase):
             attr.restore()
 
     def clone(self, user, **extra_params):
+        name = extra_params.pop('name', self.name)
+
+        cloned_entries = self.bulk_clone(user, [name], **extra_params)
+        if cloned_entries:
+            return cloned_entries[0]
+
+    def bulk_clone(self, user, names, **extra_params):
+        """
+        This clones this entry into new entries of specified names, which have the latest
+        values of the Attributes that user can read. All Entries, Attributes, AttributeValues
+        and their relations are created in bulk in a transaction, so the number of queries
+        doesn't depend on the number of names.
+        """
         if (not user.has_permission(self, ACLType.Readable) or
                 not user.has_permission(self.schema, ACLType.Readable)):
             return None
 
-        # set STATUS_CREATING flag until all related parameters are set
-        status = Entry.STATUS_CREATING
-        if 'status' in extra_params:
-            status |= extra_params.pop('status')
-
-        # We can't clone an instance by the way (.pk=None and save) like AttributeValue,
-        # since the subclass instance refers to the parent_link's primary key during save.
-        params = {
-            'name': self.name,
-            'created_user': user,
-            'schema': self.schema,
-            'status': status,
-        }
-        params.update(extra_params)
-        cloned_entry = Entry.objects.create(**params)
-
-        for attr in self.attrs.filter(is_active=True):
-            cloned_attr = attr.clone(user, parent_entry=cloned_entry)
-
-            if cloned_attr:
-                cloned_entry.attrs.add(cloned_attr)
-
-        cloned_entry.del_status(Entry.STATUS_CREATING)
-        return cloned_entry
-
+        Entry.prefetch_latest_values([self])
+        src_attrs = [x for x in self.prefetched_attrs
+                     if (user.has_permission(x, ACLType.Readable) and
+                         user.has_permission(x.schema, ACLType.Readable))]
+        src_values = {x.id: x.get_latest_value() for x in src_attrs}
+        src_elements = {k: list(v.data_array.all()) for (k, v) in src_values.items() if v}
+
+        def _clone_value(attrv, **params):
+            return AttributeValue(**dict({
+                'value': attrv.value,
+                'referral_id': attrv.referral_id,
+                'status': attrv.status,
+                'boolean': attrv.boolean,
+                'date': attrv.date,
+                'data_type': attrv.data_type,
+                'is_latest': attrv.is_latest,
+                'created_user': user,
+            }, **params))
+
+        with transaction.atomic():
+            entries = Entry.bulk_create([Entry(**dict({
+                'name': name,
+                'created_user': user,
+                'schema': self.schema,
+            }, **extra_params)) for name in names])
+
+            attrs = Attribute.bulk_create([Attribute(
+                name=x.name,
+                created_user=user,
+                schema=x.schema,
+                parent_entry=entry,
+            ) for entry in entries for x in src_attrs])
+
+            Entry.attrs.through.objects.bulk_create([
+                Entry.attrs.through(entry_id=x.parent_entry_id, attribute_id=x.id) for x in attrs])
+
+            # This is the latest value of source Attribute for each cloned one by its id
+            cloning_values = {x.id: src_values[src_attrs[i % len(src_attrs)].id]
+                              for (i, x) in enumerate(attrs)}
+
+            AttributeValue.objects.bulk_create([
+                _clone_value(cloning_values[x.id], parent_attr=x) for x in attrs
+                if cloning_values[x.id]])
+
+            values = dict(AttributeValue.objects.filter(
+                parent_attr__in=attrs).values_list('parent_attr', 'id'))
+            Attribute.values.through.objects.bulk_create([
+                Attribute.values.through(attribute_id=attr_id, attributevalue_id=attrv_id)
+                for (attr_id, attrv_id) in values.items()])
+
+            # clone the elements of array values
+            AttributeValue.objects.bulk_create([
+                _clone_value(co_attrv, parent_attr_id=attr_id, parent_attrv_id=attrv_id)
+                for (attr_id, attrv_id) in values.items()
+                for co_attrv in src_elements[cloning_values[attr_id].parent_attr_id]])
+
+            AttributeValue.data_array.through.objects.bulk_create([
+                AttributeValue.data_array.through(from_attributevalue_id=parent_id,
+                                                  to_attributevalue_id=child_id)
+                for (parent_id, child_id) in AttributeValue.objects.filter(
+                    parent_attrv__in=values.values()).values_list('parent_attrv', 'id')])
+
+            ReferenceEdge.update(parent_entry__in=entries)
+
+        return entries
+
+    @with_permission_check_cache
     def export(self, user):
         attrinfo = {}
 
-        # This calling of complement_attrs is needed to take into account the case of the Attributes
-        # that are added after creating this entry.
-        self.complement_attrs(user)
+        attrs = getattr(self, 'prefetched_attrs', None)
+        if attrs is None or (set([x.id for x in self.schema.prefetched_attrs]) -
+                             set([x.schema_id for x in attrs])):
+            # This calling of complement_attrs is needed to take into account the case of the
+            # Attributes that are added after creating this entry.
+            self.complement_attrs(user)
 
-        for attr in self.attrs.filter(is_active=True):
-            if not user.has_permission(attr, ACLType.Readable):
-                continue
+            attrs = self.attrs.filter(is_active=True).select_related('schema')
+
+        attrs = [x for x in attrs if user.has_permission(x, ACLType.Readable)]
 
-            latest_value = attr.get_latest_value()
+        latest_values = self._get_latest_values(attrs)
+        for attr in attrs:
+            latest_value = latest_values[attr.id]
             if latest_value:
                 attrinfo[attr.schema.name] = latest_value.get_value()
             else:
@@ -1290,7 +1716,7 @@ class Entry(ACLBase):
 
             elif attr.type & AttrTypeValue['group']:
                 if attrv.value:
-                    group = Group.objects.filter(id=attrv.value, is_active=True).first()
+                    group = Group.get_active_group(attrv.value)
                     if group:
                         attrinfo['value'] = truncate(group.name)
                         attrinfo['referral_id'] = group.id
@@ -1311,6 +1737,8 @@ class Entry(ACLBase):
         document = {
             'entity': {'id': self.schema.id, 'name': self.schema.name},
             'name': self.name,
+            'is_public': self.is_public,
+            'default_permission': self.default_permission,
             'attr': [],
         }
 
@@ -1333,18 +1761,48 @@ class Entry(ACLBase):
         if not es:
             es = ESS()
 
-        es.index(doc_type='entry', id=self.id, body=self.get_es_document(es))
-        if not skip_refresh:
-            es.refresh()
+        if skip_refresh:
+            es.index(doc_type='entry', id=self.id, body=self.get_es_document(es))
+        else:
+            es.index(doc_type='entry', id=self.id, body=self.get_es_document(es),
+                     refresh=es.get_refresh_param())
+            es.refresh_by_policy()
+
+    @classmethod
+    def register_es_documents(kls, entries, es=None, skip_refresh=False):
+        """
+        This registers documents of specified entries, which could be a generator, to the
+        Elasticsearch through the bulk indexer. The documents are made while they are sent
+        in batches, so this doesn't hold all of them in memory. This returns the number of
+        registered entries and the errors.
+        """
+        if not es:
+            es = ESS()
+
+        (count, errors) = es.bulk_index(
+            ({'_id': x.id, '_source': x.get_es_document(es)} for x in entries),
+            refresh=('false' if skip_refresh else es.get_refresh_param()))
+
+        if not skip_refresh and (count or errors):
+            es.refresh_by_policy()
+
+        return (count, errors)
 
     def unregister_es(self, es=None):
         if not es:
             es = ESS()
 
-        es.delete(doc_type='entry', id=self.id, ignore=[404])
-        es.refresh(ignore=[404])
+        es.delete(doc_type='entry', id=self.id, ignore=[404], refresh=es.get_refresh_param())
+        es.refresh_by_policy()
 
-    def get_value_history(self, user, count=CONFIG.MAX_HISTORY_COUNT, index=0):
+    def get_value_history(self, user, count=CONFIG.MAX_HISTORY_COUNT, index=0, cursor=None):
+        """
+        This returns changes of the readable attributes of this entry from the newest one with
+        the previous value of each changes. The previous values are looked up by one ordered
+        pass of the changes. The cursor is the 'attrv_id' of the last change in the previous
+        page, then this returns the changes after it by comparing created_time (and id)
+        instead of skipping the first index changes.
+        """
         def _get_values(attrv):
             return {
                 'attrv_id': attrv.id,
@@ -1353,46 +1811,67 @@ class Entry(ACLBase):
                 'created_user': attrv.created_user.username,
             }
 
-        ret_values = []
+        def _older_than(attrv):
+            return (Q(created_time__lt=attrv.created_time) |
+                    Q(created_time=attrv.created_time, id__lt=attrv.id))
+
+        attrs = {x.id: x for x in self.attrs.filter(
+            is_active=True, schema__is_active=True).select_related('schema')
+            if (user.has_permission(x, ACLType.Readable) and
+                user.has_permission(x.schema, ACLType.Readable))}
+
         all_attrv = AttributeValue.objects.filter(
-            parent_attr__in=self.attrs.all(),
-            parent_attrv__isnull=True).order_by('-created_time')[index:]
+            parent_attr__in=attrs.keys(),
+            parent_attrv__isnull=True).select_related('referral', 'created_user').prefetch_related(
+            Prefetch('data_array', queryset=AttributeValue.objects.select_related('referral'))
+        ).order_by('-created_time', '-id')
+
+        if cursor is not None:
+            last_attrv = AttributeValue.objects.filter(id=cursor).first()
+            if last_attrv:
+                all_attrv = all_attrv.filter(_older_than(last_attrv))
+            page = list(all_attrv[:count])
+        else:
+            page = list(all_attrv[index:index + count])
+
+        # This finds previous values of each changes by walking the page from the oldest one.
+        # The oldest change of each attributes in the page has its previous value out of it.
+        prev_values = {}
+        oldest_values = []
+        seen_values = {}
+        for attrv in reversed(page):
+            if attrv.parent_attr_id in seen_values:
+                prev_values[attrv.id] = seen_values[attrv.parent_attr_id]
+            else:
+                oldest_values.append(attrv)
+            seen_values[attrv.parent_attr_id] = attrv
 
-        for (i, attrv) in enumerate(all_attrv):
-            if (len(ret_values) >= count):
-                break
+        for attrv in oldest_values:
+            prev_values[attrv.id] = all_attrv.filter(_older_than(attrv),
+                                                     parent_attr=attrv.parent_attr_id).first()
 
-            attr = attrv.parent_attr
-            if (attr.is_active and
-                    attr.schema.is_active and
-                    user.has_permission(attr, ACLType.Readable) and
-                    user.has_permission(attr.schema, ACLType.Readable)):
-
-                # try to get next attrv
-                next_attrv = None
-                for _attrv in all_attrv[(i+1):]:
-                    if _attrv.parent_attr == attr:
-                        next_attrv = _attrv
-                        break
-
-                ret_values.append({
-                    'attr_id': attr.id,
-                    'attr_name': attr.schema.name,
-                    'attr_type': attr.schema.type,
-                    'curr': _get_values(attrv),
-                    'prev': _get_values(next_attrv) if next_attrv else None,
-                })
+        for attrv in page + [x for x in prev_values.values() if x]:
+            attrv.parent_attr = attrs[attrv.parent_attr_id]
 
-        return ret_values
+        return [{
+            'attr_id': attrv.parent_attr.id,
+            'attr_name': attrv.parent_attr.schema.name,
+            'attr_type': attrv.parent_attr.schema.type,
+            'curr': _get_values(attrv),
+            'prev': _get_values(prev_values[attrv.id]) if prev_values[attrv.id] else None,
+        } for attrv in page]
 
     @classmethod
     def search_entries(kls, user, hint_entity_ids, hint_attrs=[], limit=CONFIG.MAX_LIST_ENTRIES,
-                       entry_name=None, or_match=False, hint_referral=False):
+                       entry_name=None, or_match=False, hint_referral=False, offset=0):
         """Main method called from simple search and advanced search.
 
         Do the following:
-        1. Create a query for Elasticsearch search. (make_query)
-        2. Execute the created query. (execute_query)
+        1. Create a query for Elasticsearch search, which gets only the entries that user
+           can read and are narrowed down by the reference entry.
+           (make_query, make_permission_filter, make_referral_filter)
+        2. Execute the created query to get only the results from offset up to limit.
+           (execute_query)
         3. Search the reference entry,
            process the search results, and return. (make_search_results)
 
@@ -1409,6 +1888,8 @@ class Entry(ACLBase):
             hint_referral (str): Defaults to False.
                 Input value used to refine the reference entry.
                 Use only for advanced searches.
+            offset (int): Defaults to 0.
+                Number of search results to skip from the first one
 
         Returns:
             dict[str, str]: As a result of the search,
@@ -1420,18 +1901,79 @@ class Entry(ACLBase):
             'ret_values': []
         }
 
-        query = make_query(hint_entity_ids, hint_attrs, entry_name, or_match)
-
-        res = execute_query(query)
+        res = execute_query(kls._make_search_query(user, hint_entity_ids, hint_attrs,
+                                                   entry_name, or_match, hint_referral),
+                            limit, offset)
 
         if 'status' in res and res['status'] == 404:
             return results
 
         return make_search_results(results, res, hint_attrs, limit, hint_referral)
 
+    @classmethod
+    def stream_search_entries(kls, user, hint_entity_ids, hint_attrs=[], entry_name=None,
+                              or_match=False, hint_referral=False):
+        """This is a generator of all search results of search_entries in order of the name.
+
+        The results are fetched from Elasticsearch by the scroll API and processed by
+        SCROLL_SIZE at a time, so the memory usage doesn't depend on the number of them.
+        This is used to export search results.
+
+        Args:
+            The same as search_entries except for limit and offset
+
+        Yields:
+            dict[str, str]: The same as each of 'ret_values' of search_entries
+
+        """
+        hits = scan_query(kls._make_search_query(user, hint_entity_ids, hint_attrs, entry_name,
+                                                 or_match, hint_referral))
+        while True:
+            chunk = list(itertools.islice(hits, settings.ES_CONFIG['SCROLL_SIZE']))
+            if not chunk:
+                break
+
+            results = make_search_results({'ret_count': 0, 'ret_values': []},
+                                          {'hits': {'total': len(chunk), 'hits': chunk}},
+                                          hint_attrs, len(chunk), hint_referral)
+            for ret_info in results['ret_values']:
+                yield ret_info
+
+    @classmethod
+    def _make_search_query(kls, user, hint_entity_ids, hint_attrs, entry_name, or_match,
+                           hint_referral):
+        """This makes a query of search_entries to get only the entries that user can read"""
+        query = make_query(hint_entity_ids, hint_attrs, entry_name, or_match)
+
+        # narrow down the results by the reference entry
+        if isinstance(hint_referral, str) and hint_referral:
+            query['query']['bool']['filter'].append(make_referral_filter(hint_entity_ids,
+                                                                         hint_referral))
+
+        # narrow down the results to the entries that user can read
+        if not user.is_superuser:
+            entities = Entity.objects.filter(is_active=True)
+            permitted_entries = Entry.objects.filter(
+                is_active=True,
+                id__in=ACLPermission.objects.filter(
+                    Q(permission__user__id=user.id) | Q(permission__group__user__id=user.id),
+                    acltype__gte=ACLType.Readable.id).values('object_id'))
+
+            # entries that user is granted to read are looked up only in the specified entities
+            if hint_entity_ids:
+                entities = entities.filter(id__in=hint_entity_ids)
+                permitted_entries = permitted_entries.filter(schema__id__in=hint_entity_ids)
+
+            query['query']['bool']['filter'].append(make_permission_filter(
+                permitted_entries.order_by('-id').values_list('id', flat=True),
+                user.filter_permitted(entities, ACLType.Readable).values_list('id', flat=True)))
+
+        return query
+
     @classmethod
     def get_all_es_docs(kls):
-        return ESS().search(body={'query': {'match_all': {}}}, ignore=[404])
+        """This returns a generator of all documents which are streamed by the scroll API"""
+        return scan_query({'query': {'match_all': {}}}, preserve_order=False)
 
     @classmethod
     def is_importable_data(kls, data):
@@ -1477,3 +2019,52 @@ class Entry(ACLBase):
             parent_attr__schema__is_active=True,
             parent_attr__parent_entry=self
         ).first()
+
+    def get_attrvs(self, names=None):
+        """This returns the latest values of specified attributes (all attributes when names
+        is None) by their names in a constant number of queries, with their elements of array
+        and referrals. As get_attrv, this doesn't check permission of attributes.
+
+        CAUTION: Don't use this before permissoin check of specified attributes.
+        """
+        return Entry.bulk_get_attrvs([self], names).get(self.id, {})
+
+    @classmethod
+    def bulk_get_attrvs(kls, entries, names=None):
+        """This returns the latest values of specified attributes of each entries by the
+        name of attribute for each entry ids. These are fetched in a constant number of
+        queries regardless of the number of entries and attributes.
+
+        CAUTION: Don't use this before permissoin check of specified attributes.
+        """
+        query = Q(is_latest=True, parent_attr__schema__is_active=True,
+                  parent_attr__parent_entry__in=[x.id for x in entries])
+        if names is not None:
+            query &= Q(parent_attr__name__in=names)
+
+        attrvs = AttributeValue.objects.filter(query).select_related(
+            'parent_attr__schema', 'referral').prefetch_related(
+            Prefetch('data_array', queryset=AttributeValue.objects.select_related(
+                'referral').order_by('id'))).order_by('id')
+
+        results = {x.id: {} for x in entries}
+        for attrv in attrvs:
+            results[attrv.parent_attr.parent_entry_id].setdefault(attrv.parent_attr.name, attrv)
+
+        return results
+
+
+# This handler rebuilds ReferenceEdges of Attributes when AttributeValues are appended to
+# (or removed from) them through the relation manager (e.g. attr.values.add(attrv)).
+@receiver(m2m_changed, sender=Attribute.values.through)
+def _attribute_values_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'post_clear']:
+        return
+
+    # only values of object typed attributes refer other objects
+    if not reverse:
+        if int(instance.schema.type) & AttrTypeValue['object']:
+            ReferenceEdge.update(id=instance.id)
+    elif pk_set:
+        ReferenceEdge.update(id__in=pk_set, schema__type__in=[
+            x for x in AttrTypeValue.values() if x & AttrTypeValue['object']])
@@ -7,7 +7,9 @@ CONFIG = Settings({
         'MAX_LABEL_STRING': 45,
     },
     'MAX_HISTORY_COUNT': 10,
+    'EXPORT_CHUNK_SIZE': 1000,
     'MAX_QUERY_SIZE': 512,
+    'MAX_PERMISSION_FILTER_IDS': 10000,
     'EMPTY_SEARCH_CHARACTER': '\\',
     'EMPTY_SEARCH_CHARACTER_CODE': chr(165),
     'AND_SEARCH_CHARACTER': '&',
@@ -5,8 +5,9 @@ import json
 import logging
 import yaml
 
-from airone.lib.acl import ACLType
+from airone.lib.acl import ACLType, with_permission_check_cache
 from airone.lib.types import AttrTypeValue
+from airone.lib.elasticsearch import ESS
 from airone.celery import app
 from entity.models import Entity, EntityAttr
 from entry.models import Entry, Attribute
@@ -14,6 +15,8 @@ from user.models import User
 from datetime import datetime
 from job.models import Job
 
+from .settings import CONFIG
+
 Logger = logging.getLogger(__name__)
 
 
@@ -88,6 +91,7 @@ def _convert_data_value(attr, info):
 
 
 @app.task(bind=True)
+@with_permission_check_cache
 def create_entry_attrs(self, job_id):
     job = Job.objects.get(id=job_id)
 
@@ -155,6 +159,7 @@ def create_entry_attrs(self, job_id):
 
 
 @app.task(bind=True)
+@with_permission_check_cache
 def edit_entry_attrs(self, job_id):
     job = Job.objects.get(id=job_id)
 
@@ -196,6 +201,7 @@ def edit_entry_attrs(self, job_id):
 
 
 @app.task(bind=True)
+@with_permission_check_cache
 def delete_entry(self, job_id):
     job = Job.objects.get(id=job_id)
 
@@ -210,6 +216,7 @@ def delete_entry(self, job_id):
 
 
 @app.task(bind=True)
+@with_permission_check_cache
 def restore_entry(self, job_id):
     job = Job.objects.get(id=job_id)
 
@@ -234,6 +241,7 @@ def restore_entry(self, job_id):
 
 
 @app.task(bind=True)
+@with_permission_check_cache
 def copy_entry(self, job_id):
     job = Job.objects.get(id=job_id)
 
@@ -245,20 +253,32 @@ def copy_entry(self, job_id):
         src_entry = Entry.objects.get(id=job.target.id)
 
         params = json.loads(job.params)
-        dest_entry = Entry.objects.filter(schema=src_entry.schema, name=params['new_name']).first()
-        if not dest_entry:
-            dest_entry = src_entry.clone(user, name=params['new_name'])
-            dest_entry.register_es()
+
+        # The job which was created before copying to multiple names has 'new_name' parameter
+        new_names = params['new_names'] if 'new_names' in params else [params['new_name']]
+
+        dest_entries = list(Entry.objects.filter(schema=src_entry.schema, name__in=new_names))
+        cloning_names = [x for x in new_names if x not in [y.name for y in dest_entries]]
+        if cloning_names:
+            # clone source entry to all names at once
+            cloned_entries = src_entry.bulk_clone(user, cloning_names) or []
+            Entry.register_es_documents(cloned_entries)
+
+            dest_entries += cloned_entries
 
         if custom_view.is_custom("after_copy_entry", src_entry.schema.name):
-            custom_view.call_custom("after_copy_entry", src_entry.schema.name, user, src_entry,
-                                    dest_entry, params['post_data'])
+            for dest_entry in dest_entries:
+                custom_view.call_custom("after_copy_entry", src_entry.schema.name, user,
+                                        src_entry, dest_entry, params['post_data'])
 
-        # update job status and save it
-        job.update(Job.STATUS['DONE'], 'original entry: %s' % src_entry.name, dest_entry)
+        # update job status and save it. The target is updated to the copied entry only when
+        # the job copies to a single name.
+        job.update(Job.STATUS['DONE'], 'original entry: %s' % src_entry.name,
+                   dest_entries[0] if len(dest_entries) == 1 else None)
 
 
 @app.task(bind=True)
+@with_permission_check_cache
 def import_entries(self, job_id):
     job = Job.objects.get(id=job_id)
 
@@ -290,6 +310,7 @@ def import_entries(self, job_id):
         job.update(Job.STATUS['PROCESSING'])
 
         total_count = len(whole_data)
+        imported_entries = []
         # create or update entry
         for (index, entry_data) in enumerate(whole_data):
             job.text = 'Now importing... (progress: [%5d/%5d])' % (index + 1, total_count)
@@ -297,7 +318,7 @@ def import_entries(self, job_id):
 
             # abort processing when job is canceled
             if job.is_canceled():
-                return
+                break
 
             entry = Entry.objects.filter(name=entry_data['name'], schema=entity).first()
             if not entry:
@@ -330,8 +351,13 @@ def import_entries(self, job_id):
                     custom_view.call_custom(custom_view_handler, entity.name, user, entry, attr,
                                             value)
 
-            # register entry to the Elasticsearch
-            entry.register_es()
+            imported_entries.append(entry)
+
+        # register imported entries to the Elasticsearch in bulk, and refresh the index once
+        # to make them searchable regardless of REFRESH_POLICY
+        es = ESS()
+        Entry.register_es_documents(imported_entries, es=es, skip_refresh=True)
+        es.refresh()
 
         # update job status and save it except for the case that target job is canceled.
         if not job.is_canceled():
@@ -339,6 +365,7 @@ def import_entries(self, job_id):
 
 
 @app.task(bind=True)
+@with_permission_check_cache
 def export_entries(self, job_id):
     job = Job.objects.get(id=job_id)
 
@@ -362,16 +389,22 @@ def export_entries(self, job_id):
     #   passed to the argument of enumerate() method, Django try to get result at once (this never
     #   do lazy evaluation).
     export_item_counter = 0
-    for entry in Entry.objects.filter(schema=entity, is_active=True):
-        # abort processing when job is canceled
-        if export_item_counter % Job.STATUS_CHECK_FREQUENCY == 0 and job.is_canceled():
-            return
+    entries = Entry.objects.filter(schema=entity, is_active=True).order_by('id')
+    for index in range(0, entries.count(), CONFIG.EXPORT_CHUNK_SIZE):
+        # load latest values of entries in each chunk at once
+        chunk = list(entries[index:index + CONFIG.EXPORT_CHUNK_SIZE])
+        Entry.prefetch_latest_values(chunk)
+
+        for entry in chunk:
+            # abort processing when job is canceled
+            if export_item_counter % Job.STATUS_CHECK_FREQUENCY == 0 and job.is_canceled():
+                return
 
-        if user.has_permission(entry, ACLType.Readable):
-            exported_data.append(entry.export(user))
+            if user.has_permission(entry, ACLType.Readable):
+                exported_data.append(entry.export(user))
 
-        # increment loop counter
-        export_item_counter += 1
+            # increment loop counter
+            export_item_counter += 1
 
     output = None
     if params['export_format'] == 'csv':
@@ -405,6 +438,7 @@ def export_entries(self, job_id):
 
 
 @app.task(bind=True)
+@with_permission_check_cache
 def register_referrals(self, job_id):
     job = Job.objects.get(id=job_id)
 
@@ -415,7 +449,7 @@ def register_referrals(self, job_id):
     # register entries data which refer target entry to elasticsearch
     entry = Entry.objects.filter(id=job.target.id, is_active=True).first()
     if entry:
-        [r.register_es() for r in entry.get_referred_objects()]
+        Entry.register_es_documents(entry.get_referred_objects().iterator())
 
     if not job.is_canceled():
         job.update(Job.STATUS['DONE'])
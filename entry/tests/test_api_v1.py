@@ -582,6 +582,42 @@ class ViewTest(AironeViewTest):
                     self.assertEqual(history_value['curr']['value'], exp_curr_value)
                     self.assertEqual(history_value['prev']['value'], exp_prev_value)
 
+    def test_get_entry_history_with_cursor(self):
+        user = self.guest_login()
+
+        entity = Entity.objects.create(name='Entity', created_user=user)
+        entity.attrs.add(EntityAttr.objects.create(**{
+            'name': 'attr',
+            'type': AttrTypeValue['string'],
+            'created_user': user,
+            'parent_entity': entity,
+        }))
+
+        entry = Entry.objects.create(name='Entry', schema=entity, created_user=user)
+        entry.complement_attrs(user)
+        for i in range(5):
+            entry.attrs.first().add_value(user, 'value-%d' % i)
+
+        url = reverse('entry:api_v1:get_entry_history', args=[entry.id])
+
+        # send request with invalid cursor
+        resp = self.client.get(url, {'count': 2, 'cursor': 'hoge'})
+        self.assertEqual(resp.status_code, 400)
+
+        # send request with the cursor of the last value in the previous page
+        resp = self.client.get(url, {'count': 2})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([x['curr']['value'] for x in resp.json()['results']],
+                         ['value-4', 'value-3'])
+
+        resp = self.client.get(url, {'count': 2,
+                                     'cursor': resp.json()['results'][-1]['curr']['attrv_id']})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([x['curr']['value'] for x in resp.json()['results']],
+                         ['value-2', 'value-1'])
+        self.assertEqual([x['prev']['value'] for x in resp.json()['results']],
+                         ['value-1', 'value-0'])
+
     def test_get_entry_info(self):
         user = self.guest_login()
 
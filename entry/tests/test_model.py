@@ -1,9 +1,13 @@
 from group.models import Group
+import json
 from datetime import date
 from django.core.cache import cache
 from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from entity.models import Entity, EntityAttr
-from entry.models import Entry, Attribute, AttributeValue
+from entry.models import Entry, Attribute, AttributeValue, LatestValueSnapshot, ReferenceEdge
 from entry.settings import CONFIG
 from user.models import User
 from acl.models import ACLBase
@@ -12,6 +16,7 @@ from airone.lib.types import AttrTypeStr, AttrTypeObj, AttrTypeArrStr, AttrTypeA
 from airone.lib.types import AttrTypeValue
 from airone.lib.test import AironeTestCase
 from unittest import skip
+from unittest.mock import patch, Mock
 
 
 class ModelTest(AironeTestCase):
@@ -555,6 +560,61 @@ class ModelTest(AironeTestCase):
             self.assertEqual(referred_entries.count(), 1)
             self.assertEqual(list(referred_entries), [self._entry])
 
+    def test_reference_edges(self):
+        entity = Entity.objects.create(name='Entity2', created_user=self._user)
+        refs = [Entry.objects.create(name='r%d' % i, created_user=self._user, schema=entity)
+                for i in range(3)]
+
+        attr = self.make_attr('attr_ref', attrtype=AttrTypeValue['object'])
+        arr_attr = self.make_attr('attr_arr_ref', attrtype=AttrTypeValue['array_object'])
+        self._entry.attrs.add(attr, arr_attr)
+
+        attr.add_value(self._user, refs[0])
+        arr_attr.add_value(self._user, [refs[0], refs[1]])
+        self.assertEqual(sorted(ReferenceEdge.objects.values_list('attr', 'referral')),
+                         sorted([(attr.id, refs[0].id), (arr_attr.id, refs[0].id),
+                                 (arr_attr.id, refs[1].id)]))
+        self.assertTrue(all([x.entry == self._entry for x in ReferenceEdge.objects.all()]))
+
+        # the edges are rebuilt when the latest values are changed
+        attr.add_value(self._user, refs[2])
+        arr_attr.add_value(self._user, [refs[1]])
+        self.assertEqual(sorted(ReferenceEdge.objects.values_list('attr', 'referral')),
+                         sorted([(attr.id, refs[2].id), (arr_attr.id, refs[1].id)]))
+
+        # referring entries are looked up by one query
+        self.assertEqual(list(refs[0].get_referred_objects()), [])
+        with self.assertNumQueries(1):
+            self.assertEqual(list(refs[1].get_referred_objects()), [self._entry])
+
+        # the edges from the deleted entry are ignored, then they are looked up after restoring
+        self._entry.delete()
+        self.assertEqual(list(refs[1].get_referred_objects()), [])
+        self._entry.restore()
+        self.assertEqual(list(refs[1].get_referred_objects()), [self._entry])
+
+        # the edges are removed when the latest flags of the EntityAttr are unset
+        attr.schema.unset_latest_flag()
+        self.assertEqual(list(refs[2].get_referred_objects()), [])
+        self.assertEqual(list(refs[1].get_referred_objects()), [self._entry])
+
+    def test_reference_edges_of_attribute_without_referral(self):
+        attr = self.make_attr('attr_str', attrtype=AttrTypeValue['string'])
+        self._entry.attrs.add(attr)
+
+        # edges are not rebuilt for the attributes which don't refer any objects
+        with patch.object(ReferenceEdge, 'update') as mock_update:
+            attr.add_value(self._user, 'hoge')
+            attr.values.add(AttributeValue.objects.create(created_user=self._user,
+                                                          parent_attr=attr, value='fuga'))
+            self.assertFalse(mock_update.called)
+
+        # attributes which don't refer any objects are excluded from the ones to rebuild
+        attrv = AttributeValue.objects.create(created_user=self._user, parent_attr=attr)
+        with patch.object(ReferenceEdge, 'update') as mock_update:
+            attrv.attribute_set.add(attr)
+            self.assertEqual(list(Attribute.objects.filter(**mock_update.call_args[1])), [])
+
     def test_coordinating_attribute_with_dynamically_added_one(self):
         newattr = EntityAttr.objects.create(name='newattr',
                                             type=AttrTypeStr,
@@ -598,6 +658,47 @@ class ModelTest(AironeTestCase):
         self.assertEqual([x['curr']['value'] for x in history], ['value-0'])
         self.assertEqual([x['prev'] for x in history], [None])
 
+    def test_get_value_history_with_cursor(self):
+        for name in ['attr1', 'attr2']:
+            self._entity.attrs.add(EntityAttr.objects.create(**{
+                'name': name,
+                'type': AttrTypeStr,
+                'created_user': self._user,
+                'parent_entity': self._entity
+            }))
+        entry = Entry.objects.create(name='entry', schema=self._entity, created_user=self._user)
+        entry.complement_attrs(self._user)
+
+        for i in range(10):
+            for attr in entry.attrs.all():
+                attr.add_value(self._user, '%s-%d' % (attr.name, i))
+
+        # check to get all value history by following cursor of each pages
+        history = []
+        cursor = None
+        while True:
+            page = entry.get_value_history(self._user, count=3, cursor=cursor)
+            if not page:
+                break
+
+            history += page
+            cursor = page[-1]['curr']['attrv_id']
+
+        self.assertEqual(history, entry.get_value_history(self._user, count=100))
+        self.assertEqual(len(history), 20)
+        for (i, attr_name) in enumerate(['attr2', 'attr1']):
+            values = [x for x in history if x['attr_name'] == attr_name]
+            self.assertEqual([x['curr']['value'] for x in values],
+                             ['%s-%d' % (attr_name, i) for i in reversed(range(10))])
+            self.assertEqual([x['prev']['value'] if x['prev'] else None for x in values],
+                             ['%s-%d' % (attr_name, i) for i in reversed(range(9))] + [None])
+
+        # check the number of queries doesn't depend on the depth of the page
+        with CaptureQueriesContext(connection) as ctx:
+            entry.get_value_history(self._user, count=4, cursor=history[1]['curr']['attrv_id'])
+        with self.assertNumQueries(len(ctx)):
+            entry.get_value_history(self._user, count=4, cursor=history[13]['curr']['attrv_id'])
+
     def test_delete_entry(self):
         entity = Entity.objects.create(name='ReferredEntity', created_user=self._user)
         entry = Entry.objects.create(name='entry', created_user=self._user, schema=entity)
@@ -887,6 +988,108 @@ class ModelTest(AironeTestCase):
         unknown_user.permissions.add(entry.readable)
         self.assertIsNotNone(entry.clone(unknown_user))
 
+    def test_bulk_clone_entry(self):
+        ref_entry = Entry.objects.create(name='ref', schema=self._entity, created_user=self._user)
+        attr_infos = [
+            {'name': 'str', 'type': AttrTypeValue['string'], 'value': 'foo'},
+            {'name': 'arr', 'type': AttrTypeValue['array_string'], 'value': ['a', 'b']},
+            {'name': 'arr_name', 'type': AttrTypeValue['array_named_object'],
+             'value': [{'name': 'x', 'id': ref_entry}]},
+            {'name': 'empty', 'type': AttrTypeValue['string']},
+        ]
+        for info in attr_infos:
+            self._entity.attrs.add(EntityAttr.objects.create(**{
+                'name': info['name'],
+                'type': info['type'],
+                'created_user': self._user,
+                'parent_entity': self._entity,
+            }))
+
+        entry = Entry.objects.create(name='entry', schema=self._entity, created_user=self._user)
+        entry.complement_attrs(self._user)
+        for info in attr_infos:
+            if 'value' in info:
+                entry.attrs.get(schema__name=info['name']).add_value(self._user, info['value'])
+
+        # checks the number of queries doesn't depend on the number of names
+        Entry.objects.get(id=entry.id).bulk_clone(self._user, ['c0'])
+        with CaptureQueriesContext(connection) as ctx:
+            Entry.objects.get(id=entry.id).bulk_clone(self._user, ['c0'])
+        with self.assertNumQueries(len(ctx)):
+            clones = Entry.objects.get(id=entry.id).bulk_clone(self._user, ['c1', 'c2', 'c3'])
+
+        self.assertEqual([x.name for x in clones], ['c1', 'c2', 'c3'])
+        for clone in clones:
+            clone = Entry.objects.get(id=clone.id)
+            self.assertEqual(clone.schema, self._entity)
+            self.assertEqual(clone.attrs.count(), len(attr_infos))
+
+            self.assertEqual(clone.get_attrv('str').value, 'foo')
+            self.assertEqual([x.value for x in clone.get_attrv('arr').data_array.all()],
+                             ['a', 'b'])
+            self.assertEqual([(x.value, x.referral.id)
+                              for x in clone.get_attrv('arr_name').data_array.all()],
+                             [('x', ref_entry.id)])
+            self.assertEqual(clone.get_attrv('empty').value, '')
+
+            # checks each cloned AttributeValue belongs to the cloned Attribute
+            for attr in clone.attrs.all():
+                for attrv in attr.values.all():
+                    self.assertEqual(attrv.parent_attr, attr)
+                    self.assertTrue(all([x.parent_attrv == attrv and x.parent_attr == attr
+                                         for x in attrv.data_array.all()]))
+
+    def test_get_attrvs(self):
+        ref_entry = Entry.objects.create(name='ref', schema=self._entity,
+                                         created_user=self._user)
+        attr_infos = [
+            {'name': 'str', 'type': AttrTypeValue['string'], 'value': 'foo'},
+            {'name': 'obj', 'type': AttrTypeValue['object'], 'value': ref_entry},
+            {'name': 'arr', 'type': AttrTypeValue['array_string'], 'value': ['a', 'b']},
+            {'name': 'arr_name', 'type': AttrTypeValue['array_named_object'],
+             'value': [{'name': 'x', 'id': ref_entry}]},
+        ]
+        for info in attr_infos:
+            self._entity.attrs.add(EntityAttr.objects.create(**{
+                'name': info['name'],
+                'type': info['type'],
+                'created_user': self._user,
+                'parent_entity': self._entity,
+            }))
+
+        entries = []
+        for index in range(3):
+            entry = Entry.objects.create(name='e-%d' % index, schema=self._entity,
+                                         created_user=self._user)
+            entry.complement_attrs(self._user)
+            for info in attr_infos:
+                entry.attrs.get(schema__name=info['name']).add_value(self._user, info['value'])
+            entries.append(entry)
+
+        # values of all entries and their elements are fetched in a constant number of queries
+        with self.assertNumQueries(2):
+            results = Entry.bulk_get_attrvs(entries)
+
+        with self.assertNumQueries(0):
+            for entry in entries:
+                attrvs = results[entry.id]
+                self.assertEqual(sorted(attrvs.keys()), sorted([x['name'] for x in attr_infos]))
+                self.assertEqual(attrvs['str'].get_value(), 'foo')
+                self.assertEqual(attrvs['obj'].get_value(), 'ref')
+                self.assertEqual(attrvs['arr'].get_value(), ['a', 'b'])
+                self.assertEqual(attrvs['arr_name'].get_value(), [{'x': 'ref'}])
+
+        # specifying names of attributes
+        with self.assertNumQueries(2):
+            attrvs = entries[0].get_attrvs(['str', 'arr', 'unknown'])
+
+        self.assertEqual(sorted(attrvs.keys()), ['arr', 'str'])
+        self.assertEqual(attrvs['str'], entries[0].get_attrv('str'))
+
+        # values of deleted EntityAttr are not returned
+        self._entity.attrs.get(name='str').delete()
+        self.assertEqual(sorted(entries[0].get_attrvs().keys()), ['arr', 'arr_name', 'obj'])
+
     def test_set_value_method(self):
         user = User.objects.create(username='hoge')
         test_groups = [Group.objects.create(name=x) for x in ['g1', 'g2']]
@@ -2282,6 +2485,42 @@ class ModelTest(AironeTestCase):
         self.assertEqual(attrv, attr.get_latest_value())
         self.assertEqual(attr.values.count(), 1)
 
+    def test_is_updated_sends_constant_queries(self):
+        user = User.objects.create(username='hoge', is_superuser=True)
+        ref_entity = Entity.objects.create(name='ref_entity', created_user=user)
+        entity = self.create_entity_with_all_type_attributes(user, ref_entity)
+
+        refs = [Entry.objects.create(name='r-%d' % i, schema=ref_entity, created_user=user)
+                for i in range(100)]
+        groups = [Group.objects.create(name='g-%d' % i) for i in range(100)]
+
+        def _get_query_count(attr_name, count):
+            values = {
+                'arr_str': ['v-%d' % i for i in range(count)],
+                'arr_obj': refs[:count],
+                'arr_name': [{'name': 'v-%d' % i, 'id': x} for (i, x) in enumerate(refs[:count])],
+                'arr_group': [str(x.id) for x in groups[:count]],
+            }[attr_name]
+
+            entry = Entry.objects.create(name='e-%s-%d' % (attr_name, count), schema=entity,
+                                         created_user=user)
+            entry.complement_attrs(user)
+
+            attr = entry.attrs.get(schema__name=attr_name)
+            attr.add_value(user, values)
+
+            # checks both cases that value is changed and not
+            query_counts = []
+            for (value, expected) in [(values, False), (values[1:], True)]:
+                with CaptureQueriesContext(connection) as ctx:
+                    self.assertEqual(bool(attr.is_updated(value)), expected)
+                query_counts.append(len(ctx.captured_queries))
+
+            return query_counts
+
+        for attr_name in ['arr_str', 'arr_obj', 'arr_name', 'arr_group']:
+            self.assertEqual(_get_query_count(attr_name, 2), _get_query_count(attr_name, 100))
+
     def test_add_to_attrv(self):
         user = User.objects.create(username='hoge')
         entity_ref = Entity.objects.create(name='Ref', created_user=user)
@@ -2574,6 +2813,100 @@ class ModelTest(AironeTestCase):
             ]
         })
 
+    def test_latest_value_snapshot(self):
+        user = User.objects.create(username='hoge', is_superuser=True)
+        ref_entity = Entity.objects.create(name='ref_entity', created_user=user)
+        ref_entry = Entry.objects.create(name='ref', schema=ref_entity, created_user=user)
+        group = Group.objects.create(name='group')
+
+        entity = self.create_entity_with_all_type_attributes(user, ref_entity)
+        entry = Entry.objects.create(name='entry', schema=entity, created_user=user)
+        entry.complement_attrs(user)
+
+        attrinfo = self._get_attrinfo_template(ref_entry, group)
+        for info in attrinfo:
+            entry.attrs.get(schema__name=info['name']).add_value(user, info['set_val'])
+
+        # the snapshot is kept current when values are added
+        self.assertTrue(LatestValueSnapshot.objects.filter(entry=entry).exists())
+        with CaptureQueriesContext(connection) as ctx:
+            values = {x['name']: x['value'] for x in entry.to_dict(user)['attrs']}
+
+        # reading doesn't write the snapshot
+        self.assertFalse([x for x in ctx.captured_queries
+                          if 'entry_latestvaluesnapshot' in x['sql'] and
+                          not x['sql'].startswith('SELECT')])
+        for info in attrinfo:
+            self.assertEqual(values[info['name']], info['exp_val'])
+
+        # the snapshot doesn't have the name of referral, which is read at each reading
+        ref_entry.name = 'changed'
+        ref_entry.save()
+
+        with CaptureQueriesContext(connection) as ctx:
+            values = entry.export(user)['attrs']
+            self.assertEqual(values['obj'], 'changed')
+            self.assertEqual(values['arr_obj'], ['changed'])
+
+        # the latest values are read without accessing each AttributeValue
+        self.assertFalse([x for x in ctx.captured_queries
+                          if 'entry_attributevalue' in x['sql']])
+
+        # updating value updates the snapshot in the same transaction
+        entry.attrs.get(schema__name='str').add_value(user, 'bar')
+        document = json.loads(LatestValueSnapshot.objects.get(entry=entry).document)
+        self.assertEqual(document[str(entry.attrs.get(schema__name='str').id)]['value'], 'bar')
+        self.assertEqual(entry.export(user)['attrs']['str'], 'bar')
+
+        # the values which the snapshot doesn't cover are read without saving them
+        LatestValueSnapshot.objects.filter(entry=entry).delete()
+        self.assertEqual(entry.export(user)['attrs']['str'], 'bar')
+        self.assertFalse(LatestValueSnapshot.objects.filter(entry=entry).exists())
+
+        # deleting Attribute removes its data from the snapshot
+        attr = entry.attrs.get(schema__name='str')
+        attr.delete()
+        document = json.loads(LatestValueSnapshot.objects.get(entry=entry).document)
+        self.assertNotIn(str(attr.id), document)
+
+    def test_prefetch_latest_values(self):
+        user = User.objects.create(username='hoge', is_superuser=True)
+        ref_entity = Entity.objects.create(name='ref_entity', created_user=user)
+        ref_entry = Entry.objects.create(name='ref', schema=ref_entity, created_user=user)
+        group = Group.objects.create(name='group')
+
+        entity = self.create_entity_with_all_type_attributes(user, ref_entity)
+        attrinfo = self._get_attrinfo_template(ref_entry, group)
+        for index in range(3):
+            entry = Entry.objects.create(name='e-%d' % index, schema=entity, created_user=user)
+            entry.complement_attrs(user)
+            for info in attrinfo:
+                entry.attrs.get(schema__name=info['name']).add_value(user, info['set_val'])
+
+        entries = list(Entry.objects.filter(schema=entity))
+        with self.assertNumQueries(5):
+            Entry.prefetch_latest_values(entries)
+
+        # load the permission map of user and active Groups in advance, which are cached
+        user.get_permission_map()
+        Group.get_active_groups()
+
+        # latest values are read without sending any query
+        with self.assertNumQueries(0):
+            for entry in entries:
+                values = {x.schema.name: x.get_latest_value().get_value()
+                          for x in entry.prefetched_attrs}
+                for info in attrinfo:
+                    self.assertEqual(values[info['name']], info['exp_val'])
+
+                self.assertEqual(entry.export(user)['attrs'], values)
+
+        # only the Attributes of specified names are loaded
+        entries = list(Entry.objects.filter(schema=entity))
+        Entry.prefetch_latest_values(entries, ['str', 'arr_obj'])
+        self.assertEqual(sorted([x.schema.name for x in entries[0].prefetched_attrs]),
+                         ['arr_obj', 'str'])
+
     def test_search_entries_blank_val(self):
         user = User.objects.create(username='hoge')
 
@@ -2919,6 +3252,111 @@ class ModelTest(AironeTestCase):
             self.assertEqual(ret['ret_count'], test_suite['ret_cnt'])
             self.assertEqual(ret['ret_values'][0]['entry']['name'], test_suite['ret_entry_name'])
 
+    def test_search_entries_with_limit_and_offset(self):
+        with patch('entry.models.execute_query', Mock(return_value={'status': 404})) as m:
+            Entry.search_entries(self._user, [self._entity.id], limit=10, offset=20)
+
+            # checks only the results in the range are requested with the attributes of them
+            (query, size, offset) = m.call_args[0]
+            self.assertEqual((size, offset), (10, 20))
+            self.assertEqual(query['_source'], ['attr'])
+
+    def test_stream_search_entries(self):
+        entries = [Entry.objects.create(name='e-%d' % i, schema=self._entity,
+                                        created_user=self._user) for i in range(5)]
+        hits = [{'_id': str(x.id), '_source': {'attr': []}} for x in entries]
+
+        es_config = dict(settings.ES_CONFIG, SCROLL_SIZE=2)
+        with self.settings(ES_CONFIG=es_config), \
+                patch('entry.models.scan_query', Mock(return_value=iter(hits))):
+            results = Entry.stream_search_entries(self._user, [self._entity.id])
+            self.assertEqual([x['entry']['name'] for x in results],
+                             ['e-%d' % i for i in range(5)])
+
+    def test_search_entries_with_referral_filter(self):
+        entries = [Entry.objects.create(name='e-%d' % i, schema=self._entity,
+                                        created_user=self._user) for i in range(3)]
+        attr = self.make_attr('attr_ref', attrtype=AttrTypeValue['object'])
+        self._entry.attrs.add(attr)
+        attr.add_value(self._user, entries[0])
+
+        # the results are narrowed down by referral in the query, not by scanning all of them
+        with patch('entry.models.execute_query', Mock(return_value={'status': 404})) as m, \
+                patch('entry.models.scan_query') as mock_scan_query:
+            Entry.search_entries(self._user, [self._entity.id], limit=2, offset=1,
+                                 hint_referral='ent')
+            self.assertIn({'ids': {'values': [str(entries[0].id)]}},
+                          m.call_args[0][0]['query']['bool']['filter'])
+            self.assertEqual(m.call_args[0][1:], (2, 1))
+
+            # entries which are not referred by any others are searched by the empty character
+            Entry.search_entries(self._user, [self._entity.id],
+                                 hint_referral=CONFIG.EMPTY_SEARCH_CHARACTER)
+            self.assertIn({'bool': {'must_not': {'ids': {'values': [str(entries[0].id)]}}}},
+                          m.call_args[0][0]['query']['bool']['filter'])
+
+            # no referral filter is added unless referral is specified
+            query_filter = m.call_args[0][0]['query']['bool']['filter']
+            Entry.search_entries(self._user, [self._entity.id], hint_referral='')
+            self.assertEqual(m.call_args[0][0]['query']['bool']['filter'],
+                             [x for x in query_filter if 'must_not' not in x.get('bool', {})])
+
+            self.assertFalse(mock_scan_query.called)
+
+    def test_search_entries_with_permission_filter(self):
+        user = User.objects.create(username='hoge')
+        private_entity = Entity.objects.create(name='private', created_user=self._user,
+                                               is_public=False)
+        entry = Entry.objects.create(name='entry', schema=private_entity,
+                                     created_user=self._user, is_public=False)
+        user.permissions.add(entry.readable)
+
+        with patch('entry.models.execute_query', Mock(return_value={'status': 404})) as m:
+            Entry.search_entries(user, [self._entity.id, private_entity.id])
+
+            # checks filter to get only readable entries is added to the query
+            query_filter = m.call_args[0][0]['query']['bool']['filter'][-1]
+            (permitted_filter, default_filter) = query_filter['bool']['should']
+            self.assertEqual(permitted_filter, {'ids': {'values': [str(entry.id)]}})
+            self.assertEqual(default_filter['bool']['filter'][0]['nested']['query'],
+                             {'terms': {'entity.id': [self._entity.id]}})
+
+            # documents which don't have ACL parameters are regarded as public
+            self.assertIn({'bool': {'must_not': {'exists': {'field': 'is_public'}}}},
+                          default_filter['bool']['filter'][1]['bool']['should'])
+
+            # permitted entries are narrowed down to the ones in the specified entities
+            Entry.search_entries(user, [self._entity.id])
+            (permitted_filter, _) = m.call_args[0][0]['query']['bool']['filter'][-1][
+                'bool']['should']
+            self.assertEqual(permitted_filter, {'ids': {'values': []}})
+
+            # all readable entities and permitted entries are filtered in without entity
+            Entry.search_entries(user, [], entry_name='entry')
+            (permitted_filter, default_filter) = m.call_args[0][0]['query']['bool']['filter'][
+                -1]['bool']['should']
+            self.assertEqual(permitted_filter, {'ids': {'values': [str(entry.id)]}})
+            self.assertEqual(default_filter['bool']['filter'][0]['nested']['query'],
+                             {'terms': {'entity.id': [self._entity.id]}})
+
+            # the number of IDs in the filter is limited
+            with patch.dict(CONFIG.conf, {'MAX_PERMISSION_FILTER_IDS': 0}):
+                Entry.search_entries(user, [self._entity.id, private_entity.id])
+            (permitted_filter, default_filter) = m.call_args[0][0]['query']['bool']['filter'][
+                -1]['bool']['should']
+            self.assertEqual(permitted_filter, {'ids': {'values': []}})
+            self.assertFalse(any(['nested' in x for x in default_filter['bool']['filter']]))
+
+            # superuser can read all entries
+            user.is_superuser = True
+            Entry.search_entries(user, [self._entity.id, private_entity.id])
+            self.assertNotIn(query_filter, m.call_args[0][0]['query']['bool']['filter'])
+
+        # checks ACL parameters of entry are registered to Elasticsearch
+        document = entry.get_es_document()
+        self.assertFalse(document['is_public'])
+        self.assertEqual(document['default_permission'], ACLType.Nothing.id)
+
     def test_get_es_document(self):
         user = User.objects.create(username='hoge')
         test_group = Group.objects.create(name='test-group')
@@ -3057,6 +3495,64 @@ class ModelTest(AironeTestCase):
         self.assertTrue(all([g.has_permission(attr, ACLType.Full) for g in groups]))
         self.assertTrue(all([u.has_permission(attr, ACLType.Full) for u in [user1, user2]]))
 
+    def test_bulk_complement_attrs(self):
+        [user1, user2] = [User.objects.create(username=x) for x in ['u1', 'u2']]
+
+        entity = Entity.objects.create(name='entity', created_user=user1)
+        for (name, attrtype) in [('str', AttrTypeStr), ('arr', AttrTypeArrStr)]:
+            entity.attrs.add(EntityAttr.objects.create(name=name,
+                                                       type=attrtype,
+                                                       created_user=user1,
+                                                       parent_entity=entity,
+                                                       is_public=False))
+
+        entries = [Entry.objects.create(name='e%d' % i, schema=entity, created_user=user1)
+                   for i in range(4)]
+
+        # an Attribute of the first entry has been already created
+        entries[0].add_attribute_from_base(entity.attrs.get(name='str'), user1)
+        [LatestValueSnapshot.update(x) for x in entries]
+
+        self.assertEqual(len(Entry.bulk_complement_attrs(entity, entries[:1], user1)), 1)
+
+        # checks the number of queries doesn't depend on the number of entries
+        with CaptureQueriesContext(connection) as ctx:
+            Entry.bulk_complement_attrs(entity, entries[1:2], user1)
+        with self.assertNumQueries(len(ctx)):
+            attrs = Entry.bulk_complement_attrs(entity, entries[2:], user1)
+        self.assertEqual(len(attrs), 4)
+
+        for entry in entries:
+            self.assertEqual(sorted([x.schema.name for x in entry.attrs.filter(is_active=True)]),
+                             ['arr', 'str'])
+
+            attr = entry.attrs.get(schema__name='str')
+            self.assertEqual(attr.name, 'str')
+            self.assertFalse(attr.is_public)
+
+            # checks an initial value of array typed Attribute is created
+            attrv = entry.attrs.get(schema__name='arr').values.get()
+            self.assertTrue(attrv.get_status(AttributeValue.STATUS_DATA_ARRAY_PARENT))
+            self.assertEqual(attrv.data_type, AttrTypeArrStr)
+
+            # checks the snapshot covers the new Attributes
+            document = json.loads(LatestValueSnapshot.objects.get(entry=entry).document)
+            self.assertEqual(document[str(entry.attrs.get(schema__name='arr').id)]['data_type'],
+                             AttrTypeArrStr)
+
+            # checks complement_attrs doesn't create any Attribute after that
+            with self.assertNumQueries(2):
+                entry.complement_attrs(user1)
+
+        # checks nothing is created when all Attributes have been already created
+        self.assertEqual(Entry.bulk_complement_attrs(entity, entries, user1), [])
+
+        # checks permissions of EntityAttr are inherited to the new Attributes
+        [user2.permissions.add(x.full) for x in entity.attrs.all()]
+        entry = Entry.objects.create(name='e4', schema=entity, created_user=user1)
+        Entry.bulk_complement_attrs(entity, [entry], user1)
+        self.assertTrue(all([user2.has_permission(x, ACLType.Full) for x in entry.attrs.all()]))
+
     def test_format_for_history(self):
         user = User.objects.create(username='hoge')
 
@@ -3111,3 +3607,32 @@ class ModelTest(AironeTestCase):
             attr.add_value(user, info['set_val'])
 
             self.assertEqual(attr.get_latest_value().format_for_history(), info['exp_val'])
+
+    def test_inherit_permissions_regardless_of_the_number_of_users(self):
+        entity = Entity.objects.create(name='entity', created_user=self._user)
+        attrbase = EntityAttr.objects.create(name='attr', created_user=self._user,
+                                             parent_entity=entity, is_public=False)
+        group = Group.objects.create(name='group')
+        group.permissions.add(attrbase.readable)
+
+        users = [User.objects.create(username='user-%d' % i) for i in range(10)]
+
+        # checks the number of queries doesn't depend on the number of users who have permission
+        # (ContentType of Attribute is cached in advance not to count the query to get it)
+        ContentType.objects.get_for_model(Attribute)
+        query_counts = []
+        for (index, granted_users) in enumerate([users[:2], users[:8]]):
+            [x.permissions.add(attrbase.full) for x in granted_users]
+
+            entry = Entry.objects.create(name='e-%d' % index, schema=entity,
+                                         created_user=self._user)
+            with CaptureQueriesContext(connection) as ctx:
+                attr = entry.add_attribute_from_base(attrbase, self._user)
+            query_counts.append(len(ctx))
+
+            self.assertTrue(all([x.has_permission(attr, ACLType.Full) for x in granted_users]))
+            self.assertFalse(any([x.has_permission(attr, ACLType.Full)
+                                  for x in users if x not in granted_users]))
+            self.assertTrue(group.has_permission(attr, ACLType.Readable))
+
+        self.assertEqual(query_counts[0], query_counts[1])
@@ -2211,14 +2211,15 @@ class ViewTest(AironeViewTest):
         res = self._es.indices.stats(index=settings.ES_CONFIG['INDEX'])
         self.assertEqual(res['_all']['total']['segments']['count'], 3)
 
-        # checks jobs were created
-        self.assertEqual(Job.objects.filter(user=user).count(), 3)
+        # checks a job was created to copy entry to all names
+        self.assertEqual(Job.objects.filter(user=user).count(), 1)
 
         jobs = Job.objects.filter(user=user, operation=JobOperation.COPY_ENTRY.value)
 
-        self.assertEqual(jobs.count(), 3)
+        self.assertEqual(jobs.count(), 1)
         for obj in jobs.all():
-            self.assertTrue(any([obj.target.name == x for x in ['foo', 'bar', 'baz']]))
+            self.assertEqual(obj.target.id, entry.id)
+            self.assertEqual(json.loads(obj.params)['new_names'], ['foo', 'bar', 'baz'])
             self.assertEqual(obj.text, 'original entry: %s' % entry.name)
             self.assertEqual(obj.target_type, Job.TARGET_ENTRY)
             self.assertEqual(obj.status, Job.STATUS['DONE'])
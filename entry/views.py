@@ -21,7 +21,7 @@ from airone.lib.acl import ACLType
 from airone.lib.profile import airone_profile
 
 from entity.models import Entity
-from entry.models import Entry, Attribute, AttributeValue
+from entry.models import Entry, Attribute, AttributeValue, LatestValueSnapshot
 from job.models import Job, JobOperation
 from user.models import User
 from group.models import Group
@@ -551,8 +551,21 @@ def do_copy(request, entry_id, recv_data):
 
     ret = []
     entry = Entry.objects.get(id=entry_id)
+
+    # These are names of entries which are under processing to be copied by other jobs
+    processing_names = set()
+    for params in [json.loads(x) for x in Job.objects.filter(
+            operation=JobOperation.COPY_ENTRY.value,
+            target=entry,
+            status__in=[Job.STATUS['PREPARING'], Job.STATUS['PROCESSING']]).values_list(
+            'params', flat=True)]:
+        processing_names |= set(params['new_names'] if 'new_names' in params
+                                else [params['new_name']])
+
+    new_names = []
     for new_name in [x for x in recv_data['entries'].split('\n') if x]:
-        if Entry.objects.filter(schema=entry.schema, name=new_name).exists():
+        if (new_name in new_names or
+                Entry.objects.filter(schema=entry.schema, name=new_name).exists()):
             ret.append({
                 'status': 'fail',
                 'msg': 'A same named entry (%s) already exists' % new_name,
@@ -569,32 +582,28 @@ def do_copy(request, entry_id, recv_data):
                 })
                 continue
 
-        params = {
-            'new_name': new_name,
-            'post_data': recv_data,
-        }
-
         # Check another COPY job that targets same name entry is under processing
-        if Job.objects.filter(
-                operation=JobOperation.COPY_ENTRY.value,
-                target=entry,
-                status__in=[Job.STATUS['PREPARING'], Job.STATUS['PROCESSING']],
-                params=json.dumps(params, sort_keys=True)):
+        if new_name in processing_names:
             ret.append({
                 'status': 'fail',
                 'msg': 'There is another job that targets same name(%s) is existed' % new_name,
             })
             continue
 
-        # make a new job to copy entry and run it
-        job = Job.new_copy(user, entry, text=new_name, params=params)
-        job.run()
-
+        new_names.append(new_name)
         ret.append({
             'status': 'success',
             'msg': "Success to create new entry '%s'" % new_name,
         })
 
+    if new_names:
+        # make a new job to copy entry to all names and run it
+        job = Job.new_copy(user, entry, text='\n'.join(new_names), params={
+            'new_names': new_names,
+            'post_data': recv_data,
+        })
+        job.run()
+
     return JsonResponse({'results': ret})
 
 
@@ -712,6 +721,7 @@ def revert_attrv(request, recv_data):
 
         # append cloned value to Attribute
         attr.values.add(new_attrv)
+        LatestValueSnapshot.update(attr.parent_entry, [attr])
 
         # register update to the Elasticsearch
         attr.parent_entry.register_es()
@@ -1,11 +1,28 @@
-from django.db import models
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import Group as DjangoGroup
 from datetime import datetime
 
-DjangoGroup.get_acls = (lambda x, obj: x.permissions.filter(codename__regex=(r'^%d\.' % obj.id)))
+DjangoGroup.get_acls = (lambda x, obj: x.permissions.filter(aclpermission__object_id=obj.id))
 
 
 class Group(DjangoGroup):
+    # These are the keys of the active Groups which are cached in the shared cache. The version
+    # is renewed whenever any Group is changed to expire the cached ones in all processes.
+    CACHE_KEY_VERSION = 'airone_active_groups_version'
+    CACHE_KEY_GROUPS = 'airone_active_groups_%s'
+
+    # This is a copy of the cached active Groups in this process with its version and the time
+    # until which it's used without checking the version. So the changes in other processes are
+    # reflected within LOCAL_CACHE_TTL seconds.
+    LOCAL_CACHE_TTL = 5
+    _local_cache = (None, None, None)
+
     is_active = models.BooleanField(default=True)
 
     def delete(self):
@@ -17,5 +34,62 @@ class Group(DjangoGroup):
         self.save()
 
     def has_permission(self, target_obj, permission_level):
-        return any([permission_level.id <= x.get_aclid() for x
-                    in self.permissions.all() if target_obj.id == x.get_objid()])
+        return self.permissions.filter(
+            aclpermission__object_id=target_obj.id,
+            aclpermission__acltype__gte=permission_level.id).exists()
+
+    @classmethod
+    def get_active_groups(kls):
+        """
+        This returns all active Groups by the id (str). Groups are few and rarely changed,
+        so they are cached in this process and in the shared cache until any of them is changed.
+        """
+        (local_version, groups, expires_at) = kls._local_cache
+        if expires_at is not None and time.monotonic() < expires_at:
+            return groups
+
+        version = cache.get(kls.CACHE_KEY_VERSION)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set(kls.CACHE_KEY_VERSION, version)
+
+        if local_version == version:
+            kls._local_cache = (version, groups, time.monotonic() + kls.LOCAL_CACHE_TTL)
+            return groups
+
+        groups = cache.get(kls.CACHE_KEY_GROUPS % version)
+        if groups is None:
+            groups = {str(x.id): x for x in kls.objects.filter(is_active=True)}
+            cache.set(kls.CACHE_KEY_GROUPS % version, groups)
+
+        kls._local_cache = (version, groups, time.monotonic() + kls.LOCAL_CACHE_TTL)
+
+        return groups
+
+    @classmethod
+    def get_active_group(kls, group_id):
+        """This returns the active Group of specified id (int or str) from the cache"""
+        return kls.get_active_groups().get(str(group_id))
+
+    @classmethod
+    def get_active_group_by_name(kls, name):
+        """This returns the active Group of specified name from the cache"""
+        return next((x for x in kls.get_active_groups().values() if x.name == name), None)
+
+    @classmethod
+    def clear_cache(kls):
+        """This expires the cached active Groups in all processes"""
+        cache.delete(kls.CACHE_KEY_VERSION)
+        kls._local_cache = (None, None, None)
+
+
+# This handler expires the cached active Groups when any Group is changed
+@receiver(post_save, sender=Group)
+@receiver(post_save, sender=DjangoGroup)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=DjangoGroup)
+def _group_changed(sender, instance, **kwargs):
+    # The cache is expired again after the transaction is committed, because other processes
+    # could cache the Groups which have not been changed yet until then.
+    Group.clear_cache()
+    transaction.on_commit(Group.clear_cache)
@@ -1,11 +1,19 @@
 
+import time
+
+from django.contrib.auth.models import Group as DjangoGroup
+from django.core.cache import cache
 from django.test import TestCase
+from unittest.mock import patch
 from entity.models import Entity
 from group.models import Group
 from user.models import User
 
 
 class ModelTest(TestCase):
+    def setUp(self):
+        Group.clear_cache()
+
     def test_create_group(self):
         name = "ほげgroup"
         user1 = self._create_user("user1")
@@ -43,6 +51,67 @@ class ModelTest(TestCase):
         self.assertFalse(group.is_active)
         self.assertEqual(group.name.find('group_deleted_'), 0)
 
+    def test_get_active_groups_from_cache(self):
+        groups = [Group.objects.create(name='group-%d' % i) for i in range(3)]
+        groups[2].delete()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(sorted(Group.get_active_groups().keys()),
+                             sorted([str(x.id) for x in groups[:2]]))
+
+            # the cached Groups are returned without sending any query
+            self.assertEqual(Group.get_active_group(groups[0].id).name, 'group-0')
+            self.assertEqual(Group.get_active_group(str(groups[1].id)).name, 'group-1')
+            self.assertEqual(Group.get_active_group_by_name('group-1').id, groups[1].id)
+            self.assertIsNone(Group.get_active_group(groups[2].id))
+            self.assertIsNone(Group.get_active_group_by_name('group-2'))
+
+    def test_get_active_groups_from_shared_cache(self):
+        group = Group.objects.create(name='group')
+        Group.get_active_groups()
+
+        # the Groups which are cached by another process are used without sending any query
+        Group._local_cache = (None, None, None)
+        with self.assertNumQueries(0):
+            self.assertEqual(Group.get_active_group(group.id).name, 'group')
+
+    def test_check_version_of_local_cache_periodically(self):
+        group = Group.objects.create(name='group')
+        Group.get_active_groups()
+
+        # the local copy is used without checking the version in the shared cache until it expires
+        with patch('group.models.cache.get') as mock_get:
+            self.assertEqual(Group.get_active_group(group.id).name, 'group')
+            self.assertFalse(mock_get.called)
+
+        # the change in another process is reflected after the local copy expires
+        DjangoGroup.objects.filter(id=group.id).update(name='changed')
+        cache.delete(Group.CACHE_KEY_VERSION)
+        self.assertEqual(Group.get_active_group(group.id).name, 'group')
+
+        with patch('time.monotonic', return_value=time.monotonic() + Group.LOCAL_CACHE_TTL):
+            self.assertEqual(Group.get_active_group(group.id).name, 'changed')
+
+    def test_cache_is_expired_when_group_is_changed(self):
+        group = Group.objects.create(name='group')
+        self.assertEqual(Group.get_active_group(group.id).name, 'group')
+
+        group.name = 'changed'
+        group.save()
+        self.assertEqual(Group.get_active_group(group.id).name, 'changed')
+        self.assertIsNone(Group.get_active_group_by_name('group'))
+
+        group.delete()
+        self.assertIsNone(Group.get_active_group(group.id))
+
+        group = Group.objects.create(name='new-group')
+        self.assertEqual(Group.get_active_group_by_name('new-group'), group)
+
+        # the cache is also expired after the transaction is committed
+        with patch('group.models.transaction.on_commit') as mock_on_commit:
+            group.save()
+            mock_on_commit.assert_called_with(Group.clear_cache)
+
     def _create_user(self, name):
         user = User(username=name)
         user.save()
@@ -36,6 +36,8 @@ class JobOperation(Enum):
     RESTORE_ENTRY = 7
     EXPORT_SEARCH_RESULT = 8
     REGISTER_REFERRALS = 9
+    APPLY_ACL = 10
+    COMPLEMENT_ATTRS = 11
 
 
 class Job(models.Model):
@@ -79,6 +81,7 @@ class Job(models.Model):
     # These are the jobs that should be proceeded transparently.
     HIDDEN_OPERATIONS = [
         JobOperation.REGISTER_REFERRALS.value,
+        JobOperation.COMPLEMENT_ATTRS.value,
     ]
 
     user = models.ForeignKey(User)
@@ -246,6 +249,8 @@ class Job(models.Model):
         if not kls._METHOD_TABLE:
             entry_task = kls.get_task_module('entry.tasks')
             dashboard_task = kls.get_task_module('dashboard.tasks')
+            acl_task = kls.get_task_module('acl.tasks')
+            entity_task = kls.get_task_module('entity.tasks')
 
             kls._METHOD_TABLE = {
                 JobOperation.CREATE_ENTRY.value: entry_task.create_entry_attrs,
@@ -257,6 +262,8 @@ class Job(models.Model):
                 JobOperation.RESTORE_ENTRY.value: entry_task.restore_entry,
                 JobOperation.EXPORT_SEARCH_RESULT.value: dashboard_task.export_search_result,
                 JobOperation.REGISTER_REFERRALS.value: entry_task.register_referrals,
+                JobOperation.APPLY_ACL.value: acl_task.apply_acl,
+                JobOperation.COMPLEMENT_ATTRS.value: entity_task.complement_attrs,
             }
 
         return kls._METHOD_TABLE
@@ -319,6 +326,17 @@ class Job(models.Model):
         return kls._create_new_job(user, target, JobOperation.REGISTER_REFERRALS.value, '',
                                    json.dumps({}, default=_support_time_default, sort_keys=True))
 
+    @classmethod
+    def new_apply_acl(kls, user, target=None, text='', params={}):
+        return kls._create_new_job(user, target, JobOperation.APPLY_ACL.value, text,
+                                   json.dumps(params, default=_support_time_default,
+                                              sort_keys=True))
+
+    @classmethod
+    def new_complement_attrs(kls, user, entity):
+        return kls._create_new_job(user, entity, JobOperation.COMPLEMENT_ATTRS.value, '',
+                                   json.dumps({}, default=_support_time_default, sort_keys=True))
+
     def set_cache(self, value):
         with open('%s/job_%d' % (settings.AIRONE['FILE_STORE_PATH'], self.id), 'wb') as fp:
             pickle.dump(value, fp)
@@ -45,7 +45,8 @@ def index(request):
         } for x in Job.objects.filter(query).order_by('-created_at')[:limitation]
             if (x.operation in export_operations or
                 (x.operation not in export_operations and x.target and x.target.is_active) or
-                (x.operation is JobOperation.DELETE_ENTRY.value and x.target))]
+                (x.operation is JobOperation.DELETE_ENTRY.value and x.target) or
+                (x.operation is JobOperation.APPLY_ACL.value and not x.target))]
     }
 
     return render(request, 'list_jobs.html', context)
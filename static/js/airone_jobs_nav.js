@@ -60,6 +60,11 @@ $(document).ready(function() {
               target_name = jobinfo['target']['name'];
               operation = '復旧';
               break;
+            case data['constant']['operation']['apply_acl']:
+              // The case of applying ACL to objects which are specified by id, it has no target
+              target_name = jobinfo['target']['name'] || '';
+              operation = 'ACL 設定';
+              break;
           }
 
           switch(jobinfo['status']) {
@@ -74,6 +79,8 @@ $(document).ready(function() {
                          operation_type == data['constant']['operation']['export_search_result']) {
                 // The case of export job, it has no target
                 link_url = `/job/download/${ jobinfo['id'] }`;
+              } else if (operation_type == data['constant']['operation']['apply_acl']) {
+                link_url = '/job/';
               } else {
                 // This indicates Entry-ID by default
                 link_url = `/entry/show/${ jobinfo['target']['id'] }`;
@@ -0,0 +1,212 @@
+import argparse
+import django
+import json
+import os
+import random
+import sys
+
+# append airone directory to the default path
+sys.path.append("./")
+
+# prepare to load the data models of AirOne
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "airone.settings")
+
+# load AirOne application
+django.setup()
+
+from django.db import transaction # NOQA
+from django.test import RequestFactory # NOQA
+
+from acl import views as acl_views # NOQA
+from airone.lib.acl import ACLType, get_permitted_objects # NOQA
+from airone.lib.types import AttrTypeValue # NOQA
+from entity.models import Entity, EntityAttr # NOQA
+from entry.models import Entry # NOQA
+from group.models import Group # NOQA
+from tools.bench_entry import Measurement # NOQA
+from user.models import User # NOQA
+
+
+def create_dataset(user_count, group_count, entity_count, attr_count, entry_count,
+                   public_ratio, grant_count, groups_per_user, seed):
+    """This creates users, groups and ACL objects (entities, their attributes and entries)
+    which have the specified ratio of public objects. Each of private objects are granted
+    to grant_count members (users or groups) at random.
+    """
+    rand = random.Random(seed)
+
+    users = [User.objects.create(username='bench_acl_user-%d' % i) for i in range(user_count)]
+    groups = [Group.objects.create(name='bench_acl_group-%d' % i) for i in range(group_count)]
+    for user in users:
+        for group in rand.sample(groups, min(groups_per_user, group_count)):
+            user.groups.add(group)
+
+    admin = User.objects.create(username='bench_acl_admin', is_superuser=True)
+
+    def _create_aclobj(model, **params):
+        obj = model.objects.create(created_user=admin,
+                                   is_public=(rand.random() < public_ratio), **params)
+
+        if not obj.is_public:
+            for member in rand.sample(users + groups, min(grant_count, len(users + groups))):
+                member.permissions.add(getattr(obj, rand.choice(ACLType.availables()).name))
+
+        return obj
+
+    entities = []
+    entries = []
+    for i in range(entity_count):
+        entity = _create_aclobj(Entity, name='bench_acl_entity-%d' % i)
+        for j in range(attr_count):
+            entity.attrs.add(_create_aclobj(EntityAttr, name='attr-%d' % j,
+                                            type=AttrTypeValue['string'],
+                                            parent_entity=entity))
+        for j in range(entry_count):
+            entries.append(_create_aclobj(Entry, name='entry-%d' % j, schema=entity))
+
+        entities.append(entity)
+
+    return {
+        'admin': admin,
+        'users': users,
+        'groups': groups,
+        'objects': entities + entries,
+    }
+
+
+def _get_result(measurement, calls):
+    return {
+        'calls': calls,
+        'elapsed_seconds': measurement.elapsed,
+        'seconds_per_call': measurement.elapsed / calls if calls else 0,
+        'queries_per_call': measurement.queries / calls if calls else 0,
+    }
+
+
+def _get_fresh_users(users):
+    # This clears permissions which are cached in the previous measurement
+    User.clear_permission_map([x.id for x in users])
+
+    return [User.objects.get(id=x.id) for x in users]
+
+
+def bench_has_permission(users, objects):
+    measurement = Measurement()
+    for user in _get_fresh_users(users):
+        # objects are also retrieved from database to measure the cost to get their parent
+        targets = [x.get_subclass_object() for x in objects]
+        with measurement:
+            for obj in targets:
+                user.has_permission(obj, ACLType.Readable)
+
+    return _get_result(measurement, len(users) * len(objects))
+
+
+def bench_is_permitted(users, objects):
+    measurement = Measurement()
+    for user in _get_fresh_users(users):
+        with measurement:
+            for obj in objects:
+                user.is_permitted(obj, ACLType.Readable)
+
+    return _get_result(measurement, len(users) * len(objects))
+
+
+def bench_may_permitted(users, objects):
+    acl_settings = [{
+        'member_type': 'user',
+        'member_id': str(users[0].id),
+        'value': str(ACLType.Readable.id),
+    }] if users else []
+
+    measurement = Measurement()
+    for user in _get_fresh_users(users):
+        with measurement:
+            for obj in objects:
+                user.may_permitted(obj, ACLType.Full, False, ACLType.Nothing, acl_settings)
+
+    return _get_result(measurement, len(users) * len(objects))
+
+
+def bench_get_permitted_objects(users):
+    measurement = Measurement()
+    for user in _get_fresh_users(users):
+        with measurement:
+            for model in [Entity, EntityAttr, Entry]:
+                list(get_permitted_objects(user, model, ACLType.Readable))
+
+    return _get_result(measurement, len(users) * 3)
+
+
+def bench_acl_index(admin, objects):
+    factory = RequestFactory()
+
+    measurement = Measurement()
+    for obj in objects:
+        request = factory.get('/acl/%d' % obj.id)
+        request.user = admin
+
+        with measurement:
+            resp = acl_views.index(request, obj.id)
+
+        if resp.status_code != 200:
+            raise RuntimeError('Failed to show ACL of %s: %s' % (obj.name, resp.content))
+
+    return _get_result(measurement, len(objects))
+
+
+def run(args):
+    results = {'config': vars(args)}
+
+    # All data which is created for benchmarking is rolled back at the end
+    with transaction.atomic():
+        dataset = create_dataset(args.users, args.groups, args.entities, args.attrs,
+                                 args.entries, args.public_ratio, args.grants,
+                                 args.groups_per_user, args.seed)
+
+        rand = random.Random(args.seed)
+        users = rand.sample(dataset['users'], min(args.sample_users, len(dataset['users'])))
+        objects = rand.sample(dataset['objects'], min(args.sample_objects,
+                                                      len(dataset['objects'])))
+
+        results['has_permission'] = bench_has_permission(users, objects)
+        results['is_permitted'] = bench_is_permitted(users, objects)
+        results['may_permitted'] = bench_may_permitted(users, objects)
+        results['get_permitted_objects'] = bench_get_permitted_objects(users)
+        results['acl_index'] = bench_acl_index(dataset['admin'], objects)
+
+        transaction.set_rollback(True)
+
+    return results
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(description='Benchmark of checking permissions')
+    parser.add_argument('--users', type=int, default=100,
+                        help='number of users to create (default: 100)')
+    parser.add_argument('--groups', type=int, default=20,
+                        help='number of groups to create (default: 20)')
+    parser.add_argument('--groups-per-user', type=int, default=3,
+                        help='number of groups which each user belongs to (default: 3)')
+    parser.add_argument('--entities', type=int, default=10,
+                        help='number of entities to create (default: 10)')
+    parser.add_argument('--attrs', type=int, default=10,
+                        help='number of attributes of each entities (default: 10)')
+    parser.add_argument('--entries', type=int, default=100,
+                        help='number of entries of each entities (default: 100)')
+    parser.add_argument('--public-ratio', type=float, default=0.5,
+                        help='ratio of public objects (default: 0.5)')
+    parser.add_argument('--grants', type=int, default=3,
+                        help='number of members granted to each private objects (default: 3)')
+    parser.add_argument('--sample-users', type=int, default=10,
+                        help='number of users whose permissions are checked (default: 10)')
+    parser.add_argument('--sample-objects', type=int, default=100,
+                        help='number of objects whose permissions are checked (default: 100)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed to generate the dataset reproducibly (default: 0)')
+
+    return parser
+
+
+if __name__ == "__main__":
+    print(json.dumps(run(get_parser().parse_args()), indent=2))
@@ -0,0 +1,155 @@
+import argparse
+import django
+import json
+import os
+import sys
+import time
+
+# append airone directory to the default path
+sys.path.append("./")
+
+# prepare to load the data models of AirOne
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "airone.settings")
+
+# load AirOne application
+django.setup()
+
+from django.contrib.auth.models import Permission # NOQA
+from django.db import connection, reset_queries, transaction # NOQA
+from django.test.utils import CaptureQueriesContext # NOQA
+
+from airone.lib.types import AttrTypeValue # NOQA
+from entity.models import Entity, EntityAttr # NOQA
+from entry.models import Entry # NOQA
+from user.models import User # NOQA
+
+
+class Measurement(object):
+    """This accumulates elapsed time and the number of queries sent in each context"""
+
+    def __init__(self):
+        self.elapsed = 0
+        self.queries = 0
+
+    def __enter__(self):
+        # clear query logs not to be beyond the limit of the logs while measuring
+        reset_queries()
+
+        self._queries = CaptureQueriesContext(connection)
+        self._queries.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.elapsed += time.perf_counter() - self._start
+        self._queries.__exit__(*args, **kwargs)
+        self.queries += len(self._queries)
+
+
+def bench_create_entries(entry_count, attr_count):
+    """This measures the throughput of creating entries which have specified number of
+    attributes in the same way of the entry creation job.
+    """
+    user = User.objects.create(username='bench_entry_user')
+    entity = Entity.objects.create(name='bench_entity', created_user=user)
+    for index in range(attr_count):
+        entity.attrs.add(EntityAttr.objects.create(**{
+            'name': 'attr-%d' % index,
+            'type': AttrTypeValue['string'],
+            'created_user': user,
+            'parent_entity': entity,
+        }))
+
+    permission_count = Permission.objects.count()
+    measurement = Measurement()
+    for index in range(entry_count):
+        with measurement:
+            entry = Entry.objects.create(name='entry-%d' % index, created_user=user,
+                                         schema=entity)
+
+            for entity_attr in entity.attrs.filter(is_active=True):
+                attr = entry.add_attribute_from_base(entity_attr, user)
+                attr.add_value(user, 'value-%d' % index)
+
+    return {
+        'entry_count': entry_count,
+        'attr_count': attr_count,
+        'elapsed_seconds': measurement.elapsed,
+        'entries_per_second': entry_count / measurement.elapsed,
+        'queries_per_entry': measurement.queries / entry_count,
+        'permissions_per_entry': (Permission.objects.count() - permission_count) / entry_count,
+    }
+
+
+def bench_add_array_values(element_counts, repeat):
+    """This measures the cost of Attribute.add_value with array values which have each of
+    specified number of elements for each array types.
+    """
+    user = User.objects.create(username='bench_array_user')
+    ref_entity = Entity.objects.create(name='bench_array_ref_entity', created_user=user)
+    refs = [Entry.objects.create(name='ref-%d' % i, created_user=user, schema=ref_entity)
+            for i in range(max(element_counts))]
+
+    entity = Entity.objects.create(name='bench_array_entity', created_user=user)
+    values = {
+        'array_string': lambda count: ['value-%d' % i for i in range(count)],
+        'array_object': lambda count: [str(x.id) for x in refs[:count]],
+        'array_named_object': lambda count: [{'name': 'value-%d' % i, 'id': str(x.id)}
+                                             for (i, x) in enumerate(refs[:count])],
+    }
+    for type_name in values.keys():
+        attr = EntityAttr.objects.create(name=type_name, type=AttrTypeValue[type_name],
+                                         created_user=user, parent_entity=entity)
+        attr.referral.add(ref_entity)
+        entity.attrs.add(attr)
+
+    entry = Entry.objects.create(name='entry', created_user=user, schema=entity)
+    entry.complement_attrs(user)
+
+    results = {}
+    for (type_name, get_value) in values.items():
+        attr = entry.attrs.get(schema__name=type_name)
+
+        results[type_name] = {}
+        for count in element_counts:
+            value = get_value(count)
+
+            measurement = Measurement()
+            for _ in range(repeat):
+                with measurement:
+                    attr.add_value(user, value)
+
+            results[type_name][count] = {
+                'elapsed_seconds': measurement.elapsed,
+                'seconds_per_call': measurement.elapsed / repeat,
+                'queries_per_call': measurement.queries / repeat,
+            }
+
+    return results
+
+
+def run(args):
+    results = {}
+
+    # All data which is created for benchmarking is rolled back at the end
+    with transaction.atomic():
+        results['create_entries'] = bench_create_entries(args.entries, args.attrs)
+        results['add_array_values'] = bench_add_array_values(args.array_sizes, args.repeat)
+
+        transaction.set_rollback(True)
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark of manipulating entries')
+    parser.add_argument('--entries', type=int, default=100,
+                        help='number of entries to create (default: 100)')
+    parser.add_argument('--attrs', type=int, default=30,
+                        help='number of attributes of each entries (default: 30)')
+    parser.add_argument('--array-sizes', type=int, nargs='+', default=[1, 100, 1000],
+                        help='numbers of elements of array values to add (default: 1 100 1000)')
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='number of times to add each array values (default: 10)')
+
+    print(json.dumps(run(parser.parse_args()), indent=2))
@@ -0,0 +1,47 @@
+import django
+import os
+import sys
+
+# append airone directory to the default path
+sys.path.append("./")
+
+# prepare to load the data models of AirOne
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "airone.settings")
+
+# load AirOne application
+django.setup()
+
+from django.contrib.auth.models import Permission # NOQA
+from airone.lib.acl import ACLType # NOQA
+
+# This is the number of Permission objects to delete at once
+CHUNK_SIZE = 500
+
+
+def clear_unused_permissions():
+    """Permission objects of each ACLBase object had been created whenever it was created.
+    Now they are created when ACL is set to the object, so this deletes ones which are not
+    assigned to any user or group.
+    """
+    unused_permissions = Permission.objects.filter(
+        name__in=[x.name for x in ACLType.availables()],
+        user__isnull=True,
+        group__isnull=True)
+
+    total_count = unused_permissions.count()
+    deleted_count = 0
+    while True:
+        permission_ids = list(unused_permissions.values_list('id', flat=True)[:CHUNK_SIZE])
+        if not permission_ids:
+            break
+
+        Permission.objects.filter(id__in=permission_ids).delete()
+
+        deleted_count += len(permission_ids)
+        sys.stdout.write('\rDelete permissions: (%8d/%8d)' % (deleted_count, total_count))
+
+    return deleted_count
+
+
+if __name__ == "__main__":
+    clear_unused_permissions()
@@ -0,0 +1,66 @@
+import django
+import os
+import re
+import sys
+
+# append airone directory to the default path
+sys.path.append("./")
+
+# prepare to load the data models of AirOne
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "airone.settings")
+
+# load AirOne application
+django.setup()
+
+from django.contrib.auth.models import Permission # NOQA
+from acl.models import ACLPermission # NOQA
+from airone.lib.acl import ACLType # NOQA
+
+# This is the number of Permission objects to index at once
+CHUNK_SIZE = 1000
+
+
+def index_acl_permissions():
+    """Permissions of ACLBase objects are looked up by ACLPermission which indexes them by
+    the object id and the ACLType id. This creates ACLPermission for the Permission objects
+    which were created before it was introduced, by decoding their codename.
+    """
+    unindexed_permissions = Permission.objects.filter(
+        name__in=[x.name for x in ACLType.availables()],
+        aclpermission__isnull=True).order_by('id')
+
+    total_count = unindexed_permissions.count()
+    processed_count = 0
+    indexed_count = 0
+    last_id = 0
+    while True:
+        permissions = list(unindexed_permissions.filter(id__gt=last_id).values_list(
+            'id', 'codename')[:CHUNK_SIZE])
+        if not permissions:
+            break
+
+        indexes = {}
+        for (permission_id, codename) in permissions:
+            if re.match(r'^[0-9]+\.[0-9]+$', codename):
+                (objid, acltype) = [int(x) for x in codename.split('.')]
+                indexes.setdefault((objid, acltype), permission_id)
+
+        # The Permission object which has the same codename of the indexed one is not indexed
+        indexed = ACLPermission.objects.filter(object_id__in=[x for (x, _) in indexes])
+        for key in indexed.values_list('object_id', 'acltype'):
+            indexes.pop(key, None)
+
+        ACLPermission.objects.bulk_create([
+            ACLPermission(permission_id=permission_id, object_id=objid, acltype=acltype)
+            for ((objid, acltype), permission_id) in indexes.items()])
+
+        last_id = permissions[-1][0]
+        processed_count += len(permissions)
+        indexed_count += len(indexes)
+        sys.stdout.write('\rIndex permissions: (%8d/%8d)' % (processed_count, total_count))
+
+    return indexed_count
+
+
+if __name__ == "__main__":
+    index_acl_permissions()
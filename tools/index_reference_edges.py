@@ -0,0 +1,45 @@
+import django
+import os
+import sys
+
+# append airone directory to the default path
+sys.path.append("./")
+
+# prepare to load the data models of AirOne
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "airone.settings")
+
+# load AirOne application
+django.setup()
+
+from entry.models import Attribute, ReferenceEdge # NOQA
+
+# This is the number of Attribute objects to index at once
+CHUNK_SIZE = 1000
+
+
+def index_reference_edges():
+    """Entries which refer an entry are looked up by ReferenceEdge which is maintained when
+    the latest values of Attributes are changed. This makes ReferenceEdge from the latest
+    values of all Attributes which were set before it was introduced.
+    """
+    attrs = Attribute.objects.order_by('id')
+
+    total_count = attrs.count()
+    processed_count = 0
+    last_id = 0
+    while True:
+        attr_ids = list(attrs.filter(id__gt=last_id).values_list('id', flat=True)[:CHUNK_SIZE])
+        if not attr_ids:
+            break
+
+        ReferenceEdge.update(id__in=attr_ids)
+
+        last_id = attr_ids[-1]
+        processed_count += len(attr_ids)
+        sys.stdout.write('\rIndex references: (%8d/%8d)' % (processed_count, total_count))
+
+    return ReferenceEdge.objects.count()
+
+
+if __name__ == "__main__":
+    index_reference_edges()
@@ -17,15 +17,17 @@ from airone.lib.elasticsearch import ESS # NOQA
 ES_INDEX = django.conf.settings.ES_CONFIG['INDEX']
 
 
-def register_entries(es):
+def _get_entries():
     total_count = Entry.objects.filter(is_active=True).count()
-    current_index = 1
-    for entry in Entry.objects.filter(is_active=True):
-        sys.stdout.write('\rRegister entry: (%6d/%6d)' % (current_index, total_count))
+    for (index, entry) in enumerate(Entry.objects.filter(is_active=True).iterator(), start=1):
+        sys.stdout.write('\rRegister entry: (%6d/%6d)' % (index, total_count))
+
+        yield entry
 
-        entry.register_es(es, skip_refresh=True)
 
-        current_index += 1
+def register_entries(es):
+    # documents of entries are sent by the bulk indexer while they are made
+    Entry.register_es_documents(_get_entries(), es=es, skip_refresh=True)
 
     es.indices.refresh(index=ES_INDEX)
 
@@ -0,0 +1,20 @@
+from airone.lib.test import AironeTestCase
+
+from tools.bench_acl import get_parser, run
+
+
+class BenchACLTest(AironeTestCase):
+    def test_bench_acl(self):
+        args = get_parser().parse_args(['--users', '3', '--groups', '2', '--entities', '2',
+                                        '--attrs', '2', '--entries', '3',
+                                        '--sample-users', '2', '--sample-objects', '5'])
+        results = run(args)
+
+        self.assertEqual(results['config']['users'], 3)
+        for name in ['has_permission', 'is_permitted', 'may_permitted',
+                     'get_permitted_objects', 'acl_index']:
+            self.assertGreater(results[name]['calls'], 0)
+            self.assertGreaterEqual(results[name]['queries_per_call'], 0)
+
+        # showing ACL page needs to send queries
+        self.assertGreater(results['acl_index']['queries_per_call'], 0)
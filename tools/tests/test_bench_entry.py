@@ -0,0 +1,24 @@
+from acl.models import ACLPermission
+from airone.lib.test import AironeTestCase
+
+from tools.bench_entry import bench_create_entries, bench_add_array_values
+
+
+class BenchEntryTest(AironeTestCase):
+    def test_bench_create_entries(self):
+        result = bench_create_entries(entry_count=3, attr_count=2)
+
+        self.assertEqual(result['entry_count'], 3)
+        self.assertEqual(result['attr_count'], 2)
+        self.assertGreater(result['queries_per_entry'], 0)
+
+        # creating entries which no ACL is assigned to doesn't make Permission objects
+        self.assertEqual(result['permissions_per_entry'], 0)
+        self.assertFalse(ACLPermission.objects.exists())
+
+    def test_bench_add_array_values(self):
+        result = bench_add_array_values(element_counts=[1, 3], repeat=2)
+
+        for type_name in ['array_string', 'array_object', 'array_named_object']:
+            self.assertEqual(sorted(result[type_name].keys()), [1, 3])
+            self.assertGreater(result[type_name][3]['queries_per_call'], 0)
@@ -0,0 +1,24 @@
+from django.contrib.auth.models import Permission
+
+from acl.models import ACLPermission
+from airone.lib.acl import ACLType
+from airone.lib.test import AironeTestCase
+from entity.models import Entity
+from user.models import User
+
+from tools.clear_unused_permissions import clear_unused_permissions
+
+
+class ClearUnusedPermissionsTest(AironeTestCase):
+    def test_clear_unused_permissions(self):
+        user = User.objects.create(username='test')
+        entity = Entity.objects.create(name='entity', created_user=user)
+
+        # make Permission objects which are assigned and not assigned to user
+        user.permissions.add(entity.readable)
+        ACLPermission.create_permissions([(entity.id, x.id, Entity)
+                                          for x in [ACLType.Writable, ACLType.Full]])
+
+        self.assertEqual(clear_unused_permissions(), 2)
+        self.assertEqual(list(Permission.objects.filter(codename__startswith='%d.' % entity.id)),
+                         [entity.readable])
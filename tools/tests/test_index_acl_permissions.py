@@ -0,0 +1,36 @@
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+
+from acl.models import ACLPermission
+from airone.lib.acl import ACLType
+from airone.lib.test import AironeTestCase
+from entity.models import Entity
+from user.models import User
+
+from tools.index_acl_permissions import index_acl_permissions
+
+
+class IndexACLPermissionsTest(AironeTestCase):
+    def test_index_acl_permissions(self):
+        user = User.objects.create(username='test')
+        entity = Entity.objects.create(name='entity', created_user=user)
+
+        # make Permission objects which are not indexed like ones created before
+        content_type = ContentType.objects.get_for_model(Entity)
+        for acltype in ACLType.availables():
+            Permission.objects.create(name=acltype.name, content_type=content_type,
+                                      codename='%d.%d' % (entity.id, acltype.id))
+        user.permissions.add(Permission.objects.get(codename='%d.%d' % (entity.id,
+                                                                        ACLType.Writable.id)))
+        self.assertFalse(user.get_acls(entity).exists())
+
+        self.assertEqual(index_acl_permissions(), 3)
+        self.assertEqual(sorted(ACLPermission.objects.filter(object_id=entity.id).values_list(
+            'acltype', flat=True)), [x.id for x in ACLType.availables()])
+
+        # indexed permissions are referred
+        self.assertEqual([x.name for x in user.get_acls(entity)], [ACLType.Writable.name])
+        self.assertEqual(entity.writable.codename, '%d.%d' % (entity.id, ACLType.Writable.id))
+
+        # already indexed permissions are skipped
+        self.assertEqual(index_acl_permissions(), 0)
@@ -0,0 +1,38 @@
+from airone.lib.test import AironeTestCase
+from airone.lib.types import AttrTypeValue
+from entity.models import Entity, EntityAttr
+from entry.models import Entry, ReferenceEdge
+from user.models import User
+
+from tools.index_reference_edges import index_reference_edges
+
+
+class IndexReferenceEdgesTest(AironeTestCase):
+    def test_index_reference_edges(self):
+        user = User.objects.create(username='test')
+        ref_entity = Entity.objects.create(name='ref_entity', created_user=user)
+        refs = [Entry.objects.create(name='r%d' % i, schema=ref_entity, created_user=user)
+                for i in range(2)]
+
+        entity = Entity.objects.create(name='entity', created_user=user)
+        for (name, attrtype) in [('obj', 'object'), ('arr', 'array_object')]:
+            attr = EntityAttr.objects.create(name=name, type=AttrTypeValue[attrtype],
+                                             created_user=user, parent_entity=entity)
+            attr.referral.add(ref_entity)
+            entity.attrs.add(attr)
+
+        entry = Entry.objects.create(name='entry', schema=entity, created_user=user)
+        entry.complement_attrs(user)
+        entry.attrs.get(name='obj').add_value(user, refs[0])
+        entry.attrs.get(name='arr').add_value(user, refs)
+
+        # make the situation that edges have not been made for values set before
+        ReferenceEdge.objects.all().delete()
+        self.assertFalse(refs[0].get_referred_objects().exists())
+
+        self.assertEqual(index_reference_edges(), 3)
+        self.assertEqual(list(refs[0].get_referred_objects()), [entry])
+        self.assertEqual(list(refs[1].get_referred_objects()), [entry])
+
+        # indexing again doesn't make duplicate edges
+        self.assertEqual(index_reference_edges(), 3)
@@ -12,40 +12,40 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "airone.settings")
 django.setup()
 
 from entry.models import Entry # NOQA
-from airone.lib.elasticsearch import ESS # NOQA
+from airone.lib.elasticsearch import ESS, scan_query # NOQA
 
 ES_INDEX = django.conf.settings.ES_CONFIG['INDEX']
 
 
-def register_documents(es, es_index):
+def _get_entries():
     total_count = Entry.objects.filter(is_active=True).count()
-    current_index = 1
-    for entry in Entry.objects.filter(is_active=True):
-        sys.stdout.write('\rRegister entry: (%6d/%6d)' % (current_index, total_count))
+    for (index, entry) in enumerate(Entry.objects.filter(is_active=True).iterator(), start=1):
+        sys.stdout.write('\rRegister entry: (%6d/%6d)' % (index, total_count))
+
+        yield entry
 
-        entry.register_es(es, skip_refresh=True)
 
-        current_index += 1
+def register_documents(es, es_index):
+    # documents of entries are sent by the bulk indexer while they are made
+    Entry.register_es_documents(_get_entries(), es=es, skip_refresh=True)
 
     es.indices.refresh(index=es_index)
 
 
 def delete_unnecessary_documents(es, es_index):
+    # only ids of documents are necessary
     query = {
+        '_source': False,
         'query': {
             'match_all': {}
         }
     }
-    res = es.search(body=query)
-    if 'status' in res and res['status'] == 404:
-        raise('Failed to get entries')
-
-    es_entry_ids = [int(x['_id']) for x in res['hits']['hits']]
+    es_entry_ids = [int(x['_id']) for x in scan_query(query, es=es, preserve_order=False)]
     airone_entry_ids = Entry.objects.filter(is_active=True).values_list('id', flat=True)
 
     # delete documents that have been deleted already
-    for entry_id in (set(es_entry_ids) - set(airone_entry_ids)):
-        es.delete(doc_type='entry', id=entry_id, ignore=[404])
+    es.bulk_index({'_op_type': 'delete', '_id': x}
+                  for x in (set(es_entry_ids) - set(airone_entry_ids)))
 
     es.indices.refresh(index=es_index)
 
@@ -53,6 +53,9 @@ def delete_unnecessary_documents(es, es_index):
 if __name__ == "__main__":
     es = ESS()
 
+    # apply settings of the index which might be created by the older version
+    es.update_index_settings()
+
     # register all entries to Elasticsearch
     register_documents(es, ES_INDEX)
 
@@ -1,8 +1,16 @@
 from importlib import import_module
 
 from django.db import models
+from django.db.models import Max, Q
+from django.db.models.signals import m2m_changed
+from django.dispatch import receiver
+from django.core.cache import cache
 from django.contrib.auth.models import User as DjangoUser
-from airone.lib.acl import ACLTypeBase
+from django.contrib.auth.models import Group as DjangoGroup
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from airone.lib.acl import ACLObjType, ACLType, ACLTypeBase
+from airone.lib.acl import get_permission_check_cache, clear_permission_check_cache
 from group.models import Group
 
 from rest_framework.authtoken.models import Token
@@ -18,6 +26,13 @@ class User(DjangoUser):
     AUTH_TYPE_LOCAL = 1 << 0
     AUTH_TYPE_LDAP = 1 << 1
 
+    # This is the key to store compiled permission map of each users in the cache
+    CACHE_KEY_PERMISSION_MAP = 'user_permission_map_%d_%s'
+
+    # This is renewed whenever permission maps are expired in this process to expire the ones
+    # which are memorized in User instances
+    _permission_map_generation = 0
+
     authenticate_type = models.IntegerField(default=AUTH_TYPE_LOCAL)
     authorized_type = models.IntegerField(default=0)
     token_lifetime = models.IntegerField(default=TOKEN_LIFETIME)
@@ -32,20 +47,80 @@ class User(DjangoUser):
         return Token.objects.get_or_create(user=self)[0]
 
     def _user_has_permission(self, target_obj, permission_level):
-        return any([permission_level.id <= x.get_aclid()
-                   for x in self.permissions.all() if target_obj.id == x.get_objid()])
+        return self.permissions.filter(
+            aclpermission__object_id=target_obj.id,
+            aclpermission__acltype__gte=permission_level.id).exists()
 
     def _group_has_permission(self, target_obj, permission_level, groups):
-        return any(sum([[permission_level.id <= x.get_aclid()
-                   for x in g.permissions.all() if target_obj.id == x.get_objid()] for g in groups],
-                   []))
+        return Permission.objects.filter(
+            group__in=groups,
+            aclpermission__object_id=target_obj.id,
+            aclpermission__acltype__gte=permission_level.id).exists()
+
+    def get_permission_map(self):
+        """
+        This returns a map of Entity and EntityAttr id to the maximum ACLType id that this user
+        has by itself or through the groups it belongs to. They are few (unlike Entries and
+        Attributes), so the map is compiled by one query and it is cached until permissions of
+        this user or its groups are changed. It's also memorized in this instance not to get
+        it from the cache at every check.
+        """
+        (generation, permission_map) = getattr(self, '_permission_map', (None, None))
+        if generation == User._permission_map_generation:
+            return permission_map
+
+        # return the map which has already been gotten in the permission_check_cache context
+        check_cache = get_permission_check_cache()
+        if check_cache is not None and (self.id, 'permission_map') in check_cache:
+            return check_cache[(self.id, 'permission_map')]
+
+        cache_key = User._get_permission_map_key(self.id, self.date_joined)
+
+        permission_map = cache.get(cache_key)
+        if permission_map is None:
+            permission_map = {}
+
+            entity_models = import_module('entity.models')
+            grants = Permission.objects.filter(
+                Q(user__id=self.id) | Q(group__user__id=self.id),
+                content_type__in=ContentType.objects.get_for_models(
+                    entity_models.Entity, entity_models.EntityAttr).values(),
+                aclpermission__acltype__in=[x.id for x in ACLType.availables()]
+            ).values_list('aclpermission__object_id', 'aclpermission__acltype').distinct()
+
+            for (objid, acltype) in grants:
+                permission_map[objid] = max(acltype, permission_map.get(objid, 0))
+
+            cache.set(cache_key, permission_map)
+
+        if check_cache is not None:
+            check_cache[(self.id, 'permission_map')] = permission_map
+
+        self._permission_map = (User._permission_map_generation, permission_map)
+
+        return permission_map
+
+    def get_granted_acltype(self, target_obj):
+        """
+        This returns the maximum ACLType id that this user is granted for target_obj. The one of
+        Entity and EntityAttr is read from the permission map, and the one of the other objects
+        (e.g. Entry) is looked up by the index of its permissions.
+        """
+        if target_obj.objtype in [ACLObjType.Entity, ACLObjType.EntityAttr]:
+            return self.get_permission_map().get(target_obj.id, 0)
+
+        return Permission.objects.filter(
+            Q(user__id=self.id) | Q(group__user__id=self.id),
+            aclpermission__object_id=target_obj.id,
+            aclpermission__acltype__in=[x.id for x in ACLType.availables()]
+        ).aggregate(acltype=Max('aclpermission__acltype'))['acltype'] or 0
 
     def is_permitted(self, target_obj, permission_level, groups=[]):
-        if not groups:
-            groups = self.groups.all()
+        if groups:
+            return (self._user_has_permission(target_obj, permission_level) or
+                    self._group_has_permission(target_obj, permission_level, groups))
 
-        return (self._user_has_permission(target_obj, permission_level) or
-                self._group_has_permission(target_obj, permission_level, groups))
+        return permission_level.id <= self.get_granted_acltype(target_obj)
 
     def may_permitted(self, target_obj, expected_permission, is_public, default_permission,
                       acl_settings):
@@ -65,42 +140,113 @@ class User(DjangoUser):
         if expected_permission <= default_permission:
             return True
 
+        (is_permitted, is_user_specified, groups) = self._check_acl_settings(
+            expected_permission, acl_settings)
+        if is_permitted:
+            return True
+
+        # If input won't change current user's permission and user has permission originally,
+        # then this permits to change permissoin
+        args = [target_obj, expected_permission]
+        if not is_user_specified and self._user_has_permission(*args):
+            return True
+
+        if groups and self._group_has_permission(*(args + [Group.objects.filter(id__in=groups)])):
+            return True
+
+        return False
+
+    def filter_may_permitted(self, queryset, expected_permission, is_public, default_permission,
+                             acl_settings):
+        '''
+        This narrows down the QuerySet of ACLBase objects to the ones that specified permission
+        settings have expected_permission for this user, as may_permitted does for each of them.
+        The is_public and default_permission could be None to check the current ones of each
+        objects. The settings are checked only once and the current permissions of the objects
+        are checked in the query, so this doesn't depend on the number of objects.
+        '''
+        if self.is_superuser or is_public:
+            return queryset
+
+        if default_permission is not None and expected_permission <= default_permission:
+            return queryset
+
+        (is_permitted, is_user_specified, groups) = self._check_acl_settings(
+            expected_permission, acl_settings)
+        if is_permitted:
+            return queryset
+
+        ACLPermission = import_module('acl.models').ACLPermission
+        condition = Q(pk__in=[])
+        if is_public is None:
+            condition |= Q(is_public=True)
+        if default_permission is None:
+            condition |= Q(default_permission__gte=expected_permission.id)
+        if not is_user_specified:
+            condition |= Q(id__in=ACLPermission.objects.filter(
+                permission__user__id=self.id,
+                acltype__gte=expected_permission.id).values('object_id'))
+        if groups:
+            condition |= Q(id__in=ACLPermission.objects.filter(
+                permission__group__id__in=groups,
+                acltype__gte=expected_permission.id).values('object_id'))
+
+        return queryset.filter(condition)
+
+    def _check_acl_settings(self, expected_permission, acl_settings):
+        '''
+        This checks whether specified permission settings grant expected_permission to this
+        user or the groups it belongs to. This returns the result with whether this user is
+        specified in the settings and the groups which are not specified in them.
+        '''
         groups = [g.id for g in self.groups.all()]
         for acl_data in [x for x in acl_settings if x['value']]:
             if (acl_data['member_type'] == 'user' and
                     int(acl_data['member_id']) == self.id and
                     int(acl_data['value']) >= expected_permission):
-                return True
+                return (True, True, groups)
 
             elif (acl_data['member_type'] == 'group' and
                   int(acl_data['member_id']) in groups and
                   int(acl_data['value']) >= expected_permission):
-                return True
+                return (True, True, groups)
 
             # get rid of group id for checking permission
             if int(acl_data['member_id']) in groups:
                 groups.remove(int(acl_data['member_id']))
 
-        # If input won't change current user's permission and user has permission originally,
-        # then this permits to change permissoin
-        args = [target_obj, expected_permission]
-        if not any(
-                [int(x['member_id']) == self.id for x in acl_settings]
-                ) and self._user_has_permission(*args):
-            return True
+        is_user_specified = any([int(x['member_id']) == self.id for x in acl_settings])
 
-        if groups and self._group_has_permission(*(args + [Group.objects.filter(id__in=groups)])):
-            return True
-
-        return False
+        return (False, is_user_specified, groups)
 
     def has_permission(self, target_obj, permission_level, groups=[]):
+        check_cache = get_permission_check_cache()
+        if check_cache is None or groups:
+            return self._has_permission(target_obj, permission_level, groups)
+
+        key = (self.id, target_obj.id, getattr(permission_level, 'id', None))
+        if key not in check_cache:
+            check_cache[key] = self._has_permission(target_obj, permission_level)
+
+        return check_cache[key]
+
+    def _has_schema_permission(self, target_obj, permission_level):
+        # This refers the result which has already been checked in the permission_check_cache
+        # context not to get schema object of target_obj from database.
+        check_cache = get_permission_check_cache()
+        key = (self.id, target_obj.schema_id, getattr(permission_level, 'id', None))
+        if check_cache is not None and key in check_cache:
+            return check_cache[key]
+
+        return self.has_permission(target_obj.schema, permission_level)
+
+    def _has_permission(self, target_obj, permission_level, groups=[]):
         # The case that parent data structure (Entity in Entry, or EntityAttr in Attribute)
         # doesn't permit, access to the children's objects are also not permitted.
         if ((isinstance(target_obj, import_module('entry.models').Entry) or
              isinstance(target_obj, import_module('entry.models').Attribute)) and
-            (not self.is_permitted(target_obj, permission_level) and
-             not self.has_permission(target_obj.schema, permission_level))):
+            (not self._has_schema_permission(target_obj, permission_level) and
+             not self.is_permitted(target_obj, permission_level))):
             return False
 
         # A bypass processing to rapidly return.
@@ -122,8 +268,61 @@ class User(DjangoUser):
 
         return self.is_permitted(target_obj, permission_level, groups)
 
+    def filter_permitted(self, queryset, permission_level):
+        """
+        This narrows down the specified QuerySet of ACLBase objects to the ones this user has
+        the permission_level for. The conditions of has_permission are converted to a predicate
+        of the query, so that filtering and pagination are processed in the database.
+        """
+        try:
+            if not issubclass(permission_level, ACLTypeBase):
+                return queryset.none()
+        except TypeError:
+            return queryset.none()
+
+        if self.is_superuser:
+            return queryset
+
+        # This is a subquery of the objects which this user (or its groups) is granted the
+        # permission_level for, not to put all of them into the query.
+        permitted_ids = import_module('acl.models').ACLPermission.objects.filter(
+            Q(permission__user__id=self.id) | Q(permission__group__user__id=self.id),
+            acltype__in=[x.id for x in ACLType.availables() if permission_level <= x],
+        ).values('object_id')
+
+        def _get_condition(prefix=''):
+            return (Q(**{'%sis_public' % prefix: True}) |
+                    Q(**{'%sdefault_permission__gte' % prefix: permission_level.id}) |
+                    Q(**{'%sid__in' % prefix: permitted_ids}))
+
+        # The case of Entry and Attribute, the permission of parent data structure
+        # (Entity or EntityAttr) is also needed unless the object itself is permitted.
+        entry_models = import_module('entry.models')
+        if issubclass(queryset.model, (entry_models.Entry, entry_models.Attribute)):
+            return queryset.filter(Q(id__in=permitted_ids) |
+                                   (_get_condition() & _get_condition('schema__')))
+
+        return queryset.filter(_get_condition())
+
     def get_acls(self, aclobj):
-        return self.permissions.filter(codename__regex=(r'^%d\.' % aclobj.id))
+        return self.permissions.filter(aclpermission__object_id=aclobj.id)
+
+    @classmethod
+    def _get_permission_map_key(kls, user_id, date_joined):
+        # The date_joined parameter is a part of the key not to refer the map of another user
+        # that had the same id before (e.g. users who are created in the database for testing).
+        return kls.CACHE_KEY_PERMISSION_MAP % (user_id, date_joined.timestamp())
+
+    @classmethod
+    def clear_permission_map(kls, user_ids):
+        """
+        This expires compiled permission maps of specified users
+        """
+        users = DjangoUser.objects.filter(id__in=user_ids).values_list('id', 'date_joined')
+
+        cache.delete_many([kls._get_permission_map_key(*x) for x in users])
+        clear_permission_check_cache()
+        User._permission_map_generation += 1
 
     def delete(self):
         """
@@ -241,3 +440,47 @@ class History(models.Model):
             return True
         else:
             return False
+
+
+# These handlers expire compiled permission maps when permissions of users or groups,
+# or the members of groups are changed.
+@receiver(m2m_changed, sender=DjangoUser.user_permissions.through)
+def _user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+
+    if not reverse:
+        User.clear_permission_map([instance.id])
+    elif action == 'pre_clear':
+        User.clear_permission_map(instance.user_set.values_list('id', flat=True))
+    else:
+        User.clear_permission_map(pk_set)
+
+
+@receiver(m2m_changed, sender=DjangoGroup.permissions.through)
+def _group_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+
+    if not reverse:
+        group_ids = [instance.id]
+    elif action == 'pre_clear':
+        group_ids = instance.group_set.values_list('id', flat=True)
+    else:
+        group_ids = pk_set
+
+    User.clear_permission_map(
+        DjangoUser.objects.filter(groups__id__in=group_ids).values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=DjangoUser.groups.through)
+def _group_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ['post_add', 'post_remove', 'pre_clear']:
+        return
+
+    if not reverse:
+        User.clear_permission_map([instance.id])
+    elif action == 'pre_clear':
+        User.clear_permission_map(instance.user_set.values_list('id', flat=True))
+    else:
+        User.clear_permission_map(pk_set)
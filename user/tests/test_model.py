@@ -1,7 +1,9 @@
+from unittest.mock import patch
+
 from django.test import TestCase
 from django.contrib.auth.models import User as DjangoUser
 
-from airone.lib.acl import ACLType
+from airone.lib.acl import ACLType, permission_check_cache
 from entity.models import Entity, EntityAttr
 from entry.models import Entry
 from group.models import Group
@@ -111,3 +113,139 @@ class ModelTest(TestCase):
         self.assertTrue(user.has_permission(entity, ACLType.Readable))
         self.assertFalse(user.has_permission(entity, ACLType.Writable))
         self.assertFalse(user.has_permission(entity, ACLType.Full))
+
+    def test_permission_map(self):
+        user = User.objects.create(username='user')
+        group = Group.objects.create(name='group')
+
+        entity = Entity.objects.create(name='entity', created_user=user, is_public=False)
+        attr = EntityAttr.objects.create(name='attr', created_user=user, parent_entity=entity,
+                                         is_public=False)
+
+        user.permissions.add(entity.readable)
+        group.permissions.add(entity.full)
+        group.permissions.add(attr.writable)
+
+        # permissions of the group doesn't affect to the user until the user joins it
+        self.assertEqual(user.get_permission_map(), {entity.id: ACLType.Readable.id})
+
+        user.groups.add(group)
+        self.assertEqual(user.get_permission_map(), {
+            entity.id: ACLType.Full.id,
+            attr.id: ACLType.Writable.id,
+        })
+
+        # checks compiled map is expired when the permissions of the group are changed
+        group.permissions.remove(entity.full)
+        self.assertEqual(user.get_permission_map(), {
+            entity.id: ACLType.Readable.id,
+            attr.id: ACLType.Writable.id,
+        })
+
+        # checks compiled map is expired when the user leaves from the group
+        group.user_set.remove(user)
+        self.assertEqual(user.get_permission_map(), {entity.id: ACLType.Readable.id})
+
+        user.permissions.clear()
+        self.assertEqual(user.get_permission_map(), {})
+
+    def test_permission_check_with_compiled_map(self):
+        user = User.objects.create(username='user')
+        entities = [Entity.objects.create(name='e-%d' % i, created_user=user, is_public=False)
+                    for i in range(10)]
+        for entity in entities:
+            user.permissions.add(entity.writable)
+
+        # checks permission checks don't send query nor get the map from the cache after the
+        # map is compiled
+        user.get_permission_map()
+        with self.assertNumQueries(0), patch('user.models.cache.get') as mock_cache_get:
+            for entity in entities:
+                self.assertTrue(user.has_permission(entity, ACLType.Writable))
+                self.assertFalse(user.has_permission(entity, ACLType.Full))
+            self.assertFalse(mock_cache_get.called)
+
+        # the memorized map is expired when permissions are changed
+        user.permissions.add(entities[0].full)
+        self.assertTrue(user.has_permission(entities[0], ACLType.Full))
+
+        # grants of entries are not compiled into the map, but they are looked up
+        entry = Entry.objects.create(name='entry', created_user=user, schema=entities[0],
+                                     is_public=False)
+        user.permissions.add(entry.readable)
+        self.assertNotIn(entry.id, user.get_permission_map())
+        self.assertTrue(user.is_permitted(entry, ACLType.Readable))
+        self.assertFalse(user.is_permitted(entry, ACLType.Writable))
+
+    def test_filter_permitted(self):
+        admin = User.objects.create(username='admin', is_superuser=True)
+        user = User.objects.create(username='user')
+        group = Group.objects.create(name='group')
+        user.groups.add(group)
+
+        entities = {
+            'public': Entity.objects.create(name='public', created_user=admin),
+            'default': Entity.objects.create(name='default', created_user=admin,
+                                             is_public=False,
+                                             default_permission=ACLType.Readable.id),
+            'private': Entity.objects.create(name='private', created_user=admin,
+                                             is_public=False),
+            'user': Entity.objects.create(name='user', created_user=admin, is_public=False),
+            'group': Entity.objects.create(name='group', created_user=admin, is_public=False),
+        }
+        user.permissions.add(entities['user'].writable)
+        group.permissions.add(entities['group'].full)
+
+        entries = []
+        for entity in entities.values():
+            entries.append(Entry.objects.create(name='public', created_user=admin,
+                                                schema=entity))
+            entries.append(Entry.objects.create(name='private', created_user=admin,
+                                                schema=entity, is_public=False))
+        user.permissions.add(entries[-1].readable)
+
+        # checks the results are same with the ones of has_permission
+        for acltype in ACLType.availables():
+            for model in [Entity, Entry]:
+                self.assertEqual(
+                    sorted([x.id for x in user.filter_permitted(model.objects.all(), acltype)]),
+                    sorted([x.id for x in model.objects.all()
+                            if user.has_permission(x, acltype)]))
+
+            self.assertEqual(admin.filter_permitted(Entry.objects.all(), acltype).count(),
+                             len(entries))
+
+        self.assertEqual(user.filter_permitted(Entity.objects.all(), 'invalid').count(), 0)
+
+        # checks the permitted objects are narrowed down by a subquery
+        self.assertIn('acl_aclpermission',
+                      str(user.filter_permitted(Entry.objects.all(), ACLType.Readable).query))
+
+    def test_permission_check_cache(self):
+        user = User.objects.create(username='user')
+        entity = Entity.objects.create(name='entity', created_user=user, is_public=False)
+        for index in range(5):
+            Entry.objects.create(name='e-%d' % index, created_user=user, schema=entity)
+
+        user.permissions.add(entity.readable)
+        user.get_permission_map()
+
+        # checks the permission of parent Entity is checked only once in the context
+        entries = list(Entry.objects.filter(schema=entity))
+        with permission_check_cache():
+            with self.assertNumQueries(1):
+                self.assertTrue(all([user.has_permission(x, ACLType.Readable) for x in entries]))
+
+            # the permission of each Entry is looked up once when the Entity doesn't permit
+            with self.assertNumQueries(len(entries)):
+                self.assertFalse(any([user.has_permission(x, ACLType.Full) for x in entries]))
+            with self.assertNumQueries(0):
+                self.assertFalse(any([user.has_permission(x, ACLType.Full) for x in entries]))
+
+            # checks results are updated when ACL is changed in the context
+            user.permissions.add(entity.full)
+            self.assertTrue(all([user.has_permission(x, ACLType.Full) for x in entries]))
+
+        # checks the results are not memorized outside of the context
+        user.permissions.remove(entity.full)
+        self.assertFalse(user.has_permission(entries[0], ACLType.Full))